@@ -1,10 +1,11 @@
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from core.config import settings
-from core.database import get_db
+from core import read_routing
+from core.database import get_db, SessionLocal, ReplicaSessionLocal
 from db_models.core import User
 from schemas.core import TokenData
 
@@ -34,3 +35,21 @@ def get_current_user(
     if user is None:
         raise credentials_exception
     return user
+
+
+def get_report_db(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    x_read_consistency: Optional[str] = Header(None)
+) -> Generator:
+    """
+    Session for report endpoints: the read replica when read_routing allows it,
+    otherwise the primary. The choice is returned in the X-Read-Source header.
+    """
+    source = read_routing.read_source(current_user.email, x_read_consistency)
+    response.headers["X-Read-Source"] = source
+    db = ReplicaSessionLocal() if source == "replica" else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
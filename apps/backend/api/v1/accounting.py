@@ -1,14 +1,37 @@
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from api import deps
 from schemas import accounting as schemas
 from services import accounting_service as service
+from services import reconciliation_service
+from services import statements_service
+from services import allocation_service
+from services import ageing_service
+from services import cheque_clearing_service
+from services import note_posting_service
 from db_models.core import User
 
 router = APIRouter()
 
+def list_params(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+):
+    """Keyset pagination and date-range filters shared by the accounting list endpoints."""
+    return {"cursor": cursor, "limit": limit, "start_date": start_date, "end_date": end_date}
+
+def paged(response: Response, page):
+    # Lists stay plain arrays; the next-page cursor travels in a header
+    rows, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
 @router.get("/chart-of-accounts", response_model=List[schemas.ChartOfAccount])
 def read_chart_of_accounts(
     db: Session = Depends(deps.get_db),
@@ -26,10 +49,13 @@ def create_chart_of_account(
 
 @router.get("/journals", response_model=List[schemas.JournalHeader])
 def read_journals(
-    db: Session = Depends(deps.get_db),
+    response: Response,
+    status: Optional[str] = None,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_report_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    return service.get_journals(db, company_id=current_user.company_id)
+    return paged(response, service.get_journals(db, company_id=current_user.company_id, status=status, **params))
 
 @router.get("/journals/{journal_id}", response_model=schemas.JournalHeader)
 def read_journal(
@@ -50,9 +76,31 @@ def create_journal_entry(
 ):
     return service.create_journal_entry(db, journal_in=journal_in, company_id=current_user.company_id)
 
+@router.post("/journals/import", response_model=schemas.JournalImportResult)
+def import_journal_entries(
+    journals_in: List[schemas.JournalHeaderCreate],
+    chunk_size: Optional[int] = Query(None, ge=1, le=10000),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    entries = ((index, journal_in, None) for index, journal_in in enumerate(journals_in))
+    return service.import_journal_entries(db, entries, company_id=current_user.company_id, chunk_size=chunk_size)
+
+@router.post("/journals/import/file", response_model=schemas.JournalImportResult)
+def import_journal_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    chunk_size: Optional[int] = Query(None, ge=1, le=10000),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    entries = service.parse_journal_import(file.file, fmt)
+    return service.import_journal_entries(db, entries, company_id=current_user.company_id, chunk_size=chunk_size)
+
 @router.get("/batches")
 def get_batches(
-    db: Session = Depends(deps.get_db),
+    db: Session = Depends(deps.get_report_db),
     current_user: User = Depends(deps.get_current_user),
 ):
     return service.get_batches(db, current_user.company_id)
@@ -66,20 +114,41 @@ def post_batch(
     return service.post_batch(db, batch_id, current_user.company_id)
 
 @router.get("/payments", response_model=List[schemas.PaymentHeader])
-def read_payments(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    return service.get_payments(db, company_id=current_user.company_id)
+def read_payments(
+    response: Response,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, service.get_payments(db, company_id=current_user.company_id, **params))
 
 @router.post("/payments", response_model=schemas.PaymentHeader)
 def create_payment(
     payment_in: schemas.PaymentHeaderCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=100),
     db: Session = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    return service.create_payment(db, payment_in=payment_in, company_id=current_user.company_id)
+    return service.create_payment(
+        db, payment_in=payment_in, company_id=current_user.company_id, idempotency_key=idempotency_key
+    )
+
+@router.get("/invoices/{invoice_id}/outstanding", response_model=schemas.InvoiceOutstanding)
+def read_invoice_outstanding(
+    invoice_id: str,
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return allocation_service.get_invoice_outstanding(db, invoice_id=invoice_id, company_id=current_user.company_id)
 
 @router.get("/budgets", response_model=List[schemas.BudgetHeader])
-def read_budgets(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    return service.get_budgets(db, company_id=current_user.company_id)
+def read_budgets(
+    response: Response,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, service.get_budgets(db, company_id=current_user.company_id, **params))
 
 @router.post("/budgets", response_model=schemas.BudgetHeader)
 def create_budget(
@@ -89,9 +158,32 @@ def create_budget(
 ):
     return service.create_budget(db, budget_in=budget_in, company_id=current_user.company_id)
 
+@router.get("/budgets/{budget_id}/variance", response_model=schemas.BudgetVariance)
+def read_budget_variance(
+    budget_id: str,
+    use_cache: bool = True,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Budget vs actual per budget line. Reports are cached for up to 60 s per API worker: a
+    posting clears the cache of the worker that handled it, other workers may serve the
+    previous figures until their copy expires. Pass use_cache=false for live figures.
+    """
+    return service.get_budget_variance(db, budget_id=budget_id, company_id=current_user.company_id, use_cache=use_cache)
+
 @router.get("/debit-notes", response_model=List[schemas.DebitNoteHeader])
-def read_debit_notes(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    return service.get_debit_notes(db, company_id=current_user.company_id)
+def read_debit_notes(
+    response: Response,
+    status: Optional[str] = None,
+    posted: Optional[bool] = None,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, service.get_debit_notes(
+        db, company_id=current_user.company_id, status=status, posted=posted, **params
+    ))
 
 @router.post("/debit-notes", response_model=schemas.DebitNoteHeader)
 def create_debit_note(
@@ -102,8 +194,17 @@ def create_debit_note(
     return service.create_debit_note(db, note_in=note_in, company_id=current_user.company_id)
 
 @router.get("/credit-notes", response_model=List[schemas.CreditNoteHeader])
-def read_credit_notes(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    return service.get_credit_notes(db, company_id=current_user.company_id)
+def read_credit_notes(
+    response: Response,
+    status: Optional[str] = None,
+    posted: Optional[bool] = None,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, service.get_credit_notes(
+        db, company_id=current_user.company_id, status=status, posted=posted, **params
+    ))
 
 @router.post("/credit-notes", response_model=schemas.CreditNoteHeader)
 def create_credit_note(
@@ -113,9 +214,42 @@ def create_credit_note(
 ):
     return service.create_credit_note(db, note_in=note_in, company_id=current_user.company_id)
 
+@router.get("/note-account-mappings", response_model=List[schemas.NoteAccountMapping])
+def read_note_account_mappings(
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return note_posting_service.get_note_account_mappings(db, company_id=current_user.company_id)
+
+@router.put("/note-account-mappings", response_model=schemas.NoteAccountMapping)
+def save_note_account_mapping(
+    mapping_in: schemas.NoteAccountMappingCreate,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return note_posting_service.save_note_account_mapping(db, mapping_in=mapping_in, company_id=current_user.company_id)
+
+@router.post("/notes/post", response_model=schemas.NotePostingReport)
+def post_notes(
+    request: schemas.NotePostingRequest,
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """Post debit and credit notes to the general ledger in one batch; notes already posted are skipped."""
+    return note_posting_service.post_notes(
+        db, company_id=current_user.company_id,
+        debit_note_ids=request.debit_note_ids, credit_note_ids=request.credit_note_ids
+    )
+
 @router.get("/fund-transfers", response_model=List[schemas.FundTransfer])
-def read_fund_transfers(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    return service.get_fund_transfers(db, company_id=current_user.company_id)
+def read_fund_transfers(
+    response: Response,
+    status: Optional[str] = None,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, service.get_fund_transfers(db, company_id=current_user.company_id, status=status, **params))
 
 @router.post("/fund-transfers", response_model=schemas.FundTransfer)
 def create_fund_transfer(
@@ -133,11 +267,32 @@ def create_bank_reconciliation(
 ):
     return service.create_bank_reconciliation(db, rec_in=rec_in, company_id=current_user.company_id)
 
-@router.get("/cheque-deposits")
-def read_cheque_deposits(db: Session = Depends(deps.get_db), current_user: User = Depends(deps.get_current_user)):
-    return service.get_cheque_deposits(db, company_id=current_user.company_id)
+@router.post("/bank-reconciliation/statement", response_model=schemas.ReconciliationReport)
+def reconcile_bank_statement(
+    bank_account_id: str,
+    statement_date: date,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|mt940)$"),
+    date_window_days: int = Query(3, ge=0, le=60),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "mt940")
+    return reconciliation_service.reconcile_statement_file(
+        db, file.file, fmt, bank_account_id=bank_account_id, statement_date=statement_date,
+        company_id=current_user.company_id, date_window_days=date_window_days
+    )
+
+@router.get("/cheque-deposits", response_model=List[schemas.ChequeDeposit])
+def read_cheque_deposits(
+    response: Response,
+    params: dict = Depends(list_params),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, service.get_cheque_deposits(db, company_id=current_user.company_id, **params))
 
-@router.post("/cheque-deposits")
+@router.post("/cheque-deposits", response_model=schemas.ChequeDeposit)
 def create_cheque_deposit(
     deposit_in: schemas.ChequeDepositCreate,
     db: Session = Depends(deps.get_db),
@@ -145,12 +300,141 @@ def create_cheque_deposit(
 ):
     return service.create_cheque_deposit(db, deposit_in=deposit_in, company_id=current_user.company_id)
 
-@router.get("/ledger-report")
+@router.post("/cheque-deposits/clearing", response_model=schemas.ChequeClearingReport)
+def apply_cheque_clearing(
+    bank_account_id: str,
+    clearing_account_id: str,
+    clearing_date: date,
+    file: UploadFile = File(...),
+    db: Session = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Mark deposited cheques cleared or bounced from the bank's clearing file (CSV) and
+    post a journal for every cleared cheque, debiting the bank account and crediting
+    the clearing account the receipts were parked in.
+    """
+    return cheque_clearing_service.apply_clearing_file(
+        db, file.file, company_id=current_user.company_id, bank_account_id=bank_account_id,
+        clearing_account_id=clearing_account_id, clearing_date=clearing_date
+    )
+
+@router.get("/cache/stats")
+def get_cache_stats(current_user: User = Depends(deps.get_current_user)):
+    """Entry counts and hit/miss counters of this worker's in-process caches."""
+    return {
+        "accounts": service.account_cache.stats(),
+        "budget_variance": service.budget_variance_cache.stats()
+    }
+
+@router.get("/trial-balance", response_model=schemas.TrialBalance)
+def get_trial_balance(
+    as_of: date,
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return service.get_trial_balance(db, company_id=current_user.company_id, as_of=as_of)
+
+@router.get("/statements/profit-and-loss", response_model=schemas.FinancialStatement)
+def get_profit_and_loss(
+    start_date: date,
+    end_date: date,
+    compare_periods: int = Query(0, ge=0, le=4),
+    include_zero: bool = False,
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return statements_service.get_profit_and_loss(
+        db, company_id=current_user.company_id, start_date=start_date, end_date=end_date,
+        compare_periods=compare_periods, include_zero=include_zero
+    )
+
+@router.get("/statements/balance-sheet", response_model=schemas.FinancialStatement)
+def get_balance_sheet(
+    as_of: date,
+    compare_periods: int = Query(0, ge=0, le=4),
+    include_zero: bool = False,
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return statements_service.get_balance_sheet(
+        db, company_id=current_user.company_id, as_of=as_of,
+        compare_periods=compare_periods, include_zero=include_zero
+    )
+
+@router.get("/ageing/{side}", response_model=schemas.AgeingSummary)
+def get_ageing_summary(
+    side: str,
+    as_of: Optional[date] = None,
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    """
+    Receivables or payables ageing totals by due-date bucket: `current` is not yet due
+    or due on as_of, then 1-30, 31-60, 61-90 and over 90 days past the due date.
+    """
+    return ageing_service.get_ageing_summary(db, company_id=current_user.company_id, side=side, as_of=as_of)
+
+@router.get("/ageing/{side}/parties", response_model=List[schemas.AgeingParty])
+def get_ageing_by_party(
+    side: str,
+    response: Response,
+    as_of: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, ageing_service.get_ageing_by_party(
+        db, company_id=current_user.company_id, side=side, as_of=as_of, cursor=cursor, limit=limit
+    ))
+
+@router.get("/ageing/{side}/parties/{party_id}", response_model=List[schemas.AgeingDocument])
+def get_ageing_documents(
+    side: str,
+    party_id: str,
+    response: Response,
+    as_of: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return paged(response, ageing_service.get_ageing_documents(
+        db, company_id=current_user.company_id, side=side, party_id=party_id, as_of=as_of, cursor=cursor, limit=limit
+    ))
+
+@router.get("/ledger-report", response_model=schemas.LedgerReport)
 def get_ledger_report(
     account_id: str,
     start_date: date,
     end_date: date,
-    db: Session = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(deps.get_report_db),
+    current_user: User = Depends(deps.get_current_user)
+):
+    return service.get_ledger_report(
+        db, account_id=account_id, start_date=start_date, end_date=end_date,
+        company_id=current_user.company_id, cursor=cursor, limit=limit
+    )
+
+@router.get("/ledger-report/export")
+def export_ledger_report(
+    account_id: str,
+    start_date: date,
+    end_date: date,
+    format: str = Query("json", pattern="^(json|csv)$"),
+    db: Session = Depends(deps.get_report_db),
     current_user: User = Depends(deps.get_current_user)
 ):
-    return service.get_ledger_report(db, account_id=account_id, start_date=start_date, end_date=end_date, company_id=current_user.company_id)
+    chunks = service.stream_ledger_report(
+        db, account_id=account_id, start_date=start_date, end_date=end_date,
+        company_id=current_user.company_id, fmt=format
+    )
+    media_type = "text/csv" if format == "csv" else "application/json"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="ledger-{account_id}.{format}"'}
+    )
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from core.database import get_db
 from services import marketing_service
+from services import lead_search_service, lead_scoring_service
 from api import deps
 from schemas import marketing as schemas
 from datetime import datetime
@@ -29,9 +30,16 @@ def list_leads(
     assigned_to: Optional[str] = None,
     has_website: Optional[bool] = None,
     search: Optional[str] = None,
+    count: str = Query("exact", pattern="^(exact|estimated)$"),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get list of business leads with filtering and pagination"""
+    """
+    Get list of business leads with filtering and pagination.
+    Pass next_cursor from the previous page as `cursor` for constant-time deep pages;
+    skip still works for OFFSET paging (page is null on cursor pages). count=estimated takes the unfiltered total from
+    table statistics (total_is_estimate is set).
+    """
     filters = {
         'status': status,
         'source': source,
@@ -43,23 +51,38 @@ def list_leads(
         'has_website': has_website,
         'search': search
     }
-    # Remove None values
-    filters = {k: v for k, v in filters.items() if v is not None}
+    # Remove empty values; the count below applies the same filters
+    filters = marketing_service.normalize_lead_filters(filters)
     
-    leads = marketing_service.get_leads(db, skip=skip, limit=limit, filters=filters)
+    leads, next_cursor = marketing_service.get_leads_page(db, limit=limit, filters=filters, cursor=cursor, skip=skip)
     
-    # Get total count for pagination
-    from db_models.marketing import BusinessLead
-    total = db.query(BusinessLead).count()
+    # Total for pagination, cached per filter set
+    total, is_estimate = marketing_service.count_leads(db, filters, estimated=count == "estimated")
     
     return {
         'total': total,
+        'total_is_estimate': is_estimate,
         'leads': leads,
-        'page': skip // limit + 1,
-        'page_size': limit
+        # A cursor page has no position to report; page only applies to skip-based paging
+        'page': None if cursor else skip // limit + 1,
+        'page_size': limit,
+        'next_cursor': next_cursor
     }
 
 
+@router.get("/leads/search", response_model=List[schemas.LeadSearchHit])
+def search_leads(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Ranked lead search by business name or phone number (full number, leading or trailing digits)"""
+    return [
+        {'rank': rank, 'lead': lead}
+        for lead, rank in lead_search_service.search_leads(db, q, limit=limit)
+    ]
+
+
 @router.get("/leads/{lead_id}", response_model=schemas.BusinessLead)
 def get_lead(lead_id: int, db: Session = Depends(get_db)):
     """Get single lead by ID"""
@@ -145,33 +168,44 @@ def get_lead_activities(lead_id: int, db: Session = Depends(get_db)):
 
 # ===== Analytics Endpoints =====
 
+def _date_filters(start_date: Optional[datetime], end_date: Optional[datetime]) -> dict:
+    filters = {}
+    if start_date:
+        filters['start_date'] = start_date
+    if end_date:
+        filters['end_date'] = end_date
+    return filters
+
+
 @router.get("/analytics", response_model=schemas.LeadAnalytics)
 def get_analytics(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     db: Session = Depends(get_db)
 ):
-    """Get lead analytics for dashboard"""
-    filters = {}
-    if start_date:
-        filters['start_date'] = start_date
-    if end_date:
-        filters['end_date'] = end_date
-    
-    return marketing_service.get_lead_analytics(db, filters)
+    """Get lead analytics for dashboard (leads created between the dates, whole days)"""
+    return marketing_service.get_lead_analytics(db, _date_filters(start_date, end_date))
 
 
 @router.get("/analytics/funnel")
-def get_funnel(db: Session = Depends(get_db)):
+def get_funnel(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
     """Get conversion funnel data"""
-    stages = marketing_service.get_conversion_funnel(db)
+    stages = marketing_service.get_conversion_funnel(db, _date_filters(start_date, end_date))
     return {"stages": stages}
 
 
 @router.get("/analytics/performance", response_model=List[schemas.SourcePerformance])
-def get_performance(db: Session = Depends(get_db)):
+def get_performance(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
     """Get source performance metrics"""
-    return marketing_service.get_source_performance(db)
+    return marketing_service.get_source_performance(db, _date_filters(start_date, end_date))
 
 
 # ===== Configuration Endpoints =====
@@ -239,6 +273,7 @@ def create_category_weight(
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    lead_scoring_service.refresh_scoring_model(db)
     return db_category
 
 
@@ -261,6 +296,7 @@ def update_category_weight(
     db_category.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_category)
+    lead_scoring_service.refresh_scoring_model(db)
     return db_category
 
 
@@ -283,6 +319,7 @@ def create_source_config(
     db.add(db_source)
     db.commit()
     db.refresh(db_source)
+    lead_scoring_service.refresh_scoring_model(db)
     return db_source
 
 
@@ -305,6 +342,7 @@ def update_source_config(
     db_source.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_source)
+    lead_scoring_service.refresh_scoring_model(db)
     return db_source
 
 
@@ -0,0 +1,35 @@
+"""
+Backfill monthly account balance snapshots for every company.
+
+Snapshots are built incrementally: each run only aggregates journal lines
+posted after a company's latest snapshot, so it is safe to schedule nightly.
+
+Usage:
+    python backfill_balance_snapshots.py                # up to the last completed month
+    python backfill_balance_snapshots.py 2025-03-31     # up to a given month-end
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datetime import date
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from db_models.core import Company
+import db_models.accounting
+from services import accounting_service
+
+
+def backfill(through: date = None):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for company in db.query(Company).all():
+            written = accounting_service.build_balance_snapshots(db, company.id, through)
+            print(f"✓ {company.name}: {written} month-end snapshot(s) written")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    through = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    backfill(through)
@@ -0,0 +1,106 @@
+"""
+Benchmark for the receivables ageing report.
+
+Creates a scratch company with N issued invoices spread over C customers and
+due dates across the last 200 days, pays roughly a third of them (half fully,
+half partly), then times the ageing summary, the first and a deep page of the
+per-customer drill-down, and one customer's open invoices. Run it against a
+scratch database, e.g.
+
+    DATABASE_URL=mysql+pymysql://user:pw@localhost/groweasy_bench python bench_ageing.py 1000000 20000
+    (arguments: invoices, customers; defaults 1000000 and 20000)
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from sqlalchemy import insert, text
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from db_models.core import Company
+from db_models.accounting import ChartOfAccount, AccountType, PaymentHeader, PaymentDetail
+from db_models.sales import SalesOrderHeader, SalesOrderStatus, InvoiceHeader, InvoiceStatus
+from services import ageing_service, allocation_service
+
+import main  # noqa: F401  (registers every model before create_all)
+
+CHUNK = 10000
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    return result
+
+
+def setup(db, invoices, customers):
+    company = Company(name=f"Ageing bench {uuid.uuid4().hex[:8]}", gstin="BENCH")
+    db.add(company)
+    db.flush()
+    company_id = company.id
+    bank = ChartOfAccount(code=f"BENCH-{uuid.uuid4().hex[:8]}", name="Bench bank", type=AccountType.ASSET,
+                          sub_type="Bank", company_id=company_id)
+    db.add(bank)
+    db.flush()
+    bank_id = bank.id
+
+    customer_ids = [str(uuid.uuid4()) for _ in range(customers)]
+    orders = [{"id": str(uuid.uuid4()), "customer_id": c, "date": date.today(), "total": 0,
+               "status": SalesOrderStatus.PENDING, "company_id": company_id} for c in customer_ids]
+    db.execute(insert(SalesOrderHeader), orders)
+
+    today = date.today()
+    payment_id = str(uuid.uuid4())
+    db.execute(insert(PaymentHeader), [{"id": payment_id, "date": today, "amount": 0, "payee_id": "bench",
+                                        "account_id": bank_id, "company_id": company_id}])
+    started = time.perf_counter()
+    for offset in range(0, invoices, CHUNK):
+        rows, payments = [], []
+        for _ in range(min(CHUNK, invoices - offset)):
+            invoice_id = str(uuid.uuid4())
+            total = random.randint(100, 100000)
+            due = today - timedelta(days=random.randint(-30, 200))
+            rows.append({"id": invoice_id, "order_id": random.choice(orders)["id"], "date": due - timedelta(days=30),
+                         "due_date": due, "subtotal": total, "tax_amount": 0, "total": total,
+                         "status": InvoiceStatus.ISSUED, "company_id": company_id})
+            if random.random() < 0.33:
+                paid = total if random.random() < 0.5 else total // 2
+                payments.append({"id": str(uuid.uuid4()), "payment_id": payment_id,
+                                 "invoice_id": invoice_id, "amount_allocated": paid})
+        db.execute(insert(InvoiceHeader), rows)
+        if payments:
+            db.execute(insert(PaymentDetail), payments)
+        # Bulk inserts skip the flush hooks, so the outstanding index is synced here
+        allocation_service.sync_invoice_outstanding(db, company_id, [row["id"] for row in rows])
+        db.commit()
+    if engine.dialect.name == "sqlite":
+        db.execute(text("ANALYZE"))  # row counts for the planner, as MySQL keeps by itself
+    print(f"Seeded {invoices} invoices for {customers} customers in {time.perf_counter() - started:.1f}s")
+    return company_id, customer_ids
+
+
+def run(invoices, customers):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        company_id, customer_ids = setup(db, invoices, customers)
+        summary = timed("summary (all buckets)", lambda: ageing_service.get_ageing_summary(db, company_id, "receivables"))
+        print(f"  {summary['documents']} open invoices, {summary['total']} outstanding")
+
+        page, cursor = timed("parties, first page", lambda: ageing_service.get_ageing_by_party(db, company_id, "receivables"))
+        for _ in range(9):
+            page, cursor = ageing_service.get_ageing_by_party(db, company_id, "receivables", cursor=cursor)
+        timed("parties, 11th page", lambda: ageing_service.get_ageing_by_party(db, company_id, "receivables", cursor=cursor))
+        timed("one customer's open invoices", lambda: ageing_service.get_ageing_documents(
+            db, company_id, "receivables", page[0]["party_id"]))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*(args + [1000000, 20000][len(args):]))
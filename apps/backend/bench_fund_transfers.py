@@ -0,0 +1,123 @@
+"""
+Concurrency stress benchmark for fund transfers.
+
+Creates a scratch company with a few bank accounts, then runs many parallel
+writers that transfer random amounts between them through
+accounting_service.create_fund_transfer. Afterwards it checks that
+
+  * no account was overdrawn,
+  * money was conserved across the accounts,
+  * account_balances still matches the posted journals,
+
+and prints transfers/sec. Run it against a scratch database, e.g.
+
+    DATABASE_URL=mysql+pymysql://user:pw@localhost/groweasy_bench python bench_fund_transfers.py 32 200
+    (arguments: writers, transfers per writer)
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import random
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from fastapi import HTTPException
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from db_models.core import Company
+from db_models.accounting import ChartOfAccount, AccountType
+from schemas.accounting import FundTransferCreate
+from services import accounting_service
+
+import main  # noqa: F401  (registers every model before create_all)
+
+ACCOUNTS = 4
+OPENING = Decimal("10000.00")
+
+
+def setup():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    company = Company(name=f"Transfer Benchmark {int(time.time())}", gstin="BENCHMARK")
+    db.add(company)
+    db.flush()
+    accounts = []
+    for i in range(ACCOUNTS):
+        account = ChartOfAccount(
+            code=f"BENCH-{company.id[:8]}-{i}", name=f"Bench Bank {i}", type=AccountType.ASSET,
+            sub_type="Bank", typical_balance="Debit", opening_balance=OPENING, company_id=company.id
+        )
+        db.add(account)
+        db.flush()
+        accounts.append(account.id)
+    company_id = company.id
+    db.commit()
+    db.close()
+    return company_id, accounts
+
+
+def writer(company_id, accounts, transfers, stats, lock):
+    rng = random.Random()
+    db = SessionLocal()
+    try:
+        for n in range(transfers):
+            source, target = rng.sample(accounts, 2)
+            transfer = FundTransferCreate(
+                from_account_id=source, to_account_id=target,
+                amount=Decimal(rng.randint(1, 2500)), date=date.today(), reference=f"BENCH-{n}"
+            )
+            while True:
+                try:
+                    accounting_service.create_fund_transfer(db, transfer, company_id)
+                    outcome = "posted"
+                except HTTPException as e:
+                    db.rollback()
+                    if e.status_code == 409:
+                        with lock:
+                            stats["conflicts"] += 1
+                        continue
+                    outcome = "insufficient"
+                except Exception:
+                    db.rollback()
+                    outcome = "errors"
+                break
+            with lock:
+                stats[outcome] += 1
+    finally:
+        db.close()
+
+
+def main(writers=16, transfers=100):
+    company_id, accounts = setup()
+    stats = {"posted": 0, "insufficient": 0, "conflicts": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=writer, args=(company_id, accounts, transfers, stats, lock))
+        for _ in range(writers)
+    ]
+
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    db = SessionLocal()
+    balances = accounting_service.get_account_balances(db, company_id, accounts)
+    drift = accounting_service.verify_account_balances(db, company_id)
+    db.close()
+
+    overdrawn = [a for a, b in balances.items() if b < 0]
+    conserved = sum(balances.values()) == OPENING * ACCOUNTS
+    print(f"{writers} writers x {transfers} transfers in {elapsed:.2f}s")
+    print(f"  {stats}")
+    print(f"  {stats['posted'] / elapsed:.1f} transfers/sec")
+    print(f"  overdrawn accounts: {len(overdrawn)}, money conserved: {conserved}, balance drift rows: {len(drift)}")
+    return 0 if not overdrawn and conserved and not drift and not stats["errors"] else 1
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(main(*args))
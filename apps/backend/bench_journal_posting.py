@@ -0,0 +1,114 @@
+"""
+Posting latency benchmark for accounting_service.create_journal_entry.
+
+Creates a scratch company with a handful of accounts, posts N balanced journals
+of L lines one at a time (each in its own request-sized session, like the API),
+and prints p50 / p95 / p99 / max latency, throughput and SQL statements per
+journal. Run it against a scratch database, e.g.
+
+    DATABASE_URL=mysql+pymysql://user:pw@localhost/groweasy_bench python bench_journal_posting.py 2000 4
+    (arguments: journals, lines per journal; defaults 2000 and 2)
+
+Without DATABASE_URL it uses the configured database, so point it at a scratch
+copy or at SQLite: DATABASE_URL=sqlite:////tmp/bench_posting.db
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import event
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from db_models.core import Company
+from db_models.accounting import ChartOfAccount, AccountType
+from schemas.accounting import JournalHeaderCreate
+from services import accounting_service
+
+import main  # noqa: F401  (registers every model before create_all)
+
+ACCOUNTS = 8
+
+
+def setup():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        company = Company(name=f"Posting bench {uuid.uuid4().hex[:8]}", gstin="BENCH")
+        db.add(company)
+        db.flush()
+        company_id = company.id
+        accounts = [
+            ChartOfAccount(code=f"PB-{uuid.uuid4().hex[:10]}", name=f"Bench {i}", type=AccountType.ASSET,
+                           sub_type="Bench", company_id=company_id)
+            for i in range(ACCOUNTS)
+        ]
+        db.add_all(accounts)
+        db.commit()
+        return company_id, [a.id for a in accounts]
+    finally:
+        db.close()
+
+
+def make_journal(account_ids, lines, day):
+    amount = Decimal(random.randint(100, 100000)) / 100
+    debit_accounts = random.sample(account_ids, lines)
+    credit_account = debit_accounts.pop()
+    share = (amount / len(debit_accounts)).quantize(Decimal("0.01"))
+    rows = [{"account_id": a, "debit": share, "credit": 0} for a in debit_accounts]
+    rows.append({"account_id": credit_account, "debit": 0, "credit": share * len(debit_accounts)})
+    return JournalHeaderCreate(date=day, reference=f"PB-{uuid.uuid4().hex[:8]}", lines=rows)
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(journals, lines):
+    company_id, account_ids = setup()
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    start_day = date.today() - timedelta(days=journals // 50 + 1)
+    payloads = [make_journal(account_ids, lines, start_day + timedelta(days=i // 50)) for i in range(journals)]
+
+    event.listen(engine, "before_cursor_execute", count)
+    latencies = []
+    started = time.perf_counter()
+    try:
+        for payload in payloads:
+            db = SessionLocal()
+            try:
+                t0 = time.perf_counter()
+                accounting_service.create_journal_entry(db, payload, company_id)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            finally:
+                db.close()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{journals} journals x {lines} lines against {engine.dialect.name}")
+    print(f"  p50 {percentile(latencies, 50):.2f} ms  p95 {percentile(latencies, 95):.2f} ms  "
+          f"p99 {percentile(latencies, 99):.2f} ms  max {latencies[-1]:.2f} ms  mean {statistics.mean(latencies):.2f} ms")
+    print(f"  {journals / elapsed:.0f} journals/s, {statements[0] / journals:.1f} SQL statements per journal")
+
+    db = SessionLocal()
+    try:
+        drift = accounting_service.verify_account_balances(db, company_id)
+        print("  balances match journals" if not drift else f"  ❌ {len(drift)} balances drifted")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*(args + [2000, 2][len(args):]))
@@ -0,0 +1,96 @@
+"""
+EXPLAIN-based guard for the accounting hot paths.
+
+Runs the read paths of accounting_service (balances, as-of totals, trial
+balance, ledger, batches, batch posting validation) against the first
+company in the configured database, captures every SELECT they issue, and
+EXPLAINs it. Exits with status 1 if any query reads journal_headers or
+journal_details with a full table scan.
+
+Run it against a database with representative data: on near-empty tables
+MySQL may legitimately prefer a scan.
+
+Usage:
+    python check_query_plans.py
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datetime import date
+from fastapi import HTTPException
+from sqlalchemy import event
+from core.database import SessionLocal, engine
+from db_models.core import Company
+from db_models.accounting import ChartOfAccount
+from services import accounting_service
+
+HOT_TABLES = ("journal_headers", "journal_details")
+
+
+def capture_hot_path_queries(db, company_id, account_id):
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and any(t in statement for t in HOT_TABLES):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        today = date.today()
+        accounting_service.aggregate_journal_totals(db, company_id)
+        accounting_service.get_totals_as_of(db, company_id, today)
+        accounting_service.get_trial_balance(db, company_id, today)
+        accounting_service.get_ledger_report(db, account_id, today.replace(month=1, day=1), today, company_id)
+        accounting_service.get_batches(db, company_id)
+        try:
+            accounting_service.post_batch(db, "__plan_check__", company_id)
+        except HTTPException:
+            pass  # Expected: the batch does not exist, only its validation query matters
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        db.rollback()
+    return captured
+
+
+def full_scans(conn, statement, parameters):
+    """Return the hot tables a statement reads with a full scan."""
+    if engine.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        return [
+            table for row in rows for table in HOT_TABLES
+            if row[-1].startswith(f"SCAN {table}")
+        ]
+
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().fetchall()
+    return [row["table"] for row in rows if row["table"] in HOT_TABLES and row["type"] == "ALL"]
+
+
+def main():
+    db = SessionLocal()
+    try:
+        company = db.query(Company).first()
+        account = db.query(ChartOfAccount).filter(ChartOfAccount.company_id == company.id).first() if company else None
+        if not account:
+            print("❌ Need at least one company with a chart of accounts to check query plans")
+            return 1
+        queries = capture_hot_path_queries(db, company.id, account.id)
+    finally:
+        db.close()
+
+    failures = 0
+    with engine.connect() as conn:
+        for statement, parameters in queries:
+            scanned = full_scans(conn, statement, parameters)
+            summary = " ".join(statement.split())[:120]
+            if scanned:
+                failures += 1
+                print(f"❌ Full scan on {', '.join(sorted(set(scanned)))}: {summary}")
+            else:
+                print(f"✅ {summary}")
+
+    print(f"{len(queries)} hot-path queries checked, {failures} with full scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
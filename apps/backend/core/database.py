@@ -1,14 +1,33 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
 from core.config import settings
 from db_models.base import Base
 
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only replica for reports (see core/read_routing.py); sessions carry info["replica"]
+replica_engine = create_engine(settings.READ_REPLICA_URL, pool_pre_ping=True) if settings.READ_REPLICA_URL else None
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=replica_engine or engine, info={"replica": replica_engine is not None}
+)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def after_commit(db: Session, callback):
+    """Run callback once the session's current transaction commits; it is dropped if the transaction rolls back."""
+    db.info.setdefault("after_commit", []).append(callback)
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session):
+    session.info.pop("after_commit", None)
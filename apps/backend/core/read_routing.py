@@ -0,0 +1,146 @@
+"""
+Routing of report reads between the write primary and the read replica.
+
+A report read goes to the replica only when all of these hold:
+  - READ_REPLICA_URL is configured;
+  - the user has not written within READ_AFTER_WRITE_SECONDS, so they always see
+    their own changes. The middleware in main.py records successful writes to the
+    routed API (ROUTED_PREFIXES) in user_write_marks on the primary, so the window
+    holds whichever worker serves the next request; each worker also remembers its
+    own users' writes to skip that lookup. Without a replica nothing is recorded;
+  - the client did not ask for a primary read with `X-Read-Consistency: primary`;
+  - the replica's reported lag is known and within READ_REPLICA_MAX_LAG_SECONDS.
+    The lag is probed at most every few seconds per worker; a replica that cannot be
+    reached or has no lag query (anything but MySQL) is treated as stale.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from jose import jwt, JWTError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from core import database
+from db_models.core import UserWriteMark
+from core.cache import TTLCache
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LAG_PROBE_SECONDS = 5
+# Routers whose reports may go to the replica; writes elsewhere can't make those reports stale
+ROUTED_PREFIXES = (f"{settings.API_V1_STR}/accounting/",)
+
+# user key (JWT subject) -> time of their last write through this worker; entries expire when
+# replica reads are safe again. user_write_marks holds the same for every worker.
+recent_writes = TTLCache(ttl_seconds=settings.READ_AFTER_WRITE_SECONDS)
+_replica_lag = TTLCache(ttl_seconds=LAG_PROBE_SECONDS)
+
+
+def user_key_from_authorization(authorization: Optional[str]) -> Optional[str]:
+    """JWT subject of a bearer token, without touching the database; None if absent or invalid."""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+def records_write(method: str, path: str) -> bool:
+    """Whether a successful request with this method and path must be recorded with mark_write."""
+    return (
+        database.replica_engine is not None
+        and method not in ("GET", "HEAD", "OPTIONS")
+        and path.startswith(ROUTED_PREFIXES)
+    )
+
+
+def mark_write(user_key: Optional[str]):
+    """Record a write by the user, locally and in user_write_marks on the primary."""
+    if not user_key or database.replica_engine is None:
+        return
+    recent_writes.set(user_key, time.time())
+    row = {"user_key": user_key, "written_at": datetime.utcnow()}
+    db = database.SessionLocal()
+    try:
+        dialect = db.get_bind().dialect.name
+        if dialect == "mysql":
+            stmt = mysql_insert(UserWriteMark).values(row)
+            db.execute(stmt.on_duplicate_key_update(written_at=stmt.inserted.written_at))
+        elif dialect == "sqlite":
+            stmt = sqlite_insert(UserWriteMark).values(row)
+            db.execute(stmt.on_conflict_do_update(index_elements=[UserWriteMark.user_key],
+                                                  set_={"written_at": stmt.excluded.written_at}))
+        else:
+            db.merge(UserWriteMark(**row))
+        db.commit()
+    except SQLAlchemyError as e:
+        # Other workers may route this user's next report to the replica; reads stay correct, just lagged
+        logger.warning("Could not record write of %s for read routing: %s", user_key, e)
+    finally:
+        db.close()
+
+
+def wrote_recently(user_key: Optional[str]) -> bool:
+    if user_key is None:
+        return False
+    if recent_writes.get(user_key) is not None:
+        return True
+    db = database.SessionLocal()
+    try:
+        written_at = db.query(UserWriteMark.written_at).filter(UserWriteMark.user_key == user_key).scalar()
+    except SQLAlchemyError as e:
+        logger.warning("Could not read write marks, reading from the primary: %s", e)
+        return True
+    finally:
+        db.close()
+    return written_at is not None and written_at >= datetime.utcnow() - timedelta(seconds=settings.READ_AFTER_WRITE_SECONDS)
+
+
+def _probe_replica_lag() -> Optional[float]:
+    engine = database.replica_engine
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name != "mysql":
+                return None  # No portable lag query, so the lag is unknown
+            for statement in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+                try:
+                    row = conn.execute(text(statement)).mappings().first()
+                except SQLAlchemyError:
+                    continue  # MySQL before 8.0.22 only knows the old spelling
+                if row is None:
+                    return None  # Not replicating
+                lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+                return float(lag) if lag is not None else None
+            return None
+    except SQLAlchemyError as e:
+        logger.warning("Read replica unavailable, reading from the primary: %s", e)
+        return None
+
+
+def replica_lag_seconds() -> Optional[float]:
+    """Replication lag of the read replica in seconds, None when unknown; cached for LAG_PROBE_SECONDS."""
+    cached = _replica_lag.get("lag")
+    if cached is None:
+        cached = (_probe_replica_lag(),)
+        _replica_lag.set("lag", cached)
+    return cached[0]
+
+
+def read_source(user_key: Optional[str], consistency: Optional[str] = None) -> str:
+    """"replica" or "primary" for a report read by this user."""
+    if database.replica_engine is None:
+        return "primary"
+    if (consistency or "").lower() == "primary":
+        return "primary"
+    lag = replica_lag_seconds()
+    if lag is None or lag > settings.READ_REPLICA_MAX_LAG_SECONDS:
+        return "primary"
+    # Last, as it may look up user_write_marks on the primary
+    if wrote_recently(user_key):
+        return "primary"
+    return "replica"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, Date, CHAR, Boolean, JSON
+from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, Date, CHAR, Boolean, JSON, Index, Integer, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db_models.base import Base, UUIDMixin, TimestampMixin
 import enum
@@ -82,6 +82,11 @@ class JournalHeader(Base, UUIDMixin, TimestampMixin):
     batch_id = Column(String(50), nullable=True)
     lines = relationship("JournalDetail", back_populates="header", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index('idx_journal_company_status_date', 'company_id', 'status', 'date'),
+        Index('idx_journal_company_batch', 'company_id', 'batch_id', 'status'),
+    )
+
 class JournalDetail(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "journal_details"
     journal_id = Column(ForeignKey("journal_headers.id"), nullable=False)
@@ -93,6 +98,29 @@ class JournalDetail(Base, UUIDMixin, TimestampMixin):
 
     header = relationship("JournalHeader", back_populates="lines")
 
+    __table_args__ = (
+        Index('idx_journal_detail_account', 'account_id', 'journal_id'),
+        Index('idx_journal_detail_journal', 'journal_id'),
+    )
+
+class AccountBalance(Base, TimestampMixin):
+    """Running posted totals per account, maintained in the posting transaction."""
+    __tablename__ = "account_balances"
+    company_id = Column(ForeignKey("companies.id"), primary_key=True)
+    account_id = Column(ForeignKey("chart_of_accounts.id"), primary_key=True)
+    total_debit = Column(Numeric(20, 2), default=0.00, nullable=False)
+    total_credit = Column(Numeric(20, 2), default=0.00, nullable=False)
+    version = Column(Integer, default=0, nullable=False)  # Bumped on every posting, for optimistic checks
+
+class AccountBalanceSnapshot(Base, TimestampMixin):
+    """Cumulative posted totals per account at the close of a calendar month."""
+    __tablename__ = "account_balance_snapshots"
+    company_id = Column(ForeignKey("companies.id"), primary_key=True)
+    period_end = Column(Date, primary_key=True)
+    account_id = Column(ForeignKey("chart_of_accounts.id"), primary_key=True)
+    total_debit = Column(Numeric(20, 2), default=0.00, nullable=False)
+    total_credit = Column(Numeric(20, 2), default=0.00, nullable=False)
+
 class PaymentHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "payment_headers"
     date = Column(Date, nullable=False)
@@ -101,11 +129,23 @@ class PaymentHeader(Base, UUIDMixin, TimestampMixin):
     account_id = Column(ForeignKey("chart_of_accounts.id"), nullable=False)
     mode = Column(String(50), nullable=True)
     company_id = Column(ForeignKey("companies.id"), nullable=False)
+    # Client-supplied Idempotency-Key and a hash of the request it was first used with
+    idempotency_key = Column(String(100), nullable=True)
+    request_hash = Column(CHAR(64), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "idempotency_key", name="uq_payment_idempotency_key"),
+        Index("idx_payment_company_date", "company_id", "date"),
+    )
 
     allocations = relationship("PaymentDetail", back_populates="header", cascade="all, delete-orphan")
 
 class PaymentDetail(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "payment_details"
+    __table_args__ = (
+        Index("idx_payment_detail_invoice", "invoice_id"),
+        Index("idx_payment_detail_payment", "payment_id"),  # MySQL reuses it as the foreign key index
+    )
     payment_id = Column(ForeignKey("payment_headers.id"), nullable=False)
     invoice_id = Column(CHAR(36), nullable=False)  # Link to sales/purchase invoice
     amount_allocated = Column(Numeric(20, 2), nullable=False)
@@ -113,6 +153,25 @@ class PaymentDetail(Base, UUIDMixin, TimestampMixin):
 
     header = relationship("PaymentHeader", back_populates="allocations")
 
+class InvoiceOutstanding(Base, TimestampMixin):
+    """
+    Running settlement state of a sales invoice, maintained by allocation_service on
+    payment and credit note posting and resynced whenever an invoice's total, status
+    or dates are flushed (draft and cancelled invoices have 0 outstanding). Reads still
+    compare invoice_total and status with the invoice, to catch writes made outside the
+    ORM. The invoice dates are copied here so receivables ageing reads only this table.
+    """
+    __tablename__ = "invoice_outstanding"
+    __table_args__ = (Index("idx_invoice_outstanding_open", "company_id", "outstanding", "due_date", "date"),)
+    invoice_id = Column(ForeignKey("invoice_headers.id"), primary_key=True)
+    company_id = Column(ForeignKey("companies.id"), nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    due_date = Column(Date, nullable=False)
+    invoice_total = Column(Numeric(20, 2), nullable=False)
+    paid_amount = Column(Numeric(20, 2), default=0.00, nullable=False)
+    credited_amount = Column(Numeric(20, 2), default=0.00, nullable=False)
+    outstanding = Column(Numeric(20, 2), nullable=False)
+
 class BudgetHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "budget_headers"
     period_start = Column(Date, nullable=False)
@@ -133,6 +192,7 @@ class BudgetDetail(Base, UUIDMixin, TimestampMixin):
 
 class DebitNoteHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "debit_note_headers"
+    __table_args__ = (Index("idx_debit_note_bill", "reference_bill_id"),)
     vendor_id = Column(CHAR(36), nullable=False)
     date = Column(Date, nullable=False)
     total_amount = Column(Numeric(20, 2), nullable=False)
@@ -140,6 +200,7 @@ class DebitNoteHeader(Base, UUIDMixin, TimestampMixin):
     status = Column(String(50), default="Draft")
     reference_bill_id = Column(CHAR(36), nullable=True)
     notes = Column(String(500), nullable=True)
+    journal_id = Column(CHAR(36), nullable=True)  # Set once the note is posted to the ledger
     company_id = Column(ForeignKey("companies.id"), nullable=False)
 
     lines = relationship("DebitNoteDetail", back_populates="header", cascade="all, delete-orphan")
@@ -157,6 +218,10 @@ class DebitNoteDetail(Base, UUIDMixin, TimestampMixin):
 
 class CreditNoteHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "credit_note_headers"
+    __table_args__ = (
+        Index("idx_credit_note_invoice", "reference_invoice_id"),
+        Index("idx_credit_note_company_date", "company_id", "date"),
+    )
     customer_id = Column(CHAR(36), nullable=False)
     date = Column(Date, nullable=False)
     total_amount = Column(Numeric(20, 2), nullable=False)
@@ -164,6 +229,7 @@ class CreditNoteHeader(Base, UUIDMixin, TimestampMixin):
     status = Column(String(50), default="Draft")
     reference_invoice_id = Column(CHAR(36), nullable=True)
     notes = Column(String(500), nullable=True)
+    journal_id = Column(CHAR(36), nullable=True)  # Set once the note is posted to the ledger
     company_id = Column(ForeignKey("companies.id"), nullable=False)
 
     lines = relationship("CreditNoteDetail", back_populates="header", cascade="all, delete-orphan")
@@ -179,6 +245,22 @@ class CreditNoteDetail(Base, UUIDMixin, TimestampMixin):
 
     header = relationship("CreditNoteHeader", back_populates="lines")
 
+class NoteAccountMapping(Base, UUIDMixin, TimestampMixin):
+    """
+    Ledger accounts a debit or credit note posts to. The row without a reason is the
+    company default for the note type; a row for a specific reason overrides it.
+    Credit notes debit the amount and tax accounts and credit the party (receivables)
+    account; debit notes do the reverse against payables.
+    """
+    __tablename__ = "note_account_mappings"
+    __table_args__ = (UniqueConstraint("company_id", "note_type", "reason", name="uq_note_account_mapping"),)
+    note_type = Column(String(10), nullable=False)  # "debit" or "credit"
+    reason = Column(String(20), nullable=True)  # DebitReason / CreditReason value, NULL for the default
+    party_account_id = Column(ForeignKey("chart_of_accounts.id"), nullable=False)
+    amount_account_id = Column(ForeignKey("chart_of_accounts.id"), nullable=False)
+    tax_account_id = Column(ForeignKey("chart_of_accounts.id"), nullable=True)
+    company_id = Column(ForeignKey("companies.id"), nullable=False)
+
 class FundTransfer(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "fund_transfers"
     from_account_id = Column(ForeignKey("chart_of_accounts.id"), nullable=False)
@@ -191,3 +273,36 @@ class FundTransfer(Base, UUIDMixin, TimestampMixin):
     company_id = Column(ForeignKey("companies.id"), nullable=False)
     journal_id = Column(ForeignKey("journal_headers.id"), nullable=True)
 
+
+class PeriodCloseJob(Base, UUIDMixin, TimestampMixin):
+    """One month-end close run across many companies; re-running resumes unfinished tasks."""
+    __tablename__ = "period_close_jobs"
+    period_end = Column(Date, nullable=False, index=True)
+    status = Column(String(50), default="Pending", nullable=False)  # Pending, Running, Completed, Failed
+    total_companies = Column(Integer, default=0, nullable=False)
+    completed = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    workers = Column(Integer, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    tasks = relationship("PeriodCloseTask", back_populates="job", cascade="all, delete-orphan")
+
+class PeriodCloseTask(Base, UUIDMixin, TimestampMixin):
+    """Progress and per-step timings of one company within a period close job."""
+    __tablename__ = "period_close_tasks"
+    __table_args__ = (
+        UniqueConstraint("job_id", "company_id", name="uq_period_close_task"),
+        Index("idx_period_close_task_status", "job_id", "status"),
+    )
+    job_id = Column(ForeignKey("period_close_jobs.id"), nullable=False)
+    company_id = Column(ForeignKey("companies.id"), nullable=False)
+    status = Column(String(50), default="Pending", nullable=False)  # Pending, Running, Done, Failed
+    attempts = Column(Integer, default=0, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    elapsed_ms = Column(Integer, nullable=True)
+    timings = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    job = relationship("PeriodCloseJob", back_populates="tasks")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey
+from sqlalchemy import Column, String, Enum, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from db_models.base import Base, UUIDMixin, TimestampMixin
 import enum
@@ -28,3 +28,9 @@ class User(Base, UUIDMixin, TimestampMixin):
     
     company_id = Column(ForeignKey("companies.id"), nullable=False)
     company = relationship("Company", back_populates="users")
+
+class UserWriteMark(Base):
+    """Time of each user's last write, shared by all API workers for read-after-write routing."""
+    __tablename__ = "user_write_marks"
+    user_key = Column(String(255), primary_key=True)  # JWT subject
+    written_at = Column(DateTime, nullable=False)
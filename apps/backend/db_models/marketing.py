@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, CHAR, Index
+from sqlalchemy import Column, String, Integer, Float, Boolean, Date, DateTime, ForeignKey, Text, CHAR, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -40,6 +40,9 @@ class BusinessLead(Base):
     
     # Contact Information
     phone = Column(String(50), index=True)
+    # Digits of phone, as-is and reversed, for prefix and suffix lookups (see lead_search_service)
+    phone_digits = Column(String(50), index=True)
+    phone_digits_rev = Column(String(50), index=True)
     email = Column(String(255))
     address = Column(Text)
     city = Column(String(100), index=True)
@@ -93,9 +96,31 @@ class BusinessLead(Base):
     __table_args__ = (
         Index('idx_score_status', 'lead_score', 'lead_status'),
         Index('idx_city_category', 'city', 'category'),
+        # Keyset pagination of the lead listing (lead_score DESC, created_at DESC, id DESC)
+        Index('idx_lead_score_created_id', 'lead_score', 'created_at', 'id'),
+        # Name search; n-gram tokens so substrings of names match like the old ILIKE did
+        Index('ft_lead_business_name', 'business_name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),
     )
 
 
+class LeadDailyRollup(Base):
+    """
+    Lead count and lead score sum per creation day and (source, status, city, category),
+    kept in step with marketing_business_leads by marketing_service; the analytics
+    endpoints read this instead of the leads. Missing dimensions are stored as ''.
+    """
+    __tablename__ = "marketing_lead_daily_rollups"
+
+    day = Column(Date, primary_key=True)
+    source = Column(String(50), primary_key=True, default='')
+    status = Column(String(50), primary_key=True, default='')
+    city = Column(String(100), primary_key=True, default='')
+    category = Column(String(100), primary_key=True, default='')
+
+    lead_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+
+
 class LeadActivity(Base):
     __tablename__ = "marketing_lead_activities"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, DateTime, CHAR, Boolean, Date
+from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, DateTime, CHAR, Boolean, Date, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db_models.base import Base, UUIDMixin, TimestampMixin
 import enum
@@ -9,6 +9,11 @@ class PaymentMode(str, enum.Enum):
     UPI = "UPI"
     OTHER = "Other"
 
+class ChequeStatus(str, enum.Enum):
+    DEPOSITED = "Deposited"
+    CLEARED = "Cleared"
+    BOUNCED = "Bounced"
+
 class POSSaleHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "pos_sale_headers"
     date = Column(DateTime, nullable=False)
@@ -62,10 +67,17 @@ class BankTransactionHeader(Base, UUIDMixin, TimestampMixin):
     total_amount = Column(Numeric(20, 2), nullable=False)
     reconciled = Column(Boolean, default=False)
     bank_account_id = Column(CHAR(36), nullable=True)
+    transaction_type = Column(String(20), nullable=False, default="Deposit")
+    reference = Column(String(100), nullable=True)
     company_id = Column(ForeignKey("companies.id"), nullable=False)
 
     lines = relationship("BankTransactionDetail", back_populates="header", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Deposit listing: newest first per company and type, keyset on (date, id)
+        Index('idx_bank_tx_company_type_date', 'company_id', 'transaction_type', 'date', 'id'),
+    )
+
 class BankTransactionDetail(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "bank_transaction_details"
     tx_id = Column(ForeignKey("bank_transaction_headers.id"), nullable=False)
@@ -73,5 +85,33 @@ class BankTransactionDetail(Base, UUIDMixin, TimestampMixin):
     amount = Column(Numeric(20, 2), nullable=False)
     cheque_no = Column(String(50), nullable=True)
     match_id = Column(CHAR(36), nullable=True)  # Link to payment_headers or allocations
+    cheque_status = Column(String(20), nullable=False, default=ChequeStatus.DEPOSITED.value)
+    status_date = Column(Date, nullable=True)  # Date the bank cleared or returned the cheque
+    bounce_reason = Column(String(255), nullable=True)
+    journal_id = Column(CHAR(36), nullable=True)  # Journal posted when the cheque cleared
 
     header = relationship("BankTransactionHeader", back_populates="lines")
+
+    __table_args__ = (
+        # Clearing files are matched by cheque number
+        Index('idx_bank_tx_detail_cheque', 'cheque_no', 'cheque_status'),
+    )
+
+class BankStatementLine(Base, UUIDMixin, TimestampMixin):
+    """A line imported from a bank statement, matched against book entries by the reconciliation engine."""
+    __tablename__ = "bank_statement_lines"
+    bank_account_id = Column(CHAR(36), nullable=False, index=True)
+    statement_date = Column(Date, nullable=False)
+    date = Column(Date, nullable=False)
+    description = Column(String(500), nullable=True)
+    amount = Column(Numeric(20, 2), nullable=False)  # Positive = money in, negative = money out
+    cheque_no = Column(String(50), nullable=True)
+    match_type = Column(String(20), nullable=True)  # "deposit" (bank_transaction_details) or "payment" (payment_headers)
+    match_id = Column(CHAR(36), nullable=True, index=True)
+    # Hash of (account, date, amount, cheque number or description, occurrence); see reconciliation_service
+    fingerprint = Column(CHAR(64), nullable=True)
+    company_id = Column(ForeignKey("companies.id"), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "bank_account_id", "fingerprint", name="uq_statement_line_fingerprint"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, Date, CHAR
+from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, Date, CHAR, Index
 from sqlalchemy.orm import relationship
 from db_models.base import Base, UUIDMixin, TimestampMixin
 import enum
@@ -92,6 +92,10 @@ class PurchaseOrderDetail(Base, UUIDMixin, TimestampMixin):
 
 class BillHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "bill_headers"
+    __table_args__ = (
+        Index("idx_bill_company_status_due", "company_id", "status", "due_date"),
+        Index("idx_bill_company_vendor", "company_id", "vendor_id"),
+    )
     vendor_id = Column(CHAR(36), nullable=False)
     date = Column(Date, nullable=False)
     due_date = Column(Date, nullable=True)
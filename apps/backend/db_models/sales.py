@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, Date, CHAR
+from sqlalchemy import Column, String, Enum, ForeignKey, Numeric, Date, CHAR, Index
 from sqlalchemy.orm import relationship
 from db_models.base import Base, UUIDMixin, TimestampMixin
 import enum
@@ -51,6 +51,7 @@ class QuoteDetail(Base, UUIDMixin, TimestampMixin):
 
 class SalesOrderHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "sales_order_headers"
+    __table_args__ = (Index("idx_sales_order_company_customer", "company_id", "customer_id"),)
     customer_id = Column(CHAR(36), nullable=False)
     date = Column(Date, nullable=False)
     total = Column(Numeric(20, 2), nullable=False)
@@ -74,6 +75,10 @@ class SalesOrderDetail(Base, UUIDMixin, TimestampMixin):
 
 class InvoiceHeader(Base, UUIDMixin, TimestampMixin):
     __tablename__ = "invoice_headers"
+    __table_args__ = (
+        Index("idx_invoice_company_status_due", "company_id", "status", "due_date"),
+        Index("idx_invoice_order", "order_id"),
+    )
     order_id = Column(ForeignKey("sales_order_headers.id"), nullable=False)
     date = Column(Date, nullable=False)
     due_date = Column(Date, nullable=False)
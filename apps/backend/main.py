@@ -1,7 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from api.api import api_router
 from core.config import settings
+from core import read_routing
 from core.database import engine, Base
 import db_models.core
 import db_models.accounting
@@ -31,8 +33,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Read-Source"],
 )
 
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    # Report reads of a user who just wrote go to the primary (see core/read_routing.py)
+    response = await call_next(request)
+    if response.status_code < 400 and read_routing.records_write(request.method, request.url.path):
+        user_key = read_routing.user_key_from_authorization(request.headers.get("authorization"))
+        if user_key:
+            await run_in_threadpool(read_routing.mark_write, user_key)
+    return response
+
 from api.v1 import crm, marketing
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -0,0 +1,72 @@
+"""
+Migration 2026-10-18: composite indexes for the accounting hot paths.
+
+    journal_headers (company_id, status, date)   balances, snapshots, ledger, trial balance
+    journal_headers (company_id, batch_id, status) batch listing and posting
+    journal_details (account_id, journal_id)     per-account aggregates and ledger lines
+    journal_details (journal_id)                 header -> lines joins
+    invoice_headers (company_id, status, due_date) receivables ageing
+    bill_headers (company_id, status, due_date)  payables ageing
+    payment_details (invoice_id)                 settled amounts per invoice / bill
+    credit_note_headers (reference_invoice_id)   credited amounts per invoice
+    debit_note_headers (reference_bill_id)       debited amounts per bill
+    sales_order_headers (company_id, customer_id) + invoice_headers (order_id)
+                                                 per-customer ageing drill-down
+    bill_headers (company_id, vendor_id)         per-vendor ageing drill-down
+    payment_headers (company_id, date)           payments dated after an ageing as_of date
+    credit_note_headers (company_id, date)       credit notes dated after an ageing as_of date
+
+Indexes are built online (ALGORITHM=INPLACE, LOCK=NONE) so posting keeps
+running while they build. Already-present indexes are skipped, so the script
+can be re-run safely.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from core.database import engine
+
+INDEXES = [
+    ("journal_headers", "idx_journal_company_status_date", "company_id, status, date"),
+    ("journal_headers", "idx_journal_company_batch", "company_id, batch_id, status"),
+    ("journal_details", "idx_journal_detail_account", "account_id, journal_id"),
+    ("journal_details", "idx_journal_detail_journal", "journal_id"),
+    ("invoice_headers", "idx_invoice_company_status_due", "company_id, status, due_date"),
+    ("bill_headers", "idx_bill_company_status_due", "company_id, status, due_date"),
+    ("payment_details", "idx_payment_detail_invoice", "invoice_id"),
+    ("credit_note_headers", "idx_credit_note_invoice", "reference_invoice_id"),
+    ("debit_note_headers", "idx_debit_note_bill", "reference_bill_id"),
+    ("sales_order_headers", "idx_sales_order_company_customer", "company_id, customer_id"),
+    ("invoice_headers", "idx_invoice_order", "order_id"),
+    ("bill_headers", "idx_bill_company_vendor", "company_id, vendor_id"),
+    ("payment_headers", "idx_payment_company_date", "company_id, date"),
+    ("credit_note_headers", "idx_credit_note_company_date", "company_id, date"),
+]
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def migrate_accounting_indexes():
+    with engine.connect() as conn:
+        for table, name, columns in INDEXES:
+            if index_exists(conn, table, name):
+                print(f"ℹ️  {table}.{name} already exists")
+                continue
+            try:
+                conn.execute(text(
+                    f"ALTER TABLE {table} ADD INDEX {name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE"
+                ))
+                print(f"✅ Added {table}.{name} ({columns})")
+            except Exception as e:
+                print(f"❌ Error adding {table}.{name}: {e}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_accounting_indexes()
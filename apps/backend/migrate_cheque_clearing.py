@@ -0,0 +1,69 @@
+"""
+Migration 2026-10-18: cheque clearing lifecycle on bank deposits.
+
+    bank_transaction_headers.transaction_type / reference
+        + INDEX (company_id, transaction_type, date, id)   deposit listing
+    bank_transaction_details.cheque_status / status_date / bounce_reason / journal_id
+        + INDEX (cheque_no, cheque_status)                 clearing file lookups
+
+Existing headers were all written by the cheque deposit endpoint, so they become
+'Deposit'; existing cheques start as 'Deposited'. Safe to re-run: existing
+columns and indexes are skipped.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from core.database import engine
+
+COLUMNS = [
+    ("bank_transaction_headers", "transaction_type", "VARCHAR(20) NOT NULL DEFAULT 'Deposit'"),
+    ("bank_transaction_headers", "reference", "VARCHAR(100) NULL"),
+    ("bank_transaction_details", "cheque_status", "VARCHAR(20) NOT NULL DEFAULT 'Deposited'"),
+    ("bank_transaction_details", "status_date", "DATE NULL"),
+    ("bank_transaction_details", "bounce_reason", "VARCHAR(255) NULL"),
+    ("bank_transaction_details", "journal_id", "CHAR(36) NULL"),
+]
+
+INDEXES = [
+    ("bank_transaction_headers", "idx_bank_tx_company_type_date", "company_id, transaction_type, date, id"),
+    ("bank_transaction_details", "idx_bank_tx_detail_cheque", "cheque_no, cheque_status"),
+]
+
+
+def column_exists(conn, table, column):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column})
+    return result.scalar() > 0
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def migrate_cheque_clearing():
+    with engine.connect() as conn:
+        for table, column, definition in COLUMNS:
+            if column_exists(conn, table, column):
+                print(f"ℹ️  {table}.{column} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            print(f"✅ Added {table}.{column}")
+
+        for table, name, columns in INDEXES:
+            if index_exists(conn, table, name):
+                print(f"ℹ️  {table}.{name} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD INDEX {name} ({columns}), ALGORITHM=INPLACE, LOCK=NONE"))
+            print(f"✅ Added {table}.{name}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_cheque_clearing()
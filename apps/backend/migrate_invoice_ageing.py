@@ -0,0 +1,97 @@
+"""
+Migration 2026-10-18: receivables ageing from the invoice outstanding index.
+
+    invoice_outstanding.date / due_date          copied from the invoice
+        + INDEX (company_id, outstanding, due_date, date)   open invoices, read without joins
+
+The index used to be seeded lazily on an invoice's first allocation. Every invoice
+without a row, or with a row from before this migration, is synced here from its
+payments and credit notes; after that, invoice writes keep it current. The new code
+writes the date columns, so run it in two steps (each safe to re-run):
+
+    python migrate_invoice_ageing.py --columns   # before deploying: add the columns, nullable
+    python migrate_invoice_ageing.py             # after deploying: sync, NOT NULL, index
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text, or_
+from core.database import engine, SessionLocal
+from db_models.accounting import InvoiceOutstanding
+from db_models.sales import InvoiceHeader
+from services import allocation_service
+
+TABLE = "invoice_outstanding"
+INDEX = "idx_invoice_outstanding_open"
+BACKFILL_CHUNK = 1000
+
+
+def column_exists(conn, table, column):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column})
+    return result.scalar() > 0
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def backfill_invoice_outstanding():
+    db = SessionLocal()
+    try:
+        backfilled = 0
+        while True:
+            pending = db.query(InvoiceHeader.company_id, InvoiceHeader.id).outerjoin(
+                InvoiceOutstanding, InvoiceOutstanding.invoice_id == InvoiceHeader.id
+            ).filter(or_(InvoiceOutstanding.invoice_id == None, InvoiceOutstanding.due_date == None)).limit(
+                BACKFILL_CHUNK
+            ).all()
+            if not pending:
+                break
+            by_company = {}
+            for company_id, invoice_id in pending:
+                by_company.setdefault(company_id, []).append(invoice_id)
+            for company_id, invoice_ids in by_company.items():
+                allocation_service.sync_invoice_outstanding(db, company_id, invoice_ids)
+            db.commit()
+            backfilled += len(pending)
+        print(f"✅ Synced {backfilled} invoices into {TABLE}")
+    finally:
+        db.close()
+
+
+def migrate_invoice_ageing(args):
+    with engine.connect() as conn:
+        for column in ("date", "due_date"):
+            if column_exists(conn, TABLE, column):
+                print(f"ℹ️  {TABLE}.{column} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN {column} DATE NULL"))
+            print(f"✅ Added {TABLE}.{column}")
+        conn.commit()
+    if "--columns" in args:
+        return
+
+    backfill_invoice_outstanding()
+
+    with engine.connect() as conn:
+        conn.execute(text(f"ALTER TABLE {TABLE} MODIFY COLUMN date DATE NOT NULL, MODIFY COLUMN due_date DATE NOT NULL"))
+        if index_exists(conn, TABLE, INDEX):
+            print(f"ℹ️  {TABLE}.{INDEX} already exists")
+        else:
+            conn.execute(text(
+                f"ALTER TABLE {TABLE} ADD INDEX {INDEX} (company_id, outstanding, due_date, date), "
+                "ALGORITHM=INPLACE, LOCK=NONE"
+            ))
+            print(f"✅ Added {TABLE}.{INDEX}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_invoice_ageing(sys.argv[1:])
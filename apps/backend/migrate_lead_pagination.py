@@ -0,0 +1,48 @@
+"""
+Migration 2026-10-18: keyset pagination for the marketing lead listing.
+
+    marketing_business_leads (lead_score, created_at, id)   idx_lead_score_created_id
+
+Keyset comparisons skip rows with NULL sort keys, so NULL lead_score / created_at
+(possible on rows written outside marketing_service) are backfilled first.
+The index is built online (ALGORITHM=INPLACE, LOCK=NONE); re-running skips it.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from core.database import engine
+
+TABLE = "marketing_business_leads"
+INDEX = "idx_lead_score_created_id"
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def migrate_lead_pagination():
+    with engine.connect() as conn:
+        scores = conn.execute(text(f"UPDATE {TABLE} SET lead_score = 0 WHERE lead_score IS NULL")).rowcount
+        created = conn.execute(text(
+            f"UPDATE {TABLE} SET created_at = COALESCE(updated_at, UTC_TIMESTAMP()) WHERE created_at IS NULL"
+        )).rowcount
+        conn.commit()
+        print(f"✅ Backfilled {scores} lead scores and {created} creation times")
+
+        if index_exists(conn, TABLE, INDEX):
+            print(f"ℹ️  {TABLE}.{INDEX} already exists")
+        else:
+            conn.execute(text(
+                f"ALTER TABLE {TABLE} ADD INDEX {INDEX} (lead_score, created_at, id), ALGORITHM=INPLACE, LOCK=NONE"
+            ))
+            print(f"✅ Added {TABLE}.{INDEX}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_lead_pagination()
@@ -0,0 +1,48 @@
+"""
+Migration 2026-10-18: daily lead rollups for the marketing analytics endpoints.
+
+    marketing_lead_daily_rollups table (day, source, status, city, category -> lead_count, score_sum)
+
+Creates the table and fills it from marketing_business_leads in one INSERT ... SELECT;
+from then on the lead write paths keep it current. Deploy the code first, so no lead
+written between the backfill and the deploy is missed.
+
+Usage:
+    python migrate_lead_rollups.py              # create, and backfill if empty
+    python migrate_lead_rollups.py --rebuild    # recompute every rollup from the leads
+    python migrate_lead_rollups.py --verify     # report drift only, exit 1 if any
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from db_models.marketing import LeadDailyRollup
+from services import lead_rollup_service
+
+import main  # noqa: F401  (registers every model before create_all)
+
+
+def migrate_lead_rollups(args):
+    Base.metadata.create_all(bind=engine)  # marketing_lead_daily_rollups
+    db = SessionLocal()
+    try:
+        if "--verify" in args:
+            drift = lead_rollup_service.verify_lead_rollups(db)
+            for key, (stored, actual) in sorted(drift.items()):
+                print(f"{key}: stored {stored[0]} leads / score {stored[1]}, leads {actual[0]} / score {actual[1]}")
+            print(f"❌ {len(drift)} rollups drifted" if drift else "✓ rollups match leads")
+            return 1 if drift else 0
+
+        if "--rebuild" not in args and db.query(LeadDailyRollup).first():
+            print("ℹ️  marketing_lead_daily_rollups already filled (use --rebuild to recompute)")
+            return 0
+        count = lead_rollup_service.rebuild_lead_rollups(db)
+        print(f"✅ Built {count} daily lead rollups")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(migrate_lead_rollups(sys.argv[1:]))
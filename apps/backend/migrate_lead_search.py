@@ -0,0 +1,92 @@
+"""
+Migration 2026-10-18: search indexes for marketing leads.
+
+    marketing_business_leads.phone_digits / phone_digits_rev + indexes   phone prefix / suffix lookups
+    FULLTEXT ft_lead_business_name (business_name) WITH PARSER ngram     name search
+
+phone_digits is backfilled in batches from phone (MySQL 8 REGEXP_REPLACE), with the
++91 country code or trunk 0 dropped like lead_search_service.phone_keys does. The
+first FULLTEXT index on a table rebuilds it to add FTS_DOC_ID, so run this in a
+quiet window; the other indexes are built online. Safe to re-run.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from core.database import engine
+
+TABLE = "marketing_business_leads"
+BATCH_SIZE = 10000
+DIGITS = "REGEXP_REPLACE(phone, '[^0-9]', '')"
+
+COLUMNS = [
+    ("phone_digits", "VARCHAR(50) NULL"),
+    ("phone_digits_rev", "VARCHAR(50) NULL"),
+]
+
+INDEXES = [
+    ("ix_marketing_business_leads_phone_digits", "INDEX", "(phone_digits)", "ALGORITHM=INPLACE, LOCK=NONE"),
+    ("ix_marketing_business_leads_phone_digits_rev", "INDEX", "(phone_digits_rev)", "ALGORITHM=INPLACE, LOCK=NONE"),
+    ("ft_lead_business_name", "FULLTEXT INDEX", "(business_name) WITH PARSER ngram", "ALGORITHM=INPLACE, LOCK=SHARED"),
+]
+
+
+def column_exists(conn, table, column):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column})
+    return result.scalar() > 0
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def migrate_lead_search():
+    with engine.connect() as conn:
+        for column, definition in COLUMNS:
+            if column_exists(conn, TABLE, column):
+                print(f"ℹ️  {TABLE}.{column} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN {column} {definition}"))
+            print(f"✅ Added {TABLE}.{column}")
+        conn.commit()
+
+        # Phones without a digit stay NULL and are never picked up again
+        backfilled = 0
+        while True:
+            # Same keys as lead_search_service.phone_keys: national digits, +91 / trunk 0 dropped.
+            # MySQL applies SET left to right, so phone_digits_rev sees the new phone_digits.
+            updated = conn.execute(text(f"""
+                UPDATE {TABLE}
+                SET phone_digits = CASE
+                        WHEN CHAR_LENGTH({DIGITS}) = 12 AND {DIGITS} LIKE '91%' THEN SUBSTRING({DIGITS}, 3)
+                        WHEN CHAR_LENGTH({DIGITS}) = 11 AND {DIGITS} LIKE '0%' THEN SUBSTRING({DIGITS}, 2)
+                        ELSE NULLIF({DIGITS}, '')
+                    END,
+                    phone_digits_rev = REVERSE(phone_digits)
+                WHERE phone_digits IS NULL AND phone REGEXP '[0-9]'
+                LIMIT {BATCH_SIZE}
+            """)).rowcount
+            conn.commit()
+            backfilled += updated
+            if updated < BATCH_SIZE:
+                break
+        print(f"✅ Backfilled phone digits of {backfilled} leads")
+
+        for name, kind, columns, options in INDEXES:
+            if index_exists(conn, TABLE, name):
+                print(f"ℹ️  {TABLE}.{name} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD {kind} {name} {columns}, {options}"))
+            print(f"✅ Added {TABLE}.{name}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_lead_search()
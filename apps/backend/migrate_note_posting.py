@@ -0,0 +1,46 @@
+"""
+Migration 2026-10-18: posting debit and credit notes to the general ledger.
+
+    debit_note_headers.journal_id / credit_note_headers.journal_id
+    note_account_mappings table (ledger accounts per note type and reason)
+
+Notes created before this migration have no journal; post them with
+POST /accounting/notes/post once the account mappings are set up.
+Safe to re-run: existing columns are skipped.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from core.database import engine
+from db_models.base import Base
+import main  # noqa: F401  (registers every model before create_all)
+
+COLUMNS = [
+    ("debit_note_headers", "journal_id", "CHAR(36) NULL"),
+    ("credit_note_headers", "journal_id", "CHAR(36) NULL"),
+]
+
+
+def column_exists(conn, table, column):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column})
+    return result.scalar() > 0
+
+
+def migrate_note_posting():
+    Base.metadata.create_all(bind=engine)  # note_account_mappings
+    with engine.connect() as conn:
+        for table, column, definition in COLUMNS:
+            if column_exists(conn, table, column):
+                print(f"ℹ️  {table}.{column} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            print(f"✅ Added {table}.{column}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_note_posting()
@@ -0,0 +1,61 @@
+"""
+Migration 2026-10-18: idempotency keys on payments and the invoice outstanding index.
+
+    payment_headers.idempotency_key / request_hash + UNIQUE (company_id, idempotency_key)
+    invoice_outstanding table (seeded lazily per invoice on first allocation)
+
+Safe to re-run: existing columns and indexes are skipped.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from core.database import engine
+from db_models.base import Base
+import main  # noqa: F401  (registers every model before create_all)
+
+COLUMNS = [
+    ("payment_headers", "idempotency_key", "VARCHAR(100) NULL"),
+    ("payment_headers", "request_hash", "CHAR(64) NULL"),
+]
+
+
+def column_exists(conn, table, column):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column})
+    return result.scalar() > 0
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def migrate_payment_idempotency():
+    Base.metadata.create_all(bind=engine)  # invoice_outstanding
+    with engine.connect() as conn:
+        for table, column, definition in COLUMNS:
+            if column_exists(conn, table, column):
+                print(f"ℹ️  {table}.{column} already exists")
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            print(f"✅ Added {table}.{column}")
+
+        if index_exists(conn, "payment_headers", "uq_payment_idempotency_key"):
+            print("ℹ️  payment_headers.uq_payment_idempotency_key already exists")
+        else:
+            conn.execute(text(
+                "ALTER TABLE payment_headers ADD UNIQUE INDEX uq_payment_idempotency_key "
+                "(company_id, idempotency_key), ALGORITHM=INPLACE, LOCK=NONE"
+            ))
+            print("✅ Added payment_headers.uq_payment_idempotency_key")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_payment_idempotency()
@@ -0,0 +1,100 @@
+"""
+Migration 2026-10-18: de-duplicate imported bank statement lines.
+
+    bank_statement_lines.fingerprint
+        + UNIQUE (company_id, bank_account_id, fingerprint)   skip lines already imported
+
+Lines imported before this migration get their fingerprint computed here, per bank
+account in import order, the same way reconciliation_service does for new uploads.
+Statements that were already uploaded twice keep both copies (their fingerprints
+differ by occurrence); re-uploading either is skipped from now on. Safe to re-run:
+only lines without a fingerprint are backfilled.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text, update
+from core.database import engine, SessionLocal
+from db_models.pos_banking import BankStatementLine
+from services.reconciliation_service import line_fingerprints
+
+TABLE = "bank_statement_lines"
+INDEX = "uq_statement_line_fingerprint"
+
+
+def column_exists(conn, table, column):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND COLUMN_NAME = :column
+    """), {"table": table, "column": column})
+    return result.scalar() > 0
+
+
+def index_exists(conn, table, name):
+    result = conn.execute(text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND INDEX_NAME = :name
+    """), {"table": table, "name": name})
+    return result.scalar() > 0
+
+
+def backfill_fingerprints():
+    db = SessionLocal()
+    try:
+        accounts = db.query(BankStatementLine.company_id, BankStatementLine.bank_account_id).filter(
+            BankStatementLine.fingerprint == None
+        ).distinct().all()
+        backfilled = 0
+        for company_id, bank_account_id in accounts:
+            lines = db.query(
+                BankStatementLine.id, BankStatementLine.date, BankStatementLine.amount,
+                BankStatementLine.cheque_no, BankStatementLine.description
+            ).filter(
+                BankStatementLine.company_id == company_id,
+                BankStatementLine.bank_account_id == bank_account_id
+            ).order_by(BankStatementLine.created_at, BankStatementLine.id).all()
+            # Numbered over every line of the account, so occurrences continue past lines fingerprinted earlier
+            fingerprints = line_fingerprints(bank_account_id, [line._asdict() for line in lines])
+            existing = {f for (f,) in db.query(BankStatementLine.fingerprint).filter(
+                BankStatementLine.company_id == company_id,
+                BankStatementLine.bank_account_id == bank_account_id,
+                BankStatementLine.fingerprint != None
+            ).all()}
+            rows = [
+                {"id": line.id, "fingerprint": fingerprint}
+                for line, fingerprint in zip(lines, fingerprints) if fingerprint not in existing
+            ]
+            if rows:
+                db.execute(update(BankStatementLine), rows)
+                db.commit()
+            backfilled += len(rows)
+        print(f"✅ Fingerprinted {backfilled} statement lines")
+    finally:
+        db.close()
+
+
+def migrate_statement_dedup():
+    with engine.connect() as conn:
+        if column_exists(conn, TABLE, "fingerprint"):
+            print(f"ℹ️  {TABLE}.fingerprint already exists")
+        else:
+            conn.execute(text(f"ALTER TABLE {TABLE} ADD COLUMN fingerprint CHAR(64) NULL"))
+            print(f"✅ Added {TABLE}.fingerprint")
+        conn.commit()
+
+    backfill_fingerprints()
+
+    with engine.connect() as conn:
+        if index_exists(conn, TABLE, INDEX):
+            print(f"ℹ️  {TABLE}.{INDEX} already exists")
+        else:
+            conn.execute(text(
+                f"ALTER TABLE {TABLE} ADD UNIQUE INDEX {INDEX} (company_id, bank_account_id, fingerprint), "
+                "ALGORITHM=INPLACE, LOCK=NONE"
+            ))
+            print(f"✅ Added {TABLE}.{INDEX}")
+        conn.commit()
+
+
+if __name__ == "__main__":
+    migrate_statement_dedup()
@@ -0,0 +1,55 @@
+"""
+Rebuild or verify the materialized account_balances table from posted journals.
+
+Usage:
+    python rebuild_account_balances.py                 # rebuild every company
+    python rebuild_account_balances.py --verify        # report drift only, exit 1 if any
+    python rebuild_account_balances.py <company_id>    # limit to one company
+
+A rebuild locks the company's balance rows, so it can run while postings are live;
+postings of that company wait for it to commit.
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from db_models.core import Company
+import db_models.accounting
+from services import accounting_service
+
+
+def main(args):
+    verify_only = "--verify" in args
+    company_ids = [a for a in args if not a.startswith("--")]
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if not company_ids:
+            company_ids = [c.id for c in db.query(Company.id).all()]
+
+        drifted = 0
+        for company_id in company_ids:
+            if verify_only:
+                drift = accounting_service.verify_account_balances(db, company_id)
+                drifted += len(drift)
+                for row in drift:
+                    print(
+                        f"[{company_id}] account {row['account_id']}: "
+                        f"stored Dr {row['stored_debit']} / Cr {row['stored_credit']}, "
+                        f"journals Dr {row['journal_debit']} / Cr {row['journal_credit']}"
+                    )
+                if not drift:
+                    print(f"✓ [{company_id}] balances match journals")
+            else:
+                count = accounting_service.rebuild_account_balances(db, company_id)
+                print(f"✓ [{company_id}] rebuilt {count} account balances")
+    finally:
+        db.close()
+
+    return 1 if drifted else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""
+Month-end close across every company, run in parallel worker processes.
+
+Each company gets a task row in period_close_tasks with its status, attempts,
+per-step timings and error. Re-running the same period resumes the unfinished
+job: completed companies are skipped, interrupted and failed ones retried.
+
+Usage:
+    python run_period_close.py 2026-09-30                      # every company
+    python run_period_close.py 2026-09-30 --workers=8
+    python run_period_close.py 2026-09-30 <company_id> ...     # limit to some companies
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+import time
+from datetime import date
+from core.database import SessionLocal, engine
+from db_models.base import Base
+from services import period_close_service
+
+import main  # noqa: F401  (registers every model, also in spawned workers)
+
+
+def report(done, total, result):
+    _, company_id, status, elapsed_ms, error = result
+    mark = "✓" if status == "Done" else "❌"
+    print(f"{mark} [{done}/{total}] {company_id} {elapsed_ms} ms" + (f": {error}" if error else ""))
+
+
+def run(args):
+    workers = None
+    for arg in args:
+        if arg.startswith("--workers="):
+            workers = int(arg.split("=", 1)[1])
+    positional = [a for a in args if not a.startswith("--")]
+    if not positional:
+        print(__doc__)
+        return 2
+    period_end = date.fromisoformat(positional[0])
+    company_ids = positional[1:] or None
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        job = period_close_service.get_or_create_close_job(db, period_end, company_ids)
+        print(f"Period close {job.period_end} job {job.id}: {job.total_companies} companies")
+        started = time.perf_counter()
+        job = period_close_service.run_close_job(db, job.id, workers=workers, on_progress=report)
+        print(
+            f"{job.status}: {job.completed} closed, {job.failed} failed "
+            f"in {time.perf_counter() - started:.1f}s with {job.workers} workers"
+        )
+        return 0 if job.status == "Completed" else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(run(sys.argv[1:]))
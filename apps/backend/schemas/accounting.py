@@ -1,5 +1,5 @@
 from pydantic import BaseModel, condecimal
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import date
 from schemas.core import UserRole
 from db_models.accounting import AccountType, JournalStatus
@@ -96,6 +96,17 @@ class JournalHeader(JournalHeaderBase):
     class Config:
         from_attributes = True
 
+class JournalImportError(BaseModel):
+    index: int
+    reference: Optional[str] = None
+    detail: str
+
+class JournalImportResult(BaseModel):
+    total: int
+    imported: int
+    failed: int
+    errors: List[JournalImportError]
+
 class PaymentDetailBase(BaseModel):
     invoice_id: str
     amount_allocated: condecimal(max_digits=20, decimal_places=2)
@@ -128,6 +139,15 @@ class PaymentHeader(PaymentHeaderBase):
     class Config:
         from_attributes = True
 
+class InvoiceOutstanding(BaseModel):
+    invoice_id: str
+    invoice_total: condecimal(max_digits=20, decimal_places=2)
+    paid_amount: condecimal(max_digits=20, decimal_places=2)
+    credited_amount: condecimal(max_digits=20, decimal_places=2)
+    outstanding: condecimal(max_digits=20, decimal_places=2)
+    class Config:
+        from_attributes = True
+
 class BudgetDetailBase(BaseModel):
     account_id: str
     budgeted_amount: condecimal(max_digits=20, decimal_places=2)
@@ -158,6 +178,26 @@ class BudgetHeader(BudgetHeaderBase):
     class Config:
         from_attributes = True
 
+class BudgetVarianceLine(BaseModel):
+    account_id: str
+    code: Optional[str] = None
+    name: Optional[str] = None
+    budgeted_amount: condecimal(max_digits=20, decimal_places=2)
+    actual_amount: condecimal(max_digits=20, decimal_places=2)
+    variance: condecimal(max_digits=20, decimal_places=2)
+    utilisation: Optional[float] = None
+
+class BudgetVariance(BaseModel):
+    budget_id: str
+    period_start: date
+    period_end: date
+    description: Optional[str] = None
+    lines: List[BudgetVarianceLine]
+    total_budgeted: condecimal(max_digits=20, decimal_places=2)
+    total_actual: condecimal(max_digits=20, decimal_places=2)
+    total_variance: condecimal(max_digits=20, decimal_places=2)
+    utilisation: Optional[float] = None
+
 class DebitNoteDetailBase(BaseModel):
     description: str
     amount: condecimal(max_digits=20, decimal_places=2)
@@ -191,6 +231,7 @@ class DebitNoteHeader(DebitNoteHeaderBase):
     company_id: str
     total_amount: condecimal(max_digits=20, decimal_places=2)
     status: str
+    journal_id: Optional[str] = None
     lines: List[DebitNoteDetail]
     class Config:
         from_attributes = True
@@ -228,10 +269,41 @@ class CreditNoteHeader(CreditNoteHeaderBase):
     company_id: str
     total_amount: condecimal(max_digits=20, decimal_places=2)
     status: str
+    journal_id: Optional[str] = None
     lines: List[CreditNoteDetail]
     class Config:
         from_attributes = True
 
+class NoteAccountMappingCreate(BaseModel):
+    note_type: str # "debit" or "credit"
+    reason: Optional[str] = None # None = default rule for the note type
+    party_account_id: str
+    amount_account_id: str
+    tax_account_id: Optional[str] = None
+
+class NoteAccountMapping(NoteAccountMappingCreate):
+    id: str
+    company_id: str
+    class Config:
+        from_attributes = True
+
+class NotePostingRequest(BaseModel):
+    debit_note_ids: List[str] = []
+    credit_note_ids: List[str] = []
+
+class NotePostingSkip(BaseModel):
+    note_id: str
+    note_type: str
+    error: str
+
+class NotePostingReport(BaseModel):
+    requested: int
+    posted: int
+    skipped: int
+    posted_amount: condecimal(max_digits=20, decimal_places=2)
+    skipped_notes: List[NotePostingSkip]
+    elapsed_ms: float
+
 class FundTransferCreate(BaseModel):
     from_account_id: str
     to_account_id: str
@@ -258,6 +330,25 @@ class BankReconciliationCreate(BaseModel):
     company_id: Optional[str] = None
     items: List[BankReconciliationDetail]
 
+class UnmatchedStatementLine(BaseModel):
+    date: date
+    description: Optional[str] = None
+    amount: condecimal(max_digits=20, decimal_places=2)
+    cheque_no: Optional[str] = None
+
+class ReconciliationReport(BaseModel):
+    bank_account_id: str
+    statement_date: date
+    statement_lines: int
+    duplicates_skipped: int = 0
+    matched: int
+    unmatched: int
+    matched_by_rule: dict
+    unmatched_lines: List[UnmatchedStatementLine]
+    open_book_deposits: int
+    open_book_payments: int
+    elapsed_ms: float
+
 class ChequeDepositDetail(BaseModel):
     cheque_number: str
     bank_name: str
@@ -271,3 +362,125 @@ class ChequeDepositCreate(BaseModel):
     reference: Optional[str] = None
     company_id: Optional[str] = None
     cheques: List[ChequeDepositDetail]
+
+class ChequeDepositLine(BaseModel):
+    id: str
+    cheque_no: Optional[str] = None
+    description: str
+    amount: condecimal(max_digits=20, decimal_places=2)
+    cheque_status: str
+    status_date: Optional[date] = None
+    bounce_reason: Optional[str] = None
+    journal_id: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class ChequeDeposit(BaseModel):
+    id: str
+    bank_account_id: Optional[str] = None
+    date: date
+    reference: Optional[str] = None
+    total_amount: condecimal(max_digits=20, decimal_places=2)
+    reconciled: Optional[bool] = None
+    lines: List[ChequeDepositLine] = []
+
+    class Config:
+        from_attributes = True
+
+class ChequeClearingReject(BaseModel):
+    row: int
+    cheque_no: Optional[str] = None
+    error: str
+
+class ChequeClearingReport(BaseModel):
+    bank_account_id: str
+    rows: int
+    cleared: int
+    bounced: int
+    rejected: int
+    cleared_amount: condecimal(max_digits=20, decimal_places=2)
+    journals_posted: int
+    rejected_rows: List[ChequeClearingReject]
+    elapsed_ms: float
+
+class TrialBalanceLine(BaseModel):
+    account_id: str
+    code: str
+    name: str
+    type: AccountType
+    debit: condecimal(max_digits=20, decimal_places=2)
+    credit: condecimal(max_digits=20, decimal_places=2)
+
+class TrialBalance(BaseModel):
+    as_of: date
+    lines: List[TrialBalanceLine]
+    total_debit: condecimal(max_digits=20, decimal_places=2)
+    total_credit: condecimal(max_digits=20, decimal_places=2)
+
+class StatementPeriod(BaseModel):
+    start: Optional[date] = None
+    end: date
+
+class StatementLine(BaseModel):
+    account_id: Optional[str] = None
+    parent_account_id: Optional[str] = None
+    code: Optional[str] = None
+    name: str
+    level: int
+    amounts: List[condecimal(max_digits=20, decimal_places=2)]
+
+class StatementSection(BaseModel):
+    type: AccountType
+    lines: List[StatementLine]
+    totals: List[condecimal(max_digits=20, decimal_places=2)]
+
+class FinancialStatement(BaseModel):
+    statement: str
+    periods: List[StatementPeriod]
+    sections: List[StatementSection]
+    totals: Dict[str, List[condecimal(max_digits=20, decimal_places=2)]]
+
+class AgeingBuckets(BaseModel):
+    # current: not yet due or due on as_of; days_1_30 .. days_over_90: whole days past due_date
+    current: condecimal(max_digits=20, decimal_places=2)
+    days_1_30: condecimal(max_digits=20, decimal_places=2)
+    days_31_60: condecimal(max_digits=20, decimal_places=2)
+    days_61_90: condecimal(max_digits=20, decimal_places=2)
+    days_over_90: condecimal(max_digits=20, decimal_places=2)
+    total: condecimal(max_digits=20, decimal_places=2)
+    documents: int
+
+class AgeingSummary(AgeingBuckets):
+    side: str
+    as_of: date
+
+class AgeingParty(AgeingBuckets):
+    party_id: str
+
+class AgeingDocument(BaseModel):
+    document_id: str
+    date: date
+    due_date: date
+    total: condecimal(max_digits=20, decimal_places=2)
+    outstanding: condecimal(max_digits=20, decimal_places=2)
+    days_overdue: int
+
+class LedgerLine(BaseModel):
+    id: str
+    journal_id: str
+    date: date
+    reference: str
+    description: Optional[str] = None
+    debit: condecimal(max_digits=20, decimal_places=2)
+    credit: condecimal(max_digits=20, decimal_places=2)
+    running_balance: condecimal(max_digits=20, decimal_places=2)
+
+class LedgerReport(BaseModel):
+    account_id: str
+    start_date: date
+    end_date: date
+    opening_balance: condecimal(max_digits=20, decimal_places=2)
+    closing_balance: condecimal(max_digits=20, decimal_places=2)
+    lines: List[LedgerLine]
+    next_cursor: Optional[str] = None
@@ -72,11 +72,18 @@ class BusinessLead(BusinessLeadBase):
         from_attributes = True
 
 
+class LeadSearchHit(BaseModel):
+    rank: float
+    lead: BusinessLead
+
+
 class BusinessLeadList(BaseModel):
     total: int
+    total_is_estimate: bool = False
     leads: List[BusinessLead]
-    page: int
+    page: Optional[int] = None  # None on cursor (keyset) pages
     page_size: int
+    next_cursor: Optional[str] = None
 
 
 # ===== Activity Schemas =====
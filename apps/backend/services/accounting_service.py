@@ -1,14 +1,15 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException, status
 from db_models.accounting import (
-    JournalHeader, JournalDetail, ChartOfAccount, JournalStatus,
+    JournalHeader, JournalDetail, ChartOfAccount, JournalStatus, AccountBalance,
+    AccountBalanceSnapshot,
     PaymentHeader, PaymentDetail, BudgetHeader, BudgetDetail,
     DebitNoteHeader, DebitNoteDetail, CreditNoteHeader, CreditNoteDetail,
-    DebitReason, CreditReason,
+    DebitReason, CreditReason, AccountType,
     FundTransfer
 )
 from db_models.pos_banking import (
-    BankTransactionHeader, BankTransactionDetail
+    BankTransactionHeader, BankTransactionDetail, ChequeStatus
 )
 from schemas.accounting import (
     JournalHeaderCreate, PaymentHeaderCreate, BudgetHeaderCreate, 
@@ -16,40 +17,527 @@ from schemas.accounting import (
     FundTransferCreate, BankReconciliationCreate, ChequeDepositCreate
 )
 from decimal import Decimal
-from datetime import date
-from sqlalchemy import func, or_
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import func, or_, and_, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError, SQLAlchemyError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from itertools import islice
+from pydantic import ValidationError
+from core.config import settings
+from core.pagination import encode_cursor, decode_cursor
+from core.cache import TTLCache
+from core.database import after_commit
+from services import allocation_service
+import calendar
+import csv
+import hashlib
+import io
+import json
+import logging
+import time
+import uuid
 
-def calculate_account_balance(db: Session, account_id: str, company_id: str) -> Decimal:
-    account = db.query(ChartOfAccount).filter(
-        ChartOfAccount.id == account_id,
-        ChartOfAccount.company_id == company_id
-    ).first()
-    
-    if not account:
-        return Decimal(0)
+logger = logging.getLogger(__name__)
+
+# Journals per IN list when posting a batch
+BATCH_POST_CHUNK = 1000
+
+# Budget variance reports keyed by (company_id, budget_id); dropped when journals in the period post.
+# Per worker: other workers keep serving their copy until it expires, hence the short TTL.
+budget_variance_cache = TTLCache(ttl_seconds=60)
+# Chart of accounts per company_id -> {account_id: CachedAccount}
+account_cache = TTLCache(ttl_seconds=300)
+
+
+class CachedAccount(NamedTuple):
+    id: str
+    code: str
+    name: str
+    type: AccountType
+    typical_balance: str
+    opening_balance: Decimal
+    is_inactive: bool
+    allow_account_entry: bool
+
+
+def get_account_map(db: Session, company_id: str, refresh: bool = False) -> Dict[str, CachedAccount]:
+    """
+    The company's chart of accounts, served from the in-process cache. Each API worker
+    keeps its own copy for up to the TTL; writes in this process invalidate it at once.
+    """
+    accounts = None if refresh else account_cache.get(company_id)
+    if accounts is None:
+        accounts = {
+            row.id: CachedAccount(
+                row.id, row.code, row.name, row.type, row.typical_balance,
+                Decimal(row.opening_balance or 0), bool(row.is_inactive), bool(row.allow_account_entry)
+            )
+            for row in db.query(
+                ChartOfAccount.id, ChartOfAccount.code, ChartOfAccount.name, ChartOfAccount.type,
+                ChartOfAccount.typical_balance, ChartOfAccount.opening_balance,
+                ChartOfAccount.is_inactive, ChartOfAccount.allow_account_entry
+            ).filter(ChartOfAccount.company_id == company_id).all()
+        }
+        # A lagging replica must not seed the cache that write paths validate against
+        if not db.info.get("replica"):
+            account_cache.set(company_id, accounts)
+    return accounts
+
+
+def get_accounts(db: Session, company_id: str, account_ids) -> Dict[str, CachedAccount]:
+    """
+    Cached accounts for the given ids; ids that are not accounts of the company are absent.
+    An unknown id reloads the map once, in case another worker created the account.
+    """
+    accounts = get_account_map(db, company_id)
+    if any(account_id not in accounts for account_id in account_ids):
+        accounts = get_account_map(db, company_id, refresh=True)
+    return {account_id: accounts[account_id] for account_id in account_ids if account_id in accounts}
+
+
+def invalidate_account_cache(company_id: str):
+    """Call after creating or changing a company's accounts."""
+    account_cache.invalidate(company_id)
 
-    # Sum all posted journal details for this account
-    result = db.query(
+
+def require_postable_accounts(db: Session, company_id: str, account_ids) -> Dict[str, CachedAccount]:
+    """Cached accounts for the ids, or a 404/400 if one is missing, inactive or closed to direct entry."""
+    accounts = get_accounts(db, company_id, set(account_ids))
+    for account_id in account_ids:
+        account = accounts.get(account_id)
+        if account is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Account with ID {account_id} not found"
+            )
+        if account.is_inactive or not account.allow_account_entry:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Account {account.code} is {'inactive' if account.is_inactive else 'closed to direct entry'}"
+            )
+    return accounts
+
+
+def aggregate_journal_totals(db: Session, company_id: str, account_ids: Optional[List[str]] = None) -> Dict[str, Tuple[Decimal, Decimal]]:
+    """Posted (debit, credit) totals per account, summed from the journals with one grouped aggregate."""
+    query = db.query(
+        JournalDetail.account_id,
         func.sum(JournalDetail.debit).label("total_debit"),
         func.sum(JournalDetail.credit).label("total_credit")
     ).join(JournalHeader).filter(
-        JournalDetail.account_id == account_id,
         JournalHeader.company_id == company_id,
         JournalHeader.status == JournalStatus.POSTED
-    ).first()
+    )
+    if account_ids is not None:
+        query = query.filter(JournalDetail.account_id.in_(account_ids))
 
-    total_debit = result.total_debit or Decimal(0)
-    total_credit = result.total_credit or Decimal(0)
-    
-    opening = account.opening_balance or Decimal(0)
-    
-    if account.typical_balance == "Debit":
+    return {
+        row.account_id: (row.total_debit or Decimal(0), row.total_credit or Decimal(0))
+        for row in query.group_by(JournalDetail.account_id).all()
+    }
+
+
+def get_posted_totals(db: Session, company_id: str, account_ids: Optional[List[str]] = None) -> Dict[str, Tuple[Decimal, Decimal]]:
+    """Posted (debit, credit) totals per account, read from the materialized account_balances table."""
+    query = db.query(
+        AccountBalance.account_id, AccountBalance.total_debit, AccountBalance.total_credit
+    ).filter(AccountBalance.company_id == company_id)
+    if account_ids is not None:
+        query = query.filter(AccountBalance.account_id.in_(account_ids))
+
+    return {row.account_id: (row.total_debit, row.total_credit) for row in query.all()}
+
+
+def line_deltas(lines) -> Dict[str, Tuple[Decimal, Decimal]]:
+    """Fold (account_id, debit, credit) tuples into per-account totals."""
+    deltas: Dict[str, Tuple[Decimal, Decimal]] = {}
+    for account_id, debit, credit in lines:
+        prev_debit, prev_credit = deltas.get(account_id, (Decimal(0), Decimal(0)))
+        deltas[account_id] = (prev_debit + (debit or Decimal(0)), prev_credit + (credit or Decimal(0)))
+    return deltas
+
+
+def record_posted_lines(db: Session, company_id: str, deltas: Dict[str, Tuple[Decimal, Decimal]], posted_from: date,
+                        expected_versions: Optional[Dict[str, int]] = None):
+    """
+    Apply posted debit/credit deltas to account_balances and drop month-end snapshots
+    that the posting (dated posted_from or later) makes stale.
+    Runs inside the caller's transaction, so the balances commit (or roll back) with the journal;
+    cached budget variance reports are dropped only once that transaction has committed, so a
+    report read in between cannot put pre-posting actuals back in the cache.
+    With `expected_versions`, each update only applies if the row is still at the version the
+    caller read; otherwise the transaction is rolled back with 409 so the client can retry.
+    """
+    if not deltas:
+        return
+
+    _apply_balance_deltas(db, company_id, deltas, expected_versions)
+    # After the balance rows are locked: a concurrent build_balance_snapshots holds those locks
+    # until it commits, so any snapshot it wrote from pre-posting totals is deleted here
+    invalidate_balance_snapshots(db, company_id, posted_from)
+    after_commit(db, lambda: invalidate_budget_variance(company_id, posted_from))
+
+
+def _apply_balance_deltas(db: Session, company_id: str, deltas: Dict[str, Tuple[Decimal, Decimal]],
+                          expected_versions: Optional[Dict[str, int]]):
+    if not expected_versions and _upsert_account_balances(db, company_id, deltas):
+        return
+
+    existing = {
+        row.account_id for row in db.query(AccountBalance.account_id).filter(
+            AccountBalance.company_id == company_id,
+            AccountBalance.account_id.in_(list(deltas))
+        ).all()
+    }
+    for account_id, (debit, credit) in deltas.items():
+        if account_id in existing:
+            query = db.query(AccountBalance).filter(
+                AccountBalance.company_id == company_id,
+                AccountBalance.account_id == account_id
+            )
+            if expected_versions and account_id in expected_versions:
+                query = query.filter(AccountBalance.version == expected_versions[account_id])
+            updated = query.update({
+                AccountBalance.total_debit: AccountBalance.total_debit + debit,
+                AccountBalance.total_credit: AccountBalance.total_credit + credit,
+                AccountBalance.version: AccountBalance.version + 1
+            }, synchronize_session=False)
+            if not updated:
+                db.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Balance of account {account_id} changed concurrently, please retry"
+                )
+        else:
+            db.add(AccountBalance(
+                company_id=company_id,
+                account_id=account_id,
+                total_debit=debit,
+                total_credit=credit,
+                version=1
+            ))
+
+
+def _upsert_account_balances(db: Session, company_id: str, deltas: Dict[str, Tuple[Decimal, Decimal]]) -> bool:
+    """
+    Add the deltas to account_balances in one multi-row upsert (rows in account_id order,
+    so concurrent posters lock them in the same order). Returns False on a dialect
+    without upsert support, leaving the row-by-row path to the caller.
+    """
+    rows = [
+        {"company_id": company_id, "account_id": account_id, "total_debit": debit, "total_credit": credit, "version": 1}
+        for account_id, (debit, credit) in sorted(deltas.items())
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(AccountBalance).values(rows)
+        incoming = stmt.inserted
+        stmt = stmt.on_duplicate_key_update(
+            total_debit=AccountBalance.total_debit + incoming.total_debit,
+            total_credit=AccountBalance.total_credit + incoming.total_credit,
+            version=AccountBalance.version + 1,
+            updated_at=datetime.utcnow()
+        )
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(AccountBalance).values(rows)
+        incoming = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[AccountBalance.company_id, AccountBalance.account_id],
+            set_={
+                "total_debit": AccountBalance.total_debit + incoming.total_debit,
+                "total_credit": AccountBalance.total_credit + incoming.total_credit,
+                "version": AccountBalance.version + 1,
+                "updated_at": datetime.utcnow()
+            }
+        )
+    else:
+        return False
+    db.execute(stmt)
+    return True
+
+
+def lock_account_balances(db: Session, company_id: str, account_ids: List[str]) -> Dict[str, AccountBalance]:
+    """
+    Lock the balance rows of the given accounts (SELECT ... FOR UPDATE) for the rest of the
+    transaction, creating zero rows for accounts that have never been posted to.
+    Rows are locked in account_id order so concurrent writers cannot deadlock each other.
+    """
+    account_ids = sorted(set(account_ids))
+    query = db.query(AccountBalance).filter(
+        AccountBalance.company_id == company_id,
+        AccountBalance.account_id.in_(account_ids)
+    ).order_by(AccountBalance.account_id).with_for_update()
+
+    rows = {row.account_id: row for row in query.all()}
+    missing = [account_id for account_id in account_ids if account_id not in rows]
+    if missing:
+        try:
+            with db.begin_nested():
+                db.add_all([
+                    AccountBalance(company_id=company_id, account_id=account_id,
+                                   total_debit=Decimal(0), total_credit=Decimal(0), version=0)
+                    for account_id in missing
+                ])
+        except IntegrityError:
+            pass  # A concurrent transaction created them first; the re-select below waits on its lock
+        rows = {row.account_id: row for row in query.populate_existing().all()}
+    return rows
+
+
+def month_end(d: date) -> date:
+    return date(d.year, d.month, calendar.monthrange(d.year, d.month)[1])
+
+
+def invalidate_balance_snapshots(db: Session, company_id: str, since: date):
+    """Delete snapshots for every month-end on or after `since`; the next backfill rebuilds them."""
+    db.query(AccountBalanceSnapshot).filter(
+        AccountBalanceSnapshot.company_id == company_id,
+        AccountBalanceSnapshot.period_end >= since
+    ).delete(synchronize_session=False)
+
+
+def _latest_snapshot_period(db: Session, company_id: str, as_of: Optional[date] = None) -> Optional[date]:
+    query = db.query(func.max(AccountBalanceSnapshot.period_end)).filter(
+        AccountBalanceSnapshot.company_id == company_id
+    )
+    if as_of is not None:
+        query = query.filter(AccountBalanceSnapshot.period_end <= as_of)
+    return query.scalar()
+
+
+def _snapshot_totals(db: Session, company_id: str, period_end: date, account_ids: Optional[List[str]] = None) -> Dict[str, Tuple[Decimal, Decimal]]:
+    query = db.query(
+        AccountBalanceSnapshot.account_id, AccountBalanceSnapshot.total_debit, AccountBalanceSnapshot.total_credit
+    ).filter(
+        AccountBalanceSnapshot.company_id == company_id,
+        AccountBalanceSnapshot.period_end == period_end
+    )
+    if account_ids is not None:
+        query = query.filter(AccountBalanceSnapshot.account_id.in_(account_ids))
+    return {row.account_id: (row.total_debit, row.total_credit) for row in query.all()}
+
+
+def build_balance_snapshots(db: Session, company_id: str, through: Optional[date] = None) -> int:
+    """
+    Extend the monthly snapshots of a company up to the month-end of `through`
+    (default: the last completed month). Only lines after the latest existing
+    snapshot are aggregated. Returns the number of month-ends written.
+    """
+    if through is None:
+        through = date.today().replace(day=1) - timedelta(days=1)
+    through = month_end(through)
+
+    # Lock the company's balance rows first, so postings (which update them) wait for this build
+    # and then drop what it wrote, and the reads below see every posting committed before it
+    db.query(AccountBalance.account_id).filter(AccountBalance.company_id == company_id).with_for_update().all()
+
+    latest = _latest_snapshot_period(db, company_id)
+    if latest is not None and latest >= through:
+        db.rollback()
+        return 0
+    running = _snapshot_totals(db, company_id, latest) if latest else {}
+
+    year = func.extract("year", JournalHeader.date)
+    month = func.extract("month", JournalHeader.date)
+    query = db.query(
+        JournalDetail.account_id,
+        year.label("year"),
+        month.label("month"),
+        func.sum(JournalDetail.debit).label("total_debit"),
+        func.sum(JournalDetail.credit).label("total_credit")
+    ).join(JournalHeader).filter(
+        JournalHeader.company_id == company_id,
+        JournalHeader.status == JournalStatus.POSTED,
+        JournalHeader.date <= through
+    )
+    if latest is not None:
+        query = query.filter(JournalHeader.date > latest)
+
+    movements: Dict[date, List] = {}
+    for row in query.group_by(JournalDetail.account_id, year, month).all():
+        period = month_end(date(int(row.year), int(row.month), 1))
+        movements.setdefault(period, []).append(row)
+
+    if latest is not None:
+        period = month_end(latest + timedelta(days=1))
+    elif movements:
+        period = min(movements)
+    else:
+        db.rollback()
+        return 0
+
+    written = 0
+    while period <= through:
+        for row in movements.get(period, []):
+            prev_debit, prev_credit = running.get(row.account_id, (Decimal(0), Decimal(0)))
+            running[row.account_id] = (prev_debit + (row.total_debit or 0), prev_credit + (row.total_credit or 0))
+        db.add_all([
+            AccountBalanceSnapshot(
+                company_id=company_id,
+                period_end=period,
+                account_id=account_id,
+                total_debit=debit,
+                total_credit=credit
+            )
+            for account_id, (debit, credit) in running.items()
+        ])
+        written += 1
+        period = month_end(period + timedelta(days=1))
+
+    db.commit()
+    return written
+
+
+def get_totals_as_of(db: Session, company_id: str, as_of: date, account_ids: Optional[List[str]] = None) -> Dict[str, Tuple[Decimal, Decimal]]:
+    """
+    Posted (debit, credit) totals per account up to and including `as_of`:
+    the latest snapshot on or before that date plus the lines posted since.
+    """
+    period = _latest_snapshot_period(db, company_id, as_of)
+    totals = _snapshot_totals(db, company_id, period, account_ids) if period else {}
+
+    query = db.query(
+        JournalDetail.account_id,
+        func.sum(JournalDetail.debit).label("total_debit"),
+        func.sum(JournalDetail.credit).label("total_credit")
+    ).join(JournalHeader).filter(
+        JournalHeader.company_id == company_id,
+        JournalHeader.status == JournalStatus.POSTED,
+        JournalHeader.date <= as_of
+    )
+    if period is not None:
+        query = query.filter(JournalHeader.date > period)
+    if account_ids is not None:
+        query = query.filter(JournalDetail.account_id.in_(account_ids))
+
+    for row in query.group_by(JournalDetail.account_id).all():
+        prev_debit, prev_credit = totals.get(row.account_id, (Decimal(0), Decimal(0)))
+        totals[row.account_id] = (prev_debit + (row.total_debit or 0), prev_credit + (row.total_credit or 0))
+    return totals
+
+
+def get_trial_balance(db: Session, company_id: str, as_of: date):
+    accounts = db.query(
+        ChartOfAccount.id, ChartOfAccount.code, ChartOfAccount.name, ChartOfAccount.type,
+        ChartOfAccount.typical_balance, ChartOfAccount.opening_balance
+    ).filter(ChartOfAccount.company_id == company_id).order_by(ChartOfAccount.code).all()
+    totals = get_totals_as_of(db, company_id, as_of)
+    zero = (Decimal(0), Decimal(0))
+
+    lines = []
+    total_debit = total_credit = Decimal(0)
+    for acc in accounts:
+        balance = compute_balance(acc.typical_balance, acc.opening_balance, *totals.get(acc.id, zero))
+        if balance == 0:
+            continue
+        # Show the balance on its natural side; a negative balance flips to the other column
+        on_debit_side = (acc.typical_balance == "Debit") == (balance > 0)
+        debit = abs(balance) if on_debit_side else Decimal(0)
+        credit = Decimal(0) if on_debit_side else abs(balance)
+        total_debit += debit
+        total_credit += credit
+        lines.append({
+            "account_id": acc.id,
+            "code": acc.code,
+            "name": acc.name,
+            "type": acc.type,
+            "debit": debit,
+            "credit": credit
+        })
+
+    return {"as_of": as_of, "lines": lines, "total_debit": total_debit, "total_credit": total_credit}
+
+
+def rebuild_account_balances(db: Session, company_id: str) -> int:
+    """
+    Recompute account_balances for a company from its posted journals. Every balance row
+    of the company is locked first (as postings lock theirs), so postings wait for the
+    rebuild instead of having their deltas overwritten; safe to run on a live system.
+    """
+    account_ids = {row.id for row in db.query(ChartOfAccount.id).filter(ChartOfAccount.company_id == company_id)}
+    account_ids |= {row.account_id for row in db.query(AccountBalance.account_id).filter(AccountBalance.company_id == company_id)}
+    rows = lock_account_balances(db, company_id, list(account_ids))
+    totals = aggregate_journal_totals(db, company_id)
+    unlocked = set(totals) - set(rows)
+    if unlocked:
+        rows.update(lock_account_balances(db, company_id, list(unlocked)))
+
+    zero = (Decimal(0), Decimal(0))
+    db.execute(update(AccountBalance), [
+        {
+            "company_id": company_id,
+            "account_id": account_id,
+            "total_debit": totals.get(account_id, zero)[0],
+            "total_credit": totals.get(account_id, zero)[1],
+            "version": row.version + 1
+        }
+        for account_id, row in rows.items()
+    ])
+    db.commit()
+    return len(totals)
+
+
+def verify_account_balances(db: Session, company_id: str) -> List[Dict]:
+    """Compare account_balances against the journals and return every account that drifted."""
+    expected = aggregate_journal_totals(db, company_id)
+    stored = get_posted_totals(db, company_id)
+    zero = (Decimal(0), Decimal(0))
+
+    drift = []
+    for account_id in set(expected) | set(stored):
+        journal_debit, journal_credit = expected.get(account_id, zero)
+        stored_debit, stored_credit = stored.get(account_id, zero)
+        if journal_debit != stored_debit or journal_credit != stored_credit:
+            drift.append({
+                "account_id": account_id,
+                "stored_debit": stored_debit,
+                "stored_credit": stored_credit,
+                "journal_debit": journal_debit,
+                "journal_credit": journal_credit
+            })
+    return drift
+
+
+def compute_balance(typical_balance: str, opening_balance, total_debit: Decimal, total_credit: Decimal) -> Decimal:
+    opening = opening_balance or Decimal(0)
+    if typical_balance == "Debit":
         return opening + total_debit - total_credit
     else:
         return opening + total_credit - total_debit
 
 
+def get_account_balances(db: Session, company_id: str, account_ids: Optional[List[str]] = None) -> Dict[str, Decimal]:
+    """Current balance of every requested account (all accounts of the company by default)."""
+    if account_ids is None:
+        accounts = list(get_account_map(db, company_id).values())
+    else:
+        accounts = list(get_accounts(db, company_id, account_ids).values())
+    if not accounts:
+        return {}
+
+    totals = get_posted_totals(db, company_id, account_ids)
+    zero = (Decimal(0), Decimal(0))
+    return {
+        acc.id: compute_balance(acc.typical_balance, acc.opening_balance, *totals.get(acc.id, zero))
+        for acc in accounts
+    }
+
+
+def calculate_account_balance(db: Session, account_id: str, company_id: str) -> Decimal:
+    return get_account_balances(db, company_id, [account_id]).get(account_id, Decimal(0))
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
 def create_journal_entry(db: Session, journal_in: JournalHeaderCreate, company_id: str):
+    """
+    Validate and write one journal. IDs are generated up front so the header and its
+    lines go out as one INSERT each and commit once; the response is built from the
+    written rows instead of being re-read.
+    """
     # Calculate totals
     total_debit = sum(line.debit for line in journal_in.lines)
     total_credit = sum(line.credit for line in journal_in.lines)
@@ -67,55 +555,257 @@ def create_journal_entry(db: Session, journal_in: JournalHeaderCreate, company_i
             detail="Journal entry must have a non-zero total"
         )
 
-    # Create Header
-    db_header = JournalHeader(
-        date=journal_in.date,
-        reference=journal_in.reference,
-        notes=journal_in.notes,
-        total_debit=total_debit,
-        total_credit=total_credit,
-        status=JournalStatus.DRAFT if journal_in.batch_id else JournalStatus.POSTED,
-        company_id=company_id,
-        batch_id=journal_in.batch_id
-    )
-    db.add(db_header)
-    db.flush()  # To get header ID
-    
-    # Create Details
-    for line in journal_in.lines:
-        # Verify account exists
-        account = db.query(ChartOfAccount).filter(
-            ChartOfAccount.id == line.account_id,
-            ChartOfAccount.company_id == company_id
-        ).first()
-        if not account:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Account with ID {line.account_id} not found"
-            )
-            
-        db_line = JournalDetail(
-            journal_id=db_header.id,
-            account_id=line.account_id,
-            debit=line.debit,
-            credit=line.credit,
-            description=line.description,
-            tax_amount=line.tax_amount
-        )
-        db.add(db_line)
+    # Verify every account up front from the cached chart of accounts
+    require_postable_accounts(db, company_id, [line.account_id for line in journal_in.lines])
+
+    # Amounts are normalised to the column scale so the response matches what a re-read would return
+    journal_id = str(uuid.uuid4())
+    header = {
+        "id": journal_id,
+        "date": journal_in.date,
+        "reference": journal_in.reference,
+        "notes": journal_in.notes,
+        "total_debit": _money(total_debit),
+        "total_credit": _money(total_credit),
+        "status": JournalStatus.DRAFT if journal_in.batch_id else JournalStatus.POSTED,
+        "company_id": company_id,
+        "batch_id": journal_in.batch_id
+    }
+    lines = [
+        {
+            "id": str(uuid.uuid4()),
+            "journal_id": journal_id,
+            "account_id": line.account_id,
+            "debit": _money(line.debit),
+            "credit": _money(line.credit),
+            "description": line.description,
+            "tax_amount": _money(line.tax_amount)
+        }
+        for line in journal_in.lines
+    ]
+    db.execute(insert(JournalHeader), [header])
+    db.execute(insert(JournalDetail), lines)
+
+    if header["status"] == JournalStatus.POSTED:
+        record_posted_lines(db, company_id, line_deltas(
+            (line.account_id, line.debit, line.credit) for line in journal_in.lines
+        ), journal_in.date)
     
     db.commit()
-    db.refresh(db_header)
-    return db_header
+    return {**header, "lines": lines}
+
+def parse_journal_import(stream, fmt: str):
+    """
+    Lazily parse an NDJSON or CSV journal file into (index, JournalHeaderCreate, error) tuples.
+    NDJSON: one JournalHeaderCreate object per line.
+    CSV: one journal line per row with columns date, reference, notes, batch_id, account_id,
+    debit, credit, description, tax_amount; consecutive rows sharing date/reference/batch_id
+    form one entry.
+    """
+    if fmt == "ndjson":
+        index = 0
+        # Lines are decoded one at a time, so a line that is not UTF-8 fails alone
+        for raw in stream:
+            if not raw.strip():
+                continue
+            try:
+                obj = json.loads(raw.decode("utf-8"))
+                if isinstance(obj, dict):
+                    yield index, JournalHeaderCreate(**obj), None
+                else:
+                    yield index, None, "Entry must be a JSON object"
+            except (ValueError, ValidationError) as e:
+                yield index, None, str(e)
+            index += 1
+    elif fmt == "csv":
+        def build(index, rows):
+            first = rows[0]
+            try:
+                return index, JournalHeaderCreate(
+                    date=first["date"],
+                    reference=first["reference"],
+                    notes=first.get("notes") or None,
+                    batch_id=first.get("batch_id") or None,
+                    lines=[{
+                        "account_id": row["account_id"],
+                        "debit": row.get("debit") or 0,
+                        "credit": row.get("credit") or 0,
+                        "description": row.get("description") or None,
+                        "tax_amount": row.get("tax_amount") or 0
+                    } for row in rows]
+                ), None
+            except (KeyError, ValidationError) as e:
+                return index, None, str(e)
+
+        index, group, key = 0, [], None
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+        while True:
+            try:
+                row = next(reader, None)
+            except (UnicodeDecodeError, csv.Error) as e:
+                # Rows can't be told apart past this point, so the whole file is rejected
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Could not parse journal file: {e}"
+                )
+            if row is None:
+                break
+            row_key = (row.get("date"), row.get("reference"), row.get("batch_id"))
+            if group and row_key != key:
+                yield build(index, group)
+                index, group = index + 1, []
+            group.append(row)
+            key = row_key
+        if group:
+            yield build(index, group)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format: {fmt}")
+
+
+def import_journal_entries(db: Session, entries, company_id: str, chunk_size: Optional[int] = None):
+    """
+    Bulk-insert journal entries from an iterable of (index, JournalHeaderCreate, error) tuples.
+    Accounts are validated against the cached chart of accounts; headers and lines are
+    written with multi-row INSERTs of `chunk_size` rows.
+    Invalid entries are reported individually and never abort the rest of the import.
+    The import commits as one transaction: if the database rejects a chunk (constraint,
+    deadlock, lock timeout) everything is rolled back and the error names that chunk's
+    entries, 409 when a retry can succeed and 422 otherwise.
+    """
+    chunk_size = chunk_size or settings.JOURNAL_IMPORT_CHUNK_SIZE
+    known_accounts = {}
+    posted_lines = []
+    posted_from = None
+    errors = []
+    total = imported = chunks = 0
+
+    def flush(chunk):
+        nonlocal chunks
+        chunks += 1
+        try:
+            write(chunk)
+        except SQLAlchemyError as e:
+            db.rollback()
+            _raise_import_failure(e, f"Chunk {chunks}", chunk)
+
+    def write(chunk):
+        nonlocal imported, posted_from
+        unseen = {line.account_id for _, entry, _ in chunk if entry for line in entry.lines} - set(known_accounts)
+        if unseen:
+            known_accounts.update(get_accounts(db, company_id, unseen))
+
+        headers, details = [], []
+        for index, entry, error in chunk:
+            if entry is None:
+                errors.append({"index": index, "reference": None, "detail": error})
+                continue
+
+            total_debit = sum((Decimal(line.debit) for line in entry.lines), Decimal(0))
+            total_credit = sum((Decimal(line.credit) for line in entry.lines), Decimal(0))
+            missing = [line.account_id for line in entry.lines if line.account_id not in known_accounts]
+            closed = [
+                known_accounts[line.account_id] for line in entry.lines
+                if line.account_id in known_accounts and (
+                    known_accounts[line.account_id].is_inactive or not known_accounts[line.account_id].allow_account_entry
+                )
+            ]
+            if missing:
+                error = f"Account with ID {missing[0]} not found"
+            elif closed:
+                error = f"Account {closed[0].code} is inactive or closed to direct entry"
+            elif total_debit != total_credit:
+                error = f"Journal entry is not balanced. Total Debit: {total_debit}, Total Credit: {total_credit}"
+            elif total_debit <= 0:
+                error = "Journal entry must have a non-zero total"
+            if error:
+                errors.append({"index": index, "reference": entry.reference, "detail": error})
+                continue
+
+            journal_id = str(uuid.uuid4())
+            posted = not entry.batch_id
+            headers.append({
+                "id": journal_id,
+                "date": entry.date,
+                "reference": entry.reference,
+                "notes": entry.notes,
+                "total_debit": total_debit,
+                "total_credit": total_credit,
+                "status": JournalStatus.POSTED if posted else JournalStatus.DRAFT,
+                "company_id": company_id,
+                "batch_id": entry.batch_id
+            })
+            for line in entry.lines:
+                details.append({
+                    "id": str(uuid.uuid4()),
+                    "journal_id": journal_id,
+                    "account_id": line.account_id,
+                    "debit": line.debit,
+                    "credit": line.credit,
+                    "description": line.description,
+                    "tax_amount": line.tax_amount
+                })
+                if posted:
+                    posted_lines.append((line.account_id, Decimal(line.debit), Decimal(line.credit)))
+            if posted:
+                posted_from = entry.date if posted_from is None else min(posted_from, entry.date)
+
+        if headers:
+            db.execute(insert(JournalHeader), headers)
+        for start in range(0, len(details), chunk_size):
+            db.execute(insert(JournalDetail), details[start:start + chunk_size])
+        imported += len(headers)
+
+    chunk = []
+    try:
+        for item in entries:
+            total += 1
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+    except HTTPException:
+        db.rollback()  # The file could not be read to the end; drop the chunks already written
+        raise
+    if chunk:
+        flush(chunk)
+
+    try:
+        if posted_lines:
+            record_posted_lines(db, company_id, line_deltas(posted_lines), posted_from)
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        _raise_import_failure(e, "Posting the imported journals", [])
+
+    return {"total": total, "imported": imported, "failed": len(errors), "errors": errors}
+
+
+def _raise_import_failure(error: SQLAlchemyError, step: str, chunk):
+    """Turn a database error during import_journal_entries into a 4xx naming the affected entries."""
+    logger.warning("Journal import failed at %s: %s", step.lower(), error)
+    retryable = isinstance(error, OperationalError)  # Deadlock, lock wait timeout, lost connection
+    entries = [index for index, entry, _ in chunk if entry is not None]
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT if retryable else status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail={
+            "message": f"{step} was rejected by the database; nothing was imported"
+                       + (", please retry" if retryable else ""),
+            "error": str(getattr(error, "orig", None) or error).splitlines()[0][:300],
+            "first_index": entries[0] if entries else None,
+            "last_index": entries[-1] if entries else None,
+            "references": [entry.reference for _, entry, _ in chunk if entry is not None][:20]
+        }
+    )
+
 
 def get_chart_of_accounts(db: Session, company_id: str):
     accounts = db.query(ChartOfAccount).filter(ChartOfAccount.company_id == company_id).all()
-    # Populate current balance for each account
+    # Populate current balance for each account from the materialized account_balances rows
+    totals = get_posted_totals(db, company_id)
+    zero = (Decimal(0), Decimal(0))
     for acc in accounts:
         # We assign it to the Pydantic model field (it won't persist to DB, just for response)
-        acc.current_balance = calculate_account_balance(db, acc.id, company_id)
-    return accounts
-
+        acc.current_balance = compute_balance(acc.typical_balance, acc.opening_balance, *totals.get(acc.id, zero))
     return accounts
 
 def get_batches(db: Session, company_id: str):
@@ -129,20 +819,85 @@ def get_batches(db: Session, company_id: str):
     return [{"id": b.batch_id, "count": b.count, "total": b.total} for b in batches]
 
 def post_batch(db: Session, batch_id: str, company_id: str):
-    journals = db.query(JournalHeader).filter(
+    """
+    Post every draft journal of a batch in one transaction. The draft headers are locked
+    first (SELECT ... FOR UPDATE), so they cannot be edited, posted or deleted until this
+    commits; the batch totals come from those locked rows, one grouped aggregate per
+    thousand journals collects per-account deltas from exactly their lines, and a
+    matching UPDATE flips their status. Lines that no longer add up to their headers'
+    totals abort the posting.
+    """
+    started = time.perf_counter()
+    journals = db.query(
+        JournalHeader.id, JournalHeader.total_debit, JournalHeader.total_credit, JournalHeader.date
+    ).filter(
         JournalHeader.company_id == company_id,
         JournalHeader.batch_id == batch_id,
         JournalHeader.status == JournalStatus.DRAFT
-    ).all()
-    
+    ).order_by(JournalHeader.id).with_for_update().all()
+
     if not journals:
         raise HTTPException(status_code=404, detail="Batch not found or already posted")
-        
-    for j in journals:
-        j.status = JournalStatus.POSTED
-        
+    total_debit = sum((j.total_debit or Decimal(0) for j in journals), Decimal(0))
+    total_credit = sum((j.total_credit or Decimal(0) for j in journals), Decimal(0))
+    if total_debit != total_credit:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch is not balanced. Total Debit: {total_debit}, Total Credit: {total_credit}"
+        )
+
+    journal_ids = [j.id for j in journals]
+    chunks = [journal_ids[i:i + BATCH_POST_CHUNK] for i in range(0, len(journal_ids), BATCH_POST_CHUNK)]
+    deltas = {}
+    lines_posted = 0
+    for chunk in chunks:
+        rows = db.query(
+            JournalDetail.account_id,
+            func.sum(JournalDetail.debit).label("total_debit"),
+            func.sum(JournalDetail.credit).label("total_credit"),
+            func.count(JournalDetail.id).label("lines")
+        ).filter(JournalDetail.journal_id.in_(chunk)).group_by(JournalDetail.account_id).all()
+        for row in rows:
+            prev_debit, prev_credit = deltas.get(row.account_id, (Decimal(0), Decimal(0)))
+            deltas[row.account_id] = (prev_debit + (row.total_debit or 0), prev_credit + (row.total_credit or 0))
+            lines_posted += row.lines
+    line_debit = sum((debit for debit, _ in deltas.values()), Decimal(0))
+    line_credit = sum((credit for _, credit in deltas.values()), Decimal(0))
+    if line_debit != total_debit or line_credit != total_credit:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Batch lines (Dr {line_debit} / Cr {line_credit}) do not match the journal totals "
+                   f"(Dr {total_debit} / Cr {total_credit}); the batch was edited, please review and retry"
+        )
+    validated = time.perf_counter()
+
+    posted = 0
+    for chunk in chunks:
+        posted += db.query(JournalHeader).filter(
+            JournalHeader.id.in_(chunk),
+            JournalHeader.status == JournalStatus.DRAFT
+        ).update({JournalHeader.status: JournalStatus.POSTED}, synchronize_session=False)
+    if posted != len(journal_ids):
+        # Only possible where the database ignores FOR UPDATE (SQLite serialises writers instead)
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Batch changed while posting, please retry")
+
+    record_posted_lines(db, company_id, deltas, min(j.date for j in journals))
     db.commit()
-    return {"message": f"Successfully posted {len(journals)} journals in batch {batch_id}"}
+    finished = time.perf_counter()
+
+    elapsed = finished - started
+    metrics = {
+        "journals_posted": posted,
+        "lines_posted": lines_posted,
+        "validate_ms": round((validated - started) * 1000, 2),
+        "post_ms": round((finished - validated) * 1000, 2),
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_sec": round(lines_posted / elapsed, 1) if elapsed > 0 else None
+    }
+    logger.info(f"Posted batch {batch_id} for company {company_id}: {metrics}")
+    return {"message": f"Successfully posted {posted} journals in batch {batch_id}", **metrics}
 
 def create_chart_of_account(db: Session, account_in, company_id: str):
     data = account_in.dict(exclude={"company_id"})
@@ -152,11 +907,47 @@ def create_chart_of_account(db: Session, account_in, company_id: str):
     )
     db.add(db_account)
     db.commit()
+    invalidate_account_cache(company_id)
     db.refresh(db_account)
     return db_account
 
-def get_journals(db: Session, company_id: str):
-    return db.query(JournalHeader).filter(JournalHeader.company_id == company_id).all()
+def keyset_page(query, date_column, id_column, cursor: Optional[str] = None, limit: int = 100,
+                start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Return one page of `query` ordered newest first by (date, id) plus the cursor for the
+    next page (None on the last page). Cost is independent of how deep the page is.
+    """
+    if start_date:
+        query = query.filter(date_column >= start_date)
+    if end_date:
+        query = query.filter(date_column <= end_date)
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, 2)
+        try:
+            after_date = date.fromisoformat(after_date)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        query = query.filter(or_(
+            date_column < after_date,
+            and_(date_column == after_date, id_column < after_id)
+        ))
+
+    rows = query.order_by(date_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, date_column.key), getattr(last, id_column.key)])
+    return rows, next_cursor
+
+def get_journals(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                 start_date: Optional[date] = None, end_date: Optional[date] = None, status: Optional[str] = None):
+    query = db.query(JournalHeader).options(selectinload(JournalHeader.lines)).filter(
+        JournalHeader.company_id == company_id
+    )
+    if status:
+        query = query.filter(JournalHeader.status == status)
+    return keyset_page(query, JournalHeader.date, JournalHeader.id, cursor, limit, start_date, end_date)
 
 def get_journal_by_id(db: Session, journal_id: str, company_id: str):
     return db.query(JournalHeader).filter(
@@ -164,30 +955,87 @@ def get_journal_by_id(db: Session, journal_id: str, company_id: str):
         JournalHeader.company_id == company_id
     ).first()
 
-def create_payment(db: Session, payment_in: PaymentHeaderCreate, company_id: str):
-    db_header = PaymentHeader(
+def _payment_request_hash(payment_in: PaymentHeaderCreate) -> str:
+    payload = json.dumps(payment_in.dict(exclude={"company_id"}), sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _replay_payment(db: Session, company_id: str, idempotency_key: str, request_hash: str) -> Optional[PaymentHeader]:
+    """The payment already created under this key, or None. A key reused for a different request is a 409."""
+    existing = db.query(PaymentHeader).options(selectinload(PaymentHeader.allocations)).filter(
+        PaymentHeader.company_id == company_id,
+        PaymentHeader.idempotency_key == idempotency_key
+    ).first()
+    if existing and existing.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency key was already used for a different payment"
+        )
+    return existing
+
+def create_payment(db: Session, payment_in: PaymentHeaderCreate, company_id: str, idempotency_key: Optional[str] = None):
+    """
+    Record a payment and its invoice allocations. Allocations to sales invoices are
+    validated against and applied to the invoice outstanding index in one locked read
+    and one bulk write. Retrying with the same idempotency key returns the original
+    payment instead of posting it twice.
+    """
+    request_hash = None
+    if idempotency_key:
+        request_hash = _payment_request_hash(payment_in)
+        existing = _replay_payment(db, company_id, idempotency_key, request_hash)
+        if existing:
+            return existing
+
+    amounts: Dict[str, Decimal] = {}
+    for allocation in payment_in.allocations:
+        amounts[allocation.invoice_id] = amounts.get(allocation.invoice_id, Decimal(0)) + Decimal(allocation.amount_allocated)
+    if sum(amounts.values(), Decimal(0)) > Decimal(payment_in.amount):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Allocations exceed the payment amount"
+        )
+
+    allocation_service.apply_allocations(db, company_id, amounts, kind="payment")
+
+    payment_id = str(uuid.uuid4())
+    db.add(PaymentHeader(
+        id=payment_id,
         date=payment_in.date,
         amount=payment_in.amount,
         payee_id=payment_in.payee_id,
         account_id=payment_in.account_id,
         mode=payment_in.mode,
-        company_id=company_id
-    )
-    db.add(db_header)
+        company_id=company_id,
+        idempotency_key=idempotency_key,
+        request_hash=request_hash
+    ))
     db.flush()
-    
-    for allocation in payment_in.allocations:
-        db_detail = PaymentDetail(
-            payment_id=db_header.id,
-            invoice_id=allocation.invoice_id,
-            amount_allocated=allocation.amount_allocated,
-            notes=allocation.notes
-        )
-        db.add(db_detail)
-    
-    db.commit()
-    db.refresh(db_header)
-    return db_header
+    if payment_in.allocations:
+        db.execute(insert(PaymentDetail), [
+            {
+                "id": str(uuid.uuid4()),
+                "payment_id": payment_id,
+                "invoice_id": allocation.invoice_id,
+                "amount_allocated": allocation.amount_allocated,
+                "notes": allocation.notes
+            }
+            for allocation in payment_in.allocations
+        ])
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        db.rollback()
+        if not idempotency_key:
+            raise
+        existing = _replay_payment(db, company_id, idempotency_key, request_hash)
+        if not existing:
+            raise
+        return existing
+    return db.query(PaymentHeader).options(selectinload(PaymentHeader.allocations)).filter(
+        PaymentHeader.id == payment_id
+    ).first()
 
 def create_budget(db: Session, budget_in: BudgetHeaderCreate, company_id: str):
     db_header = BudgetHeader(
@@ -212,6 +1060,81 @@ def create_budget(db: Session, budget_in: BudgetHeaderCreate, company_id: str):
     db.refresh(db_header)
     return db_header
 
+def invalidate_budget_variance(company_id: str, posted_from: date):
+    """Forget cached variance reports of budgets whose period ends on or after `posted_from`."""
+    budget_variance_cache.invalidate_where(
+        lambda key, report: key[0] == company_id and report["period_end"] >= posted_from
+    )
+
+def get_budget_variance(db: Session, budget_id: str, company_id: str, use_cache: bool = True):
+    """
+    Budget vs actual for every line of a budget. Actuals for all lines come from one grouped
+    aggregate over journals posted within the budget period, signed by each account's
+    typical balance.
+    """
+    cache_key = (company_id, budget_id)
+    if use_cache:
+        cached = budget_variance_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    budget = db.query(BudgetHeader).options(selectinload(BudgetHeader.lines)).filter(
+        BudgetHeader.id == budget_id,
+        BudgetHeader.company_id == company_id
+    ).first()
+    if not budget:
+        raise HTTPException(status_code=404, detail="Budget not found")
+
+    account_ids = list({line.account_id for line in budget.lines})
+    accounts = get_accounts(db, company_id, account_ids)
+    actuals = {
+        row.account_id: (row.total_debit or Decimal(0), row.total_credit or Decimal(0))
+        for row in db.query(
+            JournalDetail.account_id,
+            func.sum(JournalDetail.debit).label("total_debit"),
+            func.sum(JournalDetail.credit).label("total_credit")
+        ).join(JournalHeader).filter(
+            JournalHeader.company_id == company_id,
+            JournalHeader.status == JournalStatus.POSTED,
+            JournalHeader.date >= budget.period_start,
+            JournalHeader.date <= budget.period_end,
+            JournalDetail.account_id.in_(account_ids)
+        ).group_by(JournalDetail.account_id).all()
+    }
+
+    lines = []
+    total_budgeted = total_actual = Decimal(0)
+    for line in budget.lines:
+        account = accounts.get(line.account_id)
+        typical_balance = account.typical_balance if account else "Debit"
+        actual = compute_balance(typical_balance, Decimal(0), *actuals.get(line.account_id, (Decimal(0), Decimal(0))))
+        budgeted = line.budgeted_amount or Decimal(0)
+        total_budgeted += budgeted
+        total_actual += actual
+        lines.append({
+            "account_id": line.account_id,
+            "code": account.code if account else None,
+            "name": account.name if account else None,
+            "budgeted_amount": budgeted,
+            "actual_amount": actual,
+            "variance": budgeted - actual,
+            "utilisation": round(actual / budgeted * 100, 2) if budgeted else None
+        })
+
+    report = {
+        "budget_id": budget.id,
+        "period_start": budget.period_start,
+        "period_end": budget.period_end,
+        "description": budget.description,
+        "lines": lines,
+        "total_budgeted": total_budgeted,
+        "total_actual": total_actual,
+        "total_variance": total_budgeted - total_actual,
+        "utilisation": round(total_actual / total_budgeted * 100, 2) if total_budgeted else None
+    }
+    budget_variance_cache.set(cache_key, report)
+    return report
+
 def create_debit_note(db: Session, note_in: DebitNoteHeaderCreate, company_id: str):
     db_header = DebitNoteHeader(
         vendor_id=note_in.vendor_id,
@@ -266,35 +1189,36 @@ def create_credit_note(db: Session, note_in: CreditNoteHeaderCreate, company_id:
         )
         db.add(db_detail)
 
+    if note_in.reference_invoice_id:
+        allocation_service.apply_allocations(
+            db, company_id, {note_in.reference_invoice_id: Decimal(note_in.total_amount)}, kind="credit"
+        )
+
     db.commit()
     db.refresh(db_header)
     return db_header
 
 def create_fund_transfer(db: Session, transfer_in: FundTransferCreate, company_id: str):
-    # Verify both accounts exist and belong to this company
-    for acct_id in [transfer_in.from_account_id, transfer_in.to_account_id]:
-        account = db.query(ChartOfAccount).filter(
-            ChartOfAccount.id == acct_id,
-            ChartOfAccount.company_id == company_id
-        ).first()
-        if not account:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Account with ID {acct_id} not found"
-            )
-
-    # Check sufficient funds in source account
-    from_balance = calculate_account_balance(db, transfer_in.from_account_id, company_id)
-    if from_balance < transfer_in.amount:
+    if transfer_in.from_account_id == transfer_in.to_account_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Insufficient funds in source account. Available: {from_balance}, Requested: {transfer_in.amount}"
+            detail="From and To accounts must be different"
         )
 
-    if transfer_in.from_account_id == transfer_in.to_account_id:
+    # Verify both accounts exist and belong to this company
+    accounts = require_postable_accounts(db, company_id, [transfer_in.from_account_id, transfer_in.to_account_id])
+
+    # Lock both balance rows, then check funds against the precomputed totals.
+    # The lock is held until commit, so concurrent transfers from the same account serialize here.
+    balances = lock_account_balances(db, company_id, list(accounts))
+    source = accounts[transfer_in.from_account_id]
+    source_row = balances[transfer_in.from_account_id]
+    from_balance = compute_balance(source.typical_balance, source.opening_balance, source_row.total_debit, source_row.total_credit)
+    if from_balance < transfer_in.amount:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="From and To accounts must be different"
+            detail=f"Insufficient funds in source account. Available: {from_balance}, Requested: {transfer_in.amount}"
         )
 
     # Create automatic double-entry journal
@@ -312,6 +1236,10 @@ def create_fund_transfer(db: Session, transfer_in: FundTransferCreate, company_i
 
     db.add(JournalDetail(journal_id=db_journal.id, account_id=transfer_in.to_account_id, debit=transfer_in.amount, credit=0))
     db.add(JournalDetail(journal_id=db_journal.id, account_id=transfer_in.from_account_id, debit=0, credit=transfer_in.amount))
+    record_posted_lines(db, company_id, line_deltas([
+        (transfer_in.to_account_id, transfer_in.amount, Decimal(0)),
+        (transfer_in.from_account_id, Decimal(0), transfer_in.amount)
+    ]), transfer_in.date, expected_versions={account_id: row.version for account_id, row in balances.items()})
 
     db_transfer = FundTransfer(
         from_account_id=transfer_in.from_account_id,
@@ -357,6 +1285,8 @@ def create_cheque_deposit(db: Session, deposit_in: ChequeDepositCreate, company_
         date=deposit_in.deposit_date,
         total_amount=sum(c.amount for c in deposit_in.cheques),
         reconciled=False,
+        transaction_type="Deposit",
+        reference=deposit_in.reference,
         company_id=company_id
     )
     db.add(db_header)
@@ -367,7 +1297,8 @@ def create_cheque_deposit(db: Session, deposit_in: ChequeDepositCreate, company_
             tx_id=db_header.id,
             description=f"Cheque Deposit: {cheque.cheque_number} from {cheque.received_from}",
             amount=cheque.amount,
-            cheque_no=cheque.cheque_number
+            cheque_no=cheque.cheque_number.strip(),
+            cheque_status=ChequeStatus.DEPOSITED.value
         )
         db.add(db_detail)
 
@@ -375,33 +1306,213 @@ def create_cheque_deposit(db: Session, deposit_in: ChequeDepositCreate, company_
     db.refresh(db_header)
     return db_header
 
-def get_ledger_report(db: Session, account_id: str, start_date: date, end_date: date, company_id: str):
-    # Fetch all journal lines for this account within range
-    lines = db.query(JournalDetail).join(JournalHeader).filter(
+def _ledger_lines_query(db: Session, account_id: str, company_id: str, start_date: date, end_date: date):
+    return db.query(
+        JournalDetail.id,
+        JournalDetail.journal_id,
+        JournalHeader.date,
+        JournalHeader.reference,
+        JournalDetail.description,
+        JournalDetail.debit,
+        JournalDetail.credit
+    ).join(JournalHeader).filter(
         JournalDetail.account_id == account_id,
         JournalHeader.company_id == company_id,
+        JournalHeader.status == JournalStatus.POSTED,
         JournalHeader.date >= start_date,
         JournalHeader.date <= end_date
-    ).all()
-    return lines
+    )
+
+
+def iter_ledger_lines(db: Session, account, company_id: str, start_date: date, end_date: date,
+                      balance: Decimal, after: Optional[Tuple[date, str]] = None, batch_size: int = 1000):
+    """
+    Yield ledger lines in (date, id) order with a running balance, fetching
+    `batch_size` rows at a time by keyset so memory stays flat for any range.
+    """
+    base = _ledger_lines_query(db, account.id, company_id, start_date, end_date)
+    debit_normal = account.typical_balance == "Debit"
+    while True:
+        query = base
+        if after is not None:
+            after_date, after_id = after
+            query = query.filter(or_(
+                JournalHeader.date > after_date,
+                and_(JournalHeader.date == after_date, JournalDetail.id > after_id)
+            ))
+        rows = query.order_by(JournalHeader.date, JournalDetail.id).limit(batch_size).all()
+        for row in rows:
+            balance += (row.debit - row.credit) if debit_normal else (row.credit - row.debit)
+            line = dict(row._mapping)
+            line["running_balance"] = balance
+            yield line
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1].date, rows[-1].id)
+
+
+def _ledger_account(db: Session, account_id: str, company_id: str):
+    account = get_accounts(db, company_id, [account_id]).get(account_id)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return account
+
+
+def _ledger_opening_balance(db: Session, account, company_id: str, start_date: date) -> Decimal:
+    # Opening balance comes from the latest month-end snapshot plus the lines since
+    prior = get_totals_as_of(db, company_id, start_date - timedelta(days=1), [account.id])
+    return compute_balance(
+        account.typical_balance, account.opening_balance, *prior.get(account.id, (Decimal(0), Decimal(0)))
+    )
+
+
+def _ledger_balance_after(db: Session, account, company_id: str, after: Tuple[date, str]) -> Decimal:
+    """Running balance just after the line `after` = (date, id): the balance before that day plus its lines up to the id."""
+    after_date, after_id = after
+    balance = _ledger_opening_balance(db, account, company_id, after_date)
+    debit, credit = db.query(
+        func.coalesce(func.sum(JournalDetail.debit), 0), func.coalesce(func.sum(JournalDetail.credit), 0)
+    ).join(JournalHeader).filter(
+        JournalDetail.account_id == account.id,
+        JournalHeader.company_id == company_id,
+        JournalHeader.status == JournalStatus.POSTED,
+        JournalHeader.date == after_date,
+        JournalDetail.id <= after_id
+    ).one()
+    debit, credit = Decimal(debit), Decimal(credit)
+    return balance + ((debit - credit) if account.typical_balance == "Debit" else (credit - debit))
+
+
+def get_ledger_report(db: Session, account_id: str, start_date: date, end_date: date, company_id: str,
+                      cursor: Optional[str] = None, limit: int = 500):
+    account = _ledger_account(db, account_id, company_id)
+    opening_balance = _ledger_opening_balance(db, account, company_id, start_date)
 
-def get_payments(db: Session, company_id: str):
-    return db.query(PaymentHeader).filter(PaymentHeader.company_id == company_id).all()
+    # The cursor holds only the position; the balance there is recomputed from the snapshots
+    # and that day's lines, so an edited cursor can move the page but never falsify balances
+    after, balance = None, opening_balance
+    if cursor:
+        after_date, after_id = decode_cursor(cursor, 2)
+        try:
+            after = (date.fromisoformat(after_date), str(after_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        if not start_date <= after[0] <= end_date:
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        balance = _ledger_balance_after(db, account, company_id, after)
 
-def get_budgets(db: Session, company_id: str):
-    return db.query(BudgetHeader).filter(BudgetHeader.company_id == company_id).all()
+    lines = list(islice(
+        iter_ledger_lines(db, account, company_id, start_date, end_date, balance, after, batch_size=limit + 1),
+        limit + 1
+    ))
+    next_cursor = None
+    if len(lines) > limit:
+        lines = lines[:limit]
+        last = lines[-1]
+        next_cursor = encode_cursor([last["date"], last["id"]])
 
-def get_debit_notes(db: Session, company_id: str):
-    return db.query(DebitNoteHeader).filter(DebitNoteHeader.company_id == company_id).all()
+    return {
+        "account_id": account_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "opening_balance": opening_balance,
+        "closing_balance": lines[-1]["running_balance"] if lines else balance,
+        "lines": lines,
+        "next_cursor": next_cursor
+    }
 
-def get_credit_notes(db: Session, company_id: str):
-    return db.query(CreditNoteHeader).filter(CreditNoteHeader.company_id == company_id).all()
 
-def get_fund_transfers(db: Session, company_id: str):
-    return db.query(FundTransfer).filter(FundTransfer.company_id == company_id).all()
+LEDGER_CSV_COLUMNS = ["date", "reference", "journal_id", "id", "description", "debit", "credit", "running_balance"]
 
-def get_cheque_deposits(db: Session, company_id: str):
-    return db.query(BankTransactionHeader).filter(
+
+def stream_ledger_report(db: Session, account_id: str, start_date: date, end_date: date, company_id: str, fmt: str = "json"):
+    """
+    Render the full ledger for a range as an iterator of text chunks (JSON or CSV),
+    so a StreamingResponse can send it without building the whole report in memory.
+    """
+    account = _ledger_account(db, account_id, company_id)
+    opening_balance = _ledger_opening_balance(db, account, company_id, start_date)
+    lines = iter_ledger_lines(db, account, company_id, start_date, end_date, opening_balance)
+
+    def render_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(LEDGER_CSV_COLUMNS)
+        writer.writerow([start_date, "Opening Balance", "", "", "", "", "", opening_balance])
+        for line in lines:
+            writer.writerow([line[column] for column in LEDGER_CSV_COLUMNS])
+            if buffer.tell() > 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def render_json():
+        yield json.dumps({
+            "account_id": account_id,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "opening_balance": str(opening_balance)
+        })[:-1] + ', "lines": ['
+        separator = ""
+        for line in lines:
+            yield separator + json.dumps(line, default=str)
+            separator = ","
+        yield "]}"
+
+    return render_csv() if fmt == "csv" else render_json()
+
+def get_payments(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                 start_date: Optional[date] = None, end_date: Optional[date] = None):
+    query = db.query(PaymentHeader).options(selectinload(PaymentHeader.allocations)).filter(
+        PaymentHeader.company_id == company_id
+    )
+    return keyset_page(query, PaymentHeader.date, PaymentHeader.id, cursor, limit, start_date, end_date)
+
+def get_budgets(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                start_date: Optional[date] = None, end_date: Optional[date] = None):
+    query = db.query(BudgetHeader).options(selectinload(BudgetHeader.lines)).filter(
+        BudgetHeader.company_id == company_id
+    )
+    return keyset_page(query, BudgetHeader.period_start, BudgetHeader.id, cursor, limit, start_date, end_date)
+
+def get_debit_notes(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                    start_date: Optional[date] = None, end_date: Optional[date] = None, status: Optional[str] = None,
+                    posted: Optional[bool] = None):
+    query = db.query(DebitNoteHeader).options(selectinload(DebitNoteHeader.lines)).filter(
+        DebitNoteHeader.company_id == company_id
+    )
+    if status:
+        query = query.filter(DebitNoteHeader.status == status)
+    if posted is not None:
+        # posted = in the general ledger (see note_posting_service)
+        query = query.filter(DebitNoteHeader.journal_id != None if posted else DebitNoteHeader.journal_id == None)
+    return keyset_page(query, DebitNoteHeader.date, DebitNoteHeader.id, cursor, limit, start_date, end_date)
+
+def get_credit_notes(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                     start_date: Optional[date] = None, end_date: Optional[date] = None, status: Optional[str] = None,
+                     posted: Optional[bool] = None):
+    query = db.query(CreditNoteHeader).options(selectinload(CreditNoteHeader.lines)).filter(
+        CreditNoteHeader.company_id == company_id
+    )
+    if status:
+        query = query.filter(CreditNoteHeader.status == status)
+    if posted is not None:
+        # posted = in the general ledger (see note_posting_service)
+        query = query.filter(CreditNoteHeader.journal_id != None if posted else CreditNoteHeader.journal_id == None)
+    return keyset_page(query, CreditNoteHeader.date, CreditNoteHeader.id, cursor, limit, start_date, end_date)
+
+def get_fund_transfers(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                       start_date: Optional[date] = None, end_date: Optional[date] = None, status: Optional[str] = None):
+    query = db.query(FundTransfer).filter(FundTransfer.company_id == company_id)
+    if status:
+        query = query.filter(FundTransfer.status == status)
+    return keyset_page(query, FundTransfer.date, FundTransfer.id, cursor, limit, start_date, end_date)
+
+def get_cheque_deposits(db: Session, company_id: str, cursor: Optional[str] = None, limit: int = 100,
+                        start_date: Optional[date] = None, end_date: Optional[date] = None):
+    query = db.query(BankTransactionHeader).options(selectinload(BankTransactionHeader.lines)).filter(
         BankTransactionHeader.company_id == company_id,
         BankTransactionHeader.transaction_type == "Deposit"
-    ).all()
+    )
+    return keyset_page(query, BankTransactionHeader.date, BankTransactionHeader.id, cursor, limit, start_date, end_date)
@@ -0,0 +1,254 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, case, and_, or_, null, union_all
+from fastapi import HTTPException, status
+from db_models.accounting import PaymentHeader, PaymentDetail, CreditNoteHeader, DebitNoteHeader, InvoiceOutstanding
+from db_models.sales import InvoiceHeader, InvoiceStatus, SalesOrderHeader
+from db_models.purchasing import BillHeader, BillStatus
+from core.pagination import encode_cursor, decode_cursor
+from decimal import Decimal
+from datetime import date, timedelta
+from typing import List, Optional
+
+SIDES = ("receivables", "payables")
+# current: not yet due or due on as_of (0 days overdue); then whole days overdue, 1-30, 31-60, 61-90, over 90
+BUCKETS = ("current", "days_1_30", "days_31_60", "days_61_90", "days_over_90")
+
+
+def _bucket(due_date, as_of: date):
+    # Bucket boundaries are dates, so no per-row date arithmetic is needed
+    bounds = [as_of, as_of - timedelta(days=30), as_of - timedelta(days=60), as_of - timedelta(days=90)]
+    return case(
+        (due_date >= bounds[0], 0),
+        (due_date >= bounds[1], 1),
+        (due_date >= bounds[2], 2),
+        (due_date >= bounds[3], 3),
+        else_=4
+    )
+
+
+def _open_invoices(company_id: str, as_of: date, party_ids: Optional[List[str]] = None):
+    """
+    Open sales invoices as of a date, read from the invoice_outstanding index that
+    allocation_service keeps current (draft and cancelled invoices are 0 there).
+    Outstanding as of `as_of` is the indexed amount plus payments and posted credit
+    notes dated after it, so only invoices open now or settled after `as_of` are read.
+    Company-wide reads use the index alone and leave party_id empty.
+    """
+    later = union_all(
+        select(PaymentDetail.invoice_id.label("document_id"), PaymentDetail.amount_allocated.label("amount")).join(
+            PaymentHeader
+        ).where(PaymentHeader.company_id == company_id, PaymentHeader.date > as_of),
+        select(CreditNoteHeader.reference_invoice_id, CreditNoteHeader.total_amount).where(
+            CreditNoteHeader.company_id == company_id, CreditNoteHeader.status == "Posted", CreditNoteHeader.date > as_of,
+            CreditNoteHeader.reference_invoice_id != None
+        )
+    ).subquery()
+    later = select(later.c.document_id, func.sum(later.c.amount).label("amount")).group_by(later.c.document_id).subquery()
+
+    filters = [InvoiceOutstanding.company_id == company_id, InvoiceOutstanding.date <= as_of]
+    open_now = InvoiceOutstanding.__table__.outerjoin(later, later.c.document_id == InvoiceOutstanding.invoice_id)
+    reopened = later.join(InvoiceOutstanding.__table__, InvoiceOutstanding.invoice_id == later.c.document_id).join(
+        InvoiceHeader.__table__, InvoiceHeader.id == InvoiceOutstanding.invoice_id
+    )
+    if party_ids is not None:
+        party = SalesOrderHeader.customer_id
+        filters += [SalesOrderHeader.company_id == company_id, party.in_(party_ids)]
+        open_now = open_now.join(InvoiceHeader.__table__, InvoiceHeader.id == InvoiceOutstanding.invoice_id).join(
+            SalesOrderHeader.__table__, SalesOrderHeader.id == InvoiceHeader.order_id
+        )
+        reopened = reopened.join(SalesOrderHeader.__table__, SalesOrderHeader.id == InvoiceHeader.order_id)
+    else:
+        party = null()
+
+    columns = [
+        InvoiceOutstanding.invoice_id.label("document_id"),
+        party.label("party_id"),
+        InvoiceOutstanding.date.label("date"),
+        InvoiceOutstanding.due_date.label("due_date"),
+        InvoiceOutstanding.invoice_total.label("total"),
+        (InvoiceOutstanding.outstanding + func.coalesce(later.c.amount, 0)).label("outstanding"),
+        _bucket(InvoiceOutstanding.due_date, as_of).label("bucket")
+    ]
+    # Open now, by (company_id, outstanding); and settled now but reopened by settlements dated after as_of
+    docs = union_all(
+        select(*columns).select_from(open_now).where(*filters, InvoiceOutstanding.outstanding > 0),
+        select(*columns).select_from(reopened).where(
+            *filters, InvoiceOutstanding.outstanding <= 0,
+            InvoiceHeader.status.notin_([InvoiceStatus.DRAFT, InvoiceStatus.CANCELLED])
+        )
+    ).subquery()
+    return select(docs).where(docs.c.outstanding > 0).subquery()
+
+
+def _open_bills(company_id: str, as_of: date, party_ids: Optional[List[str]] = None):
+    """
+    Open bills as of a date. Bills have no outstanding index, so settlements dated on
+    or before `as_of` are summed: pre-aggregated per bill for company-wide reads, and
+    as correlated sums over the per-bill indexes for reads limited to `party_ids`.
+    """
+    document_id, party, doc_date = BillHeader.id, BillHeader.vendor_id, BillHeader.date
+    due_date = func.coalesce(BillHeader.due_date, BillHeader.date)
+    total = BillHeader.amount - func.coalesce(BillHeader.tds_deducted, 0)
+    source = BillHeader.__table__
+    filters = [
+        BillHeader.company_id == company_id,
+        BillHeader.status.notin_([BillStatus.DRAFT, BillStatus.VOID])
+    ]
+    note_document, note_amount = DebitNoteHeader.reference_bill_id, DebitNoteHeader.total_amount
+    note_filters = [DebitNoteHeader.company_id == company_id, DebitNoteHeader.status == "Posted", DebitNoteHeader.date <= as_of]
+
+    payment_filters = [PaymentHeader.company_id == company_id, PaymentHeader.date <= as_of]
+    if party_ids is not None:
+        filters.append(party.in_(party_ids))
+        settled = select(func.coalesce(func.sum(PaymentDetail.amount_allocated), 0)).join(PaymentHeader).where(
+            PaymentDetail.invoice_id == document_id, *payment_filters
+        ).scalar_subquery()
+        noted = select(func.coalesce(func.sum(note_amount), 0)).where(
+            note_document == document_id, *note_filters
+        ).scalar_subquery()
+    else:
+        payments = select(
+            PaymentDetail.invoice_id.label("document_id"),
+            func.sum(PaymentDetail.amount_allocated).label("amount")
+        ).join(PaymentHeader).where(*payment_filters).group_by(PaymentDetail.invoice_id).subquery()
+        notes = select(
+            note_document.label("document_id"),
+            func.sum(note_amount).label("amount")
+        ).where(*note_filters).group_by(note_document).subquery()
+        source = source.outerjoin(payments, payments.c.document_id == document_id).outerjoin(notes, notes.c.document_id == document_id)
+        settled, noted = func.coalesce(payments.c.amount, 0), func.coalesce(notes.c.amount, 0)
+
+    docs = select(
+        document_id.label("document_id"),
+        party.label("party_id"),
+        doc_date.label("date"),
+        due_date.label("due_date"),
+        total.label("total"),
+        (total - settled - noted).label("outstanding"),
+        _bucket(due_date, as_of).label("bucket")
+    ).select_from(source).where(*filters, doc_date <= as_of).subquery()
+    return select(docs).where(docs.c.outstanding > 0).subquery()
+
+
+def _open_documents(company_id: str, side: str, as_of: date, party_ids: Optional[List[str]] = None):
+    """
+    Open invoices (receivables) or bills (payables) as of a date, one row per document:
+    (document_id, party_id, date, due_date, total, outstanding, bucket). Settlements
+    dated after `as_of` are ignored, so past dates give historical ageing.
+    """
+    if side == "receivables":
+        return _open_invoices(company_id, as_of, party_ids)
+    if side == "payables":
+        return _open_bills(company_id, as_of, party_ids)
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ageing side must be one of {', '.join(SIDES)}")
+
+
+def _bucket_totals(rows) -> dict:
+    """Fold (bucket, amount, documents) rows into the bucket dict returned by the API."""
+    result = {name: Decimal(0) for name in BUCKETS}
+    documents = 0
+    for bucket, amount, count in rows:
+        result[BUCKETS[bucket]] += Decimal(amount or 0)
+        documents += count
+    return {**result, "total": sum(result.values(), Decimal(0)), "documents": documents}
+
+
+def get_ageing_summary(db: Session, company_id: str, side: str, as_of: Optional[date] = None):
+    """
+    Bucket totals for the whole company in one grouped query. Receivables read only the
+    open rows of the outstanding index, not every invoice the company ever issued.
+    """
+    as_of = as_of or date.today()
+    docs = _open_documents(company_id, side, as_of)
+    rows = db.execute(
+        select(docs.c.bucket, func.sum(docs.c.outstanding), func.count()).group_by(docs.c.bucket)
+    ).all()
+    return {"side": side, "as_of": as_of, **_bucket_totals(rows)}
+
+
+def _party_page(db: Session, company_id: str, side: str, after: Optional[str], limit: int) -> List[str]:
+    """Next `limit` + 1 customer or vendor ids in id order, read from the party index."""
+    if side == "receivables":
+        party = SalesOrderHeader.customer_id
+        query = select(party).where(SalesOrderHeader.company_id == company_id)
+    else:
+        party = BillHeader.vendor_id
+        query = select(party).where(BillHeader.company_id == company_id)
+    if after is not None:
+        query = query.where(party > after)
+    return [row[0] for row in db.execute(query.distinct().order_by(party).limit(limit + 1)).all()]
+
+
+def get_ageing_by_party(db: Session, company_id: str, side: str, as_of: Optional[date] = None,
+                        cursor: Optional[str] = None, limit: int = 100):
+    """
+    Bucket totals per customer or vendor, keyset-paginated by party id. The page of
+    parties comes from the party index, then one query groups just their open documents
+    by (party, bucket), so a page costs the same however deep it is. Parties with
+    nothing open are left out, so a page may be short while a next cursor exists.
+    """
+    as_of = as_of or date.today()
+    if side not in SIDES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Ageing side must be one of {', '.join(SIDES)}")
+    after = decode_cursor(cursor, 1)[0] if cursor else None
+    party_ids = _party_page(db, company_id, side, after, limit)
+    next_cursor = None
+    if len(party_ids) > limit:
+        party_ids = party_ids[:limit]
+        next_cursor = encode_cursor([party_ids[-1]])
+    if not party_ids:
+        return [], next_cursor
+
+    docs = _open_documents(company_id, side, as_of, party_ids)
+    rows = db.execute(
+        select(docs.c.party_id, docs.c.bucket, func.sum(docs.c.outstanding), func.count()).group_by(
+            docs.c.party_id, docs.c.bucket
+        )
+    ).all()
+    by_party = {}
+    for party_id, bucket, amount, count in rows:
+        by_party.setdefault(party_id, []).append((bucket, amount, count))
+    return [
+        {"party_id": party_id, **_bucket_totals(by_party[party_id])}
+        for party_id in party_ids if party_id in by_party
+    ], next_cursor
+
+
+def get_ageing_documents(db: Session, company_id: str, side: str, party_id: str, as_of: Optional[date] = None,
+                         cursor: Optional[str] = None, limit: int = 100):
+    """Open documents of one customer or vendor, oldest due first, keyset-paginated by (due_date, id)."""
+    as_of = as_of or date.today()
+    docs = _open_documents(company_id, side, as_of, [party_id])
+    query = select(docs)
+    if cursor:
+        after_due, after_id = decode_cursor(cursor, 2)
+        try:
+            after_due = date.fromisoformat(after_due)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        query = query.where(or_(
+            docs.c.due_date > after_due,
+            and_(docs.c.due_date == after_due, docs.c.document_id > after_id)
+        ))
+
+    rows = db.execute(query.order_by(docs.c.due_date, docs.c.document_id).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].due_date, rows[-1].document_id])
+    return [
+        {
+            "document_id": row.document_id,
+            "date": row.date,
+            "due_date": row.due_date,
+            "total": row.total,
+            "outstanding": row.outstanding,
+            "days_overdue": max((as_of - _as_date(row.due_date)).days, 0)
+        }
+        for row in rows
+    ], next_cursor
+
+
+def _as_date(value) -> date:
+    # coalesce() over dates comes back as a string on some drivers
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
@@ -0,0 +1,208 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import event, func, select, insert, update, delete, inspect, or_
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException, status
+from db_models.accounting import InvoiceOutstanding, PaymentHeader, PaymentDetail, CreditNoteHeader
+from db_models.sales import InvoiceHeader, InvoiceStatus
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+CLOSED_STATUSES = (InvoiceStatus.DRAFT, InvoiceStatus.CANCELLED)
+# Invoice columns the outstanding index depends on; a change to any of them resyncs it
+INDEXED_FIELDS = ("date", "due_date", "total", "status")
+
+
+def compute_outstanding(db, company_id: str, invoice_ids: List[str]) -> Dict[str, dict]:
+    """
+    Settlement state of invoices recomputed from the source tables (three grouped reads).
+    Draft and cancelled invoices are owed nothing, so their outstanding is 0. `db` is a
+    Session or, inside a flush, the flush's Connection.
+    """
+    invoices = db.execute(select(
+        InvoiceHeader.id, InvoiceHeader.date, InvoiceHeader.due_date, InvoiceHeader.total, InvoiceHeader.status
+    ).where(
+        InvoiceHeader.company_id == company_id,
+        InvoiceHeader.id.in_(invoice_ids)
+    )).all()
+    paid = dict(db.execute(select(PaymentDetail.invoice_id, func.sum(PaymentDetail.amount_allocated)).join(PaymentHeader).where(
+        PaymentHeader.company_id == company_id,
+        PaymentDetail.invoice_id.in_(invoice_ids)
+    ).group_by(PaymentDetail.invoice_id)).all())
+    credited = dict(db.execute(select(CreditNoteHeader.reference_invoice_id, func.sum(CreditNoteHeader.total_amount)).where(
+        CreditNoteHeader.company_id == company_id,
+        CreditNoteHeader.status == "Posted",
+        CreditNoteHeader.reference_invoice_id.in_(invoice_ids)
+    ).group_by(CreditNoteHeader.reference_invoice_id)).all())
+
+    result = {}
+    for invoice in invoices:
+        total = Decimal(invoice.total or 0)
+        paid_amount = Decimal(paid.get(invoice.id) or 0)
+        credited_amount = Decimal(credited.get(invoice.id) or 0)
+        result[invoice.id] = {
+            "invoice_id": invoice.id,
+            "company_id": company_id,
+            "date": invoice.date,
+            "due_date": invoice.due_date,
+            "invoice_total": total,
+            "paid_amount": paid_amount,
+            "credited_amount": credited_amount,
+            "outstanding": Decimal("0.00") if invoice.status in CLOSED_STATUSES else total - paid_amount - credited_amount
+        }
+    return result
+
+
+def sync_invoice_outstanding(db: Session, company_id: str, invoice_ids: List[str]):
+    """
+    Rewrite the outstanding index of the given invoices from the source tables.
+    ORM writes to an invoice resync it as they are flushed (see _resync_written_invoice);
+    bulk or raw SQL writes to invoice_headers must call this themselves. lock_outstanding also
+    calls it for invoices it finds missing or stale.
+    """
+    computed = compute_outstanding(db, company_id, invoice_ids)
+    if not computed:
+        return
+    existing = {row.invoice_id for row in db.query(InvoiceOutstanding.invoice_id).filter(
+        InvoiceOutstanding.invoice_id.in_(list(computed))
+    )}
+    if existing:
+        db.execute(update(InvoiceOutstanding), [computed[invoice_id] for invoice_id in existing])
+    missing = [row for invoice_id, row in computed.items() if invoice_id not in existing]
+    if missing:
+        try:
+            with db.begin_nested():
+                db.execute(insert(InvoiceOutstanding), missing)
+        except IntegrityError:
+            pass  # A concurrent transaction seeded them first; its rows are as fresh as ours
+
+
+def _is_stale(status, total, entry) -> bool:
+    # Missing, written for another total, or still owed after the invoice was closed
+    return entry is None or entry.invoice_total != total or (status in CLOSED_STATUSES and entry.outstanding != 0)
+
+
+@event.listens_for(InvoiceHeader, "after_insert")
+@event.listens_for(InvoiceHeader, "after_update")
+def _resync_written_invoice(mapper, connection, invoice):
+    """
+    Rewrite the index row of an invoice whose total, status or dates were just flushed,
+    on the flush's own connection, so it commits or rolls back with the invoice. The
+    invoice row is locked by this write, so no other transaction can seed the index
+    row concurrently.
+    """
+    state = inspect(invoice)
+    if not any(state.attrs[name].history.has_changes() for name in INDEXED_FIELDS):
+        return
+    row = compute_outstanding(connection, invoice.company_id, [invoice.id]).get(invoice.id)
+    if row is None:
+        return
+    table = InvoiceOutstanding.__table__
+    if not connection.execute(update(table).where(table.c.invoice_id == invoice.id).values(**row)).rowcount:
+        connection.execute(insert(table).values(**row))
+
+
+@event.listens_for(InvoiceHeader, "before_delete")
+def _drop_deleted_invoice(mapper, connection, invoice):
+    # The index row references the invoice, so it goes first
+    table = InvoiceOutstanding.__table__
+    connection.execute(delete(table).where(table.c.invoice_id == invoice.id))
+
+
+def lock_outstanding(db: Session, company_id: str, invoice_ids: List[str]) -> Dict[str, Tuple]:
+    """
+    Lock and return (invoice status, index row) for every sales invoice of the company
+    among `invoice_ids`, in invoice_id order. Ids that are not sales invoices of the
+    company are absent from the result.
+    """
+    query = db.query(InvoiceHeader.id, InvoiceHeader.total, InvoiceHeader.status, InvoiceOutstanding).outerjoin(
+        InvoiceOutstanding, InvoiceOutstanding.invoice_id == InvoiceHeader.id
+    ).filter(
+        InvoiceHeader.company_id == company_id,
+        InvoiceHeader.id.in_(sorted(set(invoice_ids)))
+    ).order_by(InvoiceHeader.id).with_for_update()
+
+    rows = query.all()
+    stale = [row.id for row in rows if _is_stale(row.status, row.total, row[3])]
+    if stale:
+        sync_invoice_outstanding(db, company_id, stale)
+        rows = query.populate_existing().all()
+    return {row.id: (row.status, row[3]) for row in rows}
+
+
+def apply_allocations(db: Session, company_id: str, amounts: Dict[str, Decimal], kind: str = "payment"):
+    """
+    Validate and apply settlement amounts per invoice: one locked read of the index,
+    then one bulk update of the index and one of the invoice statuses.
+
+    Payments must go to open invoices and may not exceed what is outstanding; a
+    credit note may exceed it (the customer is left in credit). Ids that are not
+    sales invoices of the company are left alone. On a validation failure the
+    transaction is rolled back and a 400 lists every offending allocation.
+    """
+    index = lock_outstanding(db, company_id, list(amounts))
+    column = "paid_amount" if kind == "payment" else "credited_amount"
+
+    errors, index_rows, status_rows = [], [], []
+    for invoice_id, amount in amounts.items():
+        if invoice_id not in index:
+            continue
+        invoice_status, entry = index[invoice_id]
+        if amount <= 0:
+            errors.append({"invoice_id": invoice_id, "error": "Amount must be positive"})
+            continue
+        if invoice_status in CLOSED_STATUSES:
+            errors.append({"invoice_id": invoice_id, "error": f"Invoice is {invoice_status.value}"})
+            continue
+        if kind == "payment" and amount > entry.outstanding:
+            errors.append({
+                "invoice_id": invoice_id,
+                "error": f"Allocation {amount} exceeds outstanding {entry.outstanding}"
+            })
+            continue
+
+        outstanding = entry.outstanding - amount
+        index_rows.append({
+            "invoice_id": invoice_id,
+            column: getattr(entry, column) + amount,
+            "outstanding": outstanding
+        })
+        if outstanding <= 0:
+            new_status = InvoiceStatus.PAID
+        elif invoice_status == InvoiceStatus.OVERDUE:
+            new_status = invoice_status
+        else:
+            new_status = InvoiceStatus.PARTIALLY_PAID
+        if new_status != invoice_status:
+            status_rows.append({"id": invoice_id, "status": new_status})
+
+    if errors:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"message": "Invalid invoice allocations", "errors": errors}
+        )
+    if index_rows:
+        db.execute(update(InvoiceOutstanding), index_rows)
+    if status_rows:
+        db.execute(update(InvoiceHeader), status_rows)
+
+
+def get_invoice_outstanding(db: Session, invoice_id: str, company_id: str):
+    """
+    Settlement state of one invoice, read-only: the index row when it is current,
+    otherwise recomputed from the source tables (lock_outstanding repairs the index
+    on the next allocation), so it can be served from the read replica.
+    """
+    entry = db.query(InvoiceOutstanding).join(InvoiceHeader, InvoiceHeader.id == InvoiceOutstanding.invoice_id).filter(
+        InvoiceOutstanding.invoice_id == invoice_id,
+        InvoiceOutstanding.company_id == company_id,
+        InvoiceOutstanding.invoice_total == InvoiceHeader.total,
+        or_(InvoiceHeader.status.notin_(CLOSED_STATUSES), InvoiceOutstanding.outstanding == 0)
+    ).first()
+    if entry:
+        return entry
+
+    computed = compute_outstanding(db, company_id, [invoice_id]).get(invoice_id)
+    if computed is None:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    return computed
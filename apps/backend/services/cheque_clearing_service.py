@@ -0,0 +1,207 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update
+from fastapi import HTTPException, status
+from db_models.accounting import JournalHeader, JournalDetail, JournalStatus
+from db_models.pos_banking import BankTransactionHeader, BankTransactionDetail, ChequeStatus
+from services import accounting_service
+from services.reconciliation_service import cheque_key
+from decimal import Decimal, InvalidOperation
+from datetime import date
+from typing import Dict, List, Optional
+import csv
+import io
+import time
+import uuid
+
+CENT = Decimal("0.01")
+LOOKUP_CHUNK = 1000
+
+CLEARED_WORDS = {"cleared", "clear", "c", "paid", "honoured", "honored"}
+BOUNCED_WORDS = {"bounced", "bounce", "b", "returned", "return", "r", "dishonoured", "dishonored", "unpaid"}
+
+
+def parse_clearing_file(stream, default_date: date) -> List[Dict]:
+    """
+    CSV clearing file with a header row: `cheque_no` (or `cheque_number`) and `status`
+    (cleared / bounced, or the bank's C / R codes); optional `date` (defaults to the
+    clearing date of the upload), `amount` (checked against the deposited amount) and
+    `reason` (kept on bounced cheques). Rows that cannot be read are returned with an
+    `error` instead of being dropped, so the report accounts for every line.
+    """
+    rows = []
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline=""))
+    for number, raw in enumerate(reader, start=2):
+        raw = {k.strip().lower(): (v or "").strip() for k, v in raw.items() if k}
+        row = {"row": number, "cheque_no": raw.get("cheque_no") or raw.get("cheque_number") or None, "error": None}
+        word = raw.get("status", "").lower()
+        try:
+            row["date"] = date.fromisoformat(raw["date"]) if raw.get("date") else default_date
+            row["amount"] = Decimal(raw["amount"].replace(",", "")).quantize(CENT) if raw.get("amount") else None
+        except (ValueError, InvalidOperation) as e:
+            row["error"] = f"Could not read row: {e}"
+        if word in CLEARED_WORDS:
+            row["status"] = ChequeStatus.CLEARED
+        elif word in BOUNCED_WORDS:
+            row["status"] = ChequeStatus.BOUNCED
+        else:
+            row["status"] = None
+            row["error"] = row["error"] or f"Unknown status '{raw.get('status', '')}'"
+        if not row["cheque_no"]:
+            row["error"] = row["error"] or "Missing cheque number"
+        row["reason"] = raw.get("reason") or None
+        rows.append(row)
+    return rows
+
+
+def _open_cheques(db: Session, company_id: str, bank_account_id: str, cheque_nos: List[str]) -> Dict[str, List]:
+    """
+    Deposited, not yet cleared or bounced cheques of the account, by cheque_key, so
+    "000123" in a bank file finds "123" in the books. The account's open cheques are
+    read once to match the keys; only the matching rows are then locked (chunked IN
+    on the primary key) until commit, so two uploads carrying the same cheque cannot
+    both clear it.
+    """
+    wanted = {cheque_key(number) for number in cheque_nos} - {None}
+    open_filters = [
+        BankTransactionDetail.cheque_status == ChequeStatus.DEPOSITED.value,
+        BankTransactionHeader.company_id == company_id,
+        BankTransactionHeader.bank_account_id == bank_account_id,
+        BankTransactionHeader.transaction_type == "Deposit"
+    ]
+    ids = sorted(
+        row.id for row in db.query(BankTransactionDetail.id, BankTransactionDetail.cheque_no).join(
+            BankTransactionHeader, BankTransactionDetail.tx_id == BankTransactionHeader.id
+        ).filter(BankTransactionDetail.cheque_no != None, *open_filters)
+        if cheque_key(row.cheque_no) in wanted
+    )
+
+    by_key: Dict[str, List] = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        rows = db.query(
+            BankTransactionDetail.id, BankTransactionDetail.cheque_no, BankTransactionDetail.amount,
+            BankTransactionDetail.description, BankTransactionHeader.date, BankTransactionHeader.reference
+        ).join(BankTransactionHeader, BankTransactionDetail.tx_id == BankTransactionHeader.id).filter(
+            BankTransactionDetail.id.in_(ids[start:start + LOOKUP_CHUNK]),
+            *open_filters  # Re-checked under the lock: a concurrent upload may have cleared it
+        ).order_by(BankTransactionDetail.id).with_for_update().all()
+        for row in rows:
+            by_key.setdefault(cheque_key(row.cheque_no), []).append(row)
+    return by_key
+
+
+def _pick(candidates: List, amount: Optional[Decimal]):
+    """The one open cheque a clearing line refers to, or an error message."""
+    if amount is not None:
+        candidates = [c for c in candidates if c.amount.quantize(CENT) == amount]
+        if not candidates:
+            return None, f"No open cheque for {amount}"
+    if len(candidates) > 1:
+        return None, "Several open cheques share this number; give the amount to pick one"
+    return candidates[0], None
+
+
+def apply_clearing(db: Session, company_id: str, bank_account_id: str, clearing_account_id: str,
+                   clearing_rows: List[Dict]):
+    """
+    Move deposited cheques to Cleared or Bounced from a parsed clearing file in one pass:
+    one read of the account's open cheques, a locking IN lookup per thousand matches,
+    one bulk status update, and for the cleared cheques one journal each (Dr bank
+    account, Cr clearing account) written as two bulk INSERTs with a single balance
+    update, all in one commit.
+
+    Bounced cheques were never taken into the bank ledger (deposits post nothing until
+    they clear), so they only change status. Lines that match no open cheque, repeat a
+    cheque already in the file, or predate the deposit are rejected and reported; the
+    rest of the file is still applied.
+    """
+    started = time.perf_counter()
+    if not clearing_rows:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Clearing file has no cheques")
+    if bank_account_id == clearing_account_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bank and clearing accounts must be different")
+    accounting_service.require_postable_accounts(db, company_id, [bank_account_id, clearing_account_id])
+
+    open_cheques = _open_cheques(
+        db, company_id, bank_account_id,
+        sorted({row["cheque_no"] for row in clearing_rows if not row["error"]})
+    )
+
+    taken = set()
+    rejected, detail_rows, headers, lines = [], [], [], []
+    cleared = bounced = 0
+    cleared_amount = Decimal(0)
+    for row in clearing_rows:
+        error = row["error"]
+        cheque = None
+        if not error:
+            key = cheque_key(row["cheque_no"])
+            candidates = [c for c in open_cheques.get(key, []) if c.id not in taken]
+            if not candidates:
+                error = "Already processed earlier in this file" if open_cheques.get(key) else "No open cheque with this number"
+            else:
+                cheque, error = _pick(candidates, row["amount"])
+        if not error and row["date"] < cheque.date:
+            error = f"Clearing date {row['date']} is before the deposit date {cheque.date}"
+        if error:
+            rejected.append({"row": row["row"], "cheque_no": row["cheque_no"], "error": error})
+            continue
+
+        taken.add(cheque.id)
+        update_row = {"id": cheque.id, "cheque_status": row["status"].value, "status_date": row["date"],
+                      "bounce_reason": None, "journal_id": None}
+        if row["status"] == ChequeStatus.BOUNCED:
+            update_row["bounce_reason"] = row["reason"]
+            bounced += 1
+        else:
+            amount = accounting_service._money(cheque.amount)
+            journal_id = str(uuid.uuid4())
+            update_row["journal_id"] = journal_id
+            headers.append({
+                "id": journal_id,
+                "date": row["date"],
+                "reference": f"CHQ-{cheque.cheque_no}",
+                "notes": f"Cheque {cheque.cheque_no} cleared" + (f", deposit {cheque.reference}" if cheque.reference else ""),
+                "total_debit": amount,
+                "total_credit": amount,
+                "status": JournalStatus.POSTED,
+                "company_id": company_id
+            })
+            lines.append({"id": str(uuid.uuid4()), "journal_id": journal_id, "account_id": bank_account_id,
+                          "debit": amount, "credit": Decimal(0), "description": cheque.description})
+            lines.append({"id": str(uuid.uuid4()), "journal_id": journal_id, "account_id": clearing_account_id,
+                          "debit": Decimal(0), "credit": amount, "description": cheque.description})
+            cleared += 1
+            cleared_amount += amount
+        detail_rows.append(update_row)
+
+    if headers:
+        db.execute(insert(JournalHeader), headers)
+        db.execute(insert(JournalDetail), lines)
+        accounting_service.record_posted_lines(db, company_id, {
+            bank_account_id: (cleared_amount, Decimal(0)),
+            clearing_account_id: (Decimal(0), cleared_amount)
+        }, min(h["date"] for h in headers))
+    if detail_rows:
+        db.execute(update(BankTransactionDetail), detail_rows)
+    db.commit()
+
+    return {
+        "bank_account_id": bank_account_id,
+        "rows": len(clearing_rows),
+        "cleared": cleared,
+        "bounced": bounced,
+        "rejected": len(rejected),
+        "cleared_amount": cleared_amount,
+        "journals_posted": len(headers),
+        "rejected_rows": rejected,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def apply_clearing_file(db: Session, stream, company_id: str, bank_account_id: str, clearing_account_id: str,
+                        clearing_date: date):
+    try:
+        rows = parse_clearing_file(stream, clearing_date)
+    except (KeyError, ValueError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse clearing file: {e}")
+    return apply_clearing(db, company_id, bank_account_id, clearing_account_id, rows)
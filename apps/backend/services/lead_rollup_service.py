@@ -0,0 +1,134 @@
+"""
+Daily lead rollups for the marketing dashboards.
+
+Every lead counts once in marketing_lead_daily_rollups under its creation day and
+current (source, status, city, category), with its lead score added to score_sum.
+The lead write paths in marketing_service pass the lead's state before and after the
+change to record_lead_change, which applies the difference as a single upsert in the
+same transaction, so the rollups never drift from the leads they summarise.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from db_models.marketing import BusinessLead, LeadDailyRollup
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+import enum
+
+# (day, source, status, city, category)
+RollupKey = Tuple
+LeadState = Tuple[RollupKey, int]
+
+
+def _text(value) -> str:
+    if isinstance(value, enum.Enum):
+        value = value.value
+    return value or ''
+
+
+def lead_state(lead: BusinessLead) -> Optional[LeadState]:
+    """The rollup key and score a lead currently contributes; None for legacy leads without created_at"""
+    if lead.created_at is None:
+        return None
+    key = (lead.created_at.date(), _text(lead.source), _text(lead.lead_status), _text(lead.city), _text(lead.category))
+    return key, lead.lead_score or 0
+
+
+def record_lead_change(db: Session, before: Optional[LeadState], after: Optional[LeadState]):
+    """
+    Move a lead from `before` to `after` in the rollups (None for a created or deleted
+    lead). Does not commit; callers run it inside the transaction that writes the lead.
+    """
+    deltas: Dict[RollupKey, list] = defaultdict(lambda: [0, 0])
+    if before:
+        key, score = before
+        deltas[key][0] -= 1
+        deltas[key][1] -= score
+    if after:
+        key, score = after
+        deltas[key][0] += 1
+        deltas[key][1] += score
+    deltas = {key: delta for key, delta in deltas.items() if delta != [0, 0]}
+    if deltas:
+        _apply_deltas(db, deltas)
+
+
+def _apply_deltas(db: Session, deltas: Dict[RollupKey, list]):
+    """Add [lead_count, score_sum] deltas to their rollup rows in one multi-row upsert"""
+    # Rows in key order, so concurrent writers lock them in the same order
+    rows = [
+        {"day": day, "source": source, "status": status, "city": city, "category": category,
+         "lead_count": count, "score_sum": score}
+        for (day, source, status, city, category), (count, score) in sorted(deltas.items())
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(LeadDailyRollup).values(rows)
+        incoming = stmt.inserted
+        db.execute(stmt.on_duplicate_key_update(
+            lead_count=LeadDailyRollup.lead_count + incoming.lead_count,
+            score_sum=LeadDailyRollup.score_sum + incoming.score_sum
+        ))
+    elif dialect == "sqlite":
+        stmt = sqlite_insert(LeadDailyRollup).values(rows)
+        incoming = stmt.excluded
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[LeadDailyRollup.day, LeadDailyRollup.source, LeadDailyRollup.status,
+                            LeadDailyRollup.city, LeadDailyRollup.category],
+            set_={
+                "lead_count": LeadDailyRollup.lead_count + incoming.lead_count,
+                "score_sum": LeadDailyRollup.score_sum + incoming.score_sum
+            }
+        ))
+    else:
+        for row in rows:
+            rollup = db.query(LeadDailyRollup).filter_by(
+                day=row["day"], source=row["source"], status=row["status"], city=row["city"], category=row["category"]
+            ).with_for_update().first()
+            if rollup:
+                rollup.lead_count += row["lead_count"]
+                rollup.score_sum += row["score_sum"]
+            else:
+                db.add(LeadDailyRollup(**row))
+        db.flush()
+
+
+def _rebuild_select():
+    dimensions = [
+        func.date(BusinessLead.created_at),
+        func.coalesce(BusinessLead.source, ''),
+        func.coalesce(BusinessLead.lead_status, ''),
+        func.coalesce(BusinessLead.city, ''),
+        func.coalesce(BusinessLead.category, '')
+    ]
+    return select(
+        *dimensions, func.count(BusinessLead.id), func.coalesce(func.sum(BusinessLead.lead_score), 0)
+    ).where(BusinessLead.created_at != None).group_by(*dimensions)
+
+
+def rebuild_lead_rollups(db: Session) -> int:
+    """Recompute every rollup from the leads in one INSERT ... SELECT; returns the rows written"""
+    db.query(LeadDailyRollup).delete(synchronize_session=False)
+    db.execute(insert(LeadDailyRollup).from_select(
+        ["day", "source", "status", "city", "category", "lead_count", "score_sum"],
+        _rebuild_select()
+    ))
+    db.commit()
+    return db.query(func.count()).select_from(LeadDailyRollup).scalar()
+
+
+def verify_lead_rollups(db: Session) -> Dict[RollupKey, Tuple[int, int]]:
+    """Rollup keys whose stored (count, score sum) differ from the leads: key -> (stored, actual)"""
+    # Days compared as ISO strings: DATE() comes back as text on SQLite
+    actual = {(str(row[0]),) + tuple(row[1:5]): (row[5], row[6]) for row in db.execute(_rebuild_select()).all()}
+    stored = {
+        (str(r.day), r.source, r.status, r.city, r.category): (r.lead_count, r.score_sum)
+        for r in db.query(LeadDailyRollup).all()
+    }
+    drift = {}
+    for key in stored.keys() | actual.keys():
+        got, want = stored.get(key, (0, 0)), actual.get(key, (0, 0))
+        if got != want:
+            drift[key] = (got, want)
+    return drift
@@ -0,0 +1,74 @@
+"""
+Lead scoring with the category and source weights held in memory.
+
+Scoring used to read CategoryWeight and LeadSourceConfig for every lead. The active
+weights are small, so LeadScoringModel loads them once into dicts and scores from
+those; the marketing config endpoints refresh it after changing a weight, and the
+cache TTL bounds how long other workers keep scoring with the old weights.
+"""
+from sqlalchemy.orm import Session
+from db_models.marketing import CategoryWeight, LeadSourceConfig
+from core.cache import TTLCache
+from typing import Dict, Iterable, List, Optional
+
+scoring_model_cache = TTLCache(ttl_seconds=60)
+
+
+def _key(name: Optional[str]) -> str:
+    # Weights were matched in SQL under a case-insensitive, trailing-space-padded collation
+    return (name or '').rstrip().lower()
+
+
+class LeadScoringModel:
+    """
+    Active weights by category and source name.
+    Score = (rating × 20) + min(review count × 0.2, 100) + category weight + source weight.
+    """
+
+    def __init__(self, category_weights: Dict[str, int], source_weights: Dict[str, int]):
+        self.category_weights = {_key(name): weight or 0 for name, weight in category_weights.items()}
+        self.source_weights = {_key(name): weight or 0 for name, weight in source_weights.items()}
+
+    @classmethod
+    def load(cls, db: Session) -> "LeadScoringModel":
+        categories = db.query(CategoryWeight.category, CategoryWeight.weight).filter(CategoryWeight.is_active == True).all()
+        sources = db.query(LeadSourceConfig.source_name, LeadSourceConfig.source_weight).filter(
+            LeadSourceConfig.is_active == True
+        ).all()
+        return cls(dict(categories), dict(sources))
+
+    def score(self, rating: float = 0.0, review_count: int = 0, category: str = None, source: str = None) -> int:
+        return self.score_many([rating], [review_count], [category], [source])[0]
+
+    def score_many(
+        self,
+        ratings: Iterable[Optional[float]],
+        review_counts: Iterable[Optional[int]],
+        categories: Iterable[Optional[str]],
+        sources: Iterable[Optional[str]]
+    ) -> List[int]:
+        """Scores for a batch given column-wise (the i-th rating, review count, category and source are one lead)"""
+        category_weight = self.category_weights.get
+        source_weight = self.source_weights.get
+        return [
+            int((rating or 0) * 20)
+            + min(int((reviews or 0) * 0.2), 100)
+            + (category_weight(_key(category), 0) if category else 0)
+            + (source_weight(_key(source), 0) if source else 0)
+            for rating, reviews, category, source in zip(ratings, review_counts, categories, sources)
+        ]
+
+
+def get_scoring_model(db: Session) -> LeadScoringModel:
+    model = scoring_model_cache.get("model")
+    if model is None:
+        model = LeadScoringModel.load(db)
+        scoring_model_cache.set("model", model)
+    return model
+
+
+def refresh_scoring_model(db: Session) -> LeadScoringModel:
+    """Reload the weights now; call after committing a change to a category or source"""
+    model = LeadScoringModel.load(db)
+    scoring_model_cache.set("model", model)
+    return model
@@ -0,0 +1,212 @@
+"""
+Lead search by business name or phone number.
+
+Names are searched through the n-gram FULLTEXT index on MySQL and through an
+in-process trigram index elsewhere (SQLite test setups). Phones are matched on the
+national digits-only phone_digits column: a prefix lookup, plus a prefix lookup on
+the reversed digits for suffixes, so "98450 12345", "+91 98450-12345", "98450" and
+"12345" all find the same lead without scanning the table. A short number such as
+"2020" is searched as both a phone fragment and a name.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, case, literal
+from sqlalchemy.dialects.mysql import match as mysql_match
+from db_models.marketing import BusinessLead
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import re
+import threading
+
+MIN_PHONE_DIGITS = 3
+# Boolean-mode operators stripped from name terms before MATCH ... AGAINST
+FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@]')
+PHONE_TERM = re.compile(r'^[\d\s+\-().]+$')
+# A phone term with fewer national digits and none of these could also be part of a name ("Cafe 2020", "24-7")
+NATIONAL_DIGITS = 10
+PHONE_ONLY_CHARS = re.compile(r'[+()]')
+# Similarity a fuzzy trigram hit needs when no name contains the term
+MIN_SIMILARITY = 0.3
+
+
+def _national(digits: str) -> str:
+    """Drop the +91 country code or trunk 0, so a number matches however it was written"""
+    if len(digits) == 12 and digits.startswith('91'):
+        return digits[2:]
+    if len(digits) == 11 and digits.startswith('0'):
+        return digits[1:]
+    return digits
+
+
+def phone_keys(phone: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(phone_digits, phone_digits_rev) for a phone number; None when it has no digits"""
+    digits = _national(re.sub(r'\D', '', phone or ''))
+    if not digits:
+        return None, None
+    return digits, digits[::-1]
+
+
+def _phone_digits(term: str) -> Optional[str]:
+    """National digits of a term that looks like a phone number, else None"""
+    if not PHONE_TERM.match(term):
+        return None
+    digits = _national(re.sub(r'\D', '', term))
+    return digits if len(digits) >= MIN_PHONE_DIGITS else None
+
+
+def _could_be_name(term: str, digits: str) -> bool:
+    return len(digits) < NATIONAL_DIGITS and not PHONE_ONLY_CHARS.search(term)
+
+
+def _phone_match(digits: str):
+    return or_(
+        BusinessLead.phone_digits.like(f"{digits}%"),
+        BusinessLead.phone_digits_rev.like(f"{digits[::-1]}%")
+    )
+
+
+def _phone_rank(digits: str):
+    # Whole number first, then numbers starting with the digits, then ones ending with them
+    return case(
+        (BusinessLead.phone_digits == digits, 1.0),
+        (BusinessLead.phone_digits.like(f"{digits}%"), 0.8),
+        else_=0.6
+    )
+
+
+def _fulltext(term: str):
+    """MATCH ... AGAINST relevance for a name term, or None if nothing searchable is left"""
+    cleaned = FULLTEXT_OPERATORS.sub(' ', term).strip()
+    if not cleaned:
+        return None
+    # A quoted phrase makes the n-gram parser require the term's n-grams in sequence
+    return mysql_match(BusinessLead.business_name, against=f'"{cleaned}"').in_boolean_mode()
+
+
+class TrigramIndex:
+    """In-process trigram index over lead names, used where the database has no FULLTEXT search"""
+
+    def __init__(self, rows):
+        self.names: Dict[int, str] = {}
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        for lead_id, name in rows:
+            name = (name or '').lower()
+            self.names[lead_id] = name
+            for gram in self.trigrams(name):
+                self.postings[gram].add(lead_id)
+
+    @staticmethod
+    def trigrams(value: str, padded: bool = True) -> Set[str]:
+        value = f"  {value} " if padded else value
+        return {value[i:i + 3] for i in range(len(value) - 2)}
+
+    def _rank(self, term: str, name: str) -> float:
+        if name == term:
+            return 1.0
+        if name.startswith(term):
+            return 0.9
+        if f" {term}" in name:
+            return 0.8
+        grams = self.trigrams(term)
+        return 0.5 * len(grams & self.trigrams(name)) / len(grams | self.trigrams(name))
+
+    def search(self, term: str) -> List[Tuple[int, float]]:
+        """(lead id, rank) for names containing the term, best first; fuzzy matches if there are none"""
+        term = term.lower().strip()
+        if not term:
+            return []
+        inner = self.trigrams(term, padded=False)
+        if inner:
+            candidates = set.intersection(*(self.postings.get(g, set()) for g in inner))
+        else:
+            candidates = self.names.keys()  # One or two characters: too short for trigrams
+        hits = [(lead_id, self._rank(term, self.names[lead_id])) for lead_id in candidates if term in self.names[lead_id]]
+        if not hits and len(term) >= 3:
+            grams = self.trigrams(term)
+            fuzzy = set().union(*(self.postings.get(g, set()) for g in grams))
+            for lead_id in fuzzy:
+                name_grams = self.trigrams(self.names[lead_id])
+                similarity = len(grams & name_grams) / len(grams | name_grams)
+                if similarity >= MIN_SIMILARITY:
+                    hits.append((lead_id, 0.5 * similarity))
+        return sorted(hits, key=lambda hit: (-hit[1], hit[0]))
+
+
+_trigram_lock = threading.Lock()
+_trigram_state: Dict[str, object] = {"signature": None, "index": None}
+
+
+def trigram_index(db: Session) -> TrigramIndex:
+    """The process-wide trigram index, rebuilt when leads were added, removed or renamed since it was built"""
+    signature = tuple(db.query(func.count(BusinessLead.id), func.max(BusinessLead.id), func.max(BusinessLead.updated_at)).one())
+    with _trigram_lock:
+        if _trigram_state["signature"] != signature:
+            _trigram_state["index"] = TrigramIndex(db.query(BusinessLead.id, BusinessLead.business_name).all())
+            _trigram_state["signature"] = signature
+        return _trigram_state["index"]
+
+
+def _uses_fulltext(db: Session) -> bool:
+    return db.get_bind().dialect.name == 'mysql'
+
+
+def _name_criterion(db: Session, term: str):
+    if _uses_fulltext(db):
+        relevance = _fulltext(term)
+        return relevance if relevance is not None else literal(False)
+    return BusinessLead.id.in_([lead_id for lead_id, _ in trigram_index(db).search(term)] or [None])
+
+
+def search_criterion(db: Session, term: str):
+    """Filter for the `search` parameter of the lead listing: phone digits, business name, or both"""
+    digits = _phone_digits(term)
+    if not digits:
+        return _name_criterion(db, term)
+    if _could_be_name(term, digits):
+        return or_(_phone_match(digits), _name_criterion(db, term))
+    return _phone_match(digits)
+
+
+def _phone_results(db: Session, digits: str, limit: int) -> List[Tuple[BusinessLead, float]]:
+    rank = _phone_rank(digits)
+    rows = db.query(BusinessLead, rank.label('rank')).filter(_phone_match(digits)).order_by(
+        rank.desc(), BusinessLead.lead_score.desc(), BusinessLead.id.desc()
+    ).limit(limit).all()
+    return [(lead, float(score)) for lead, score in rows]
+
+
+def _name_results(db: Session, term: str, limit: int) -> List[Tuple[BusinessLead, float]]:
+    if _uses_fulltext(db):
+        relevance = _fulltext(term)
+        if relevance is None:
+            return []
+        rows = db.query(BusinessLead, relevance.label('rank')).filter(relevance).order_by(
+            relevance.desc(), BusinessLead.lead_score.desc(), BusinessLead.id.desc()
+        ).limit(limit).all()
+        return [(lead, float(score)) for lead, score in rows]
+
+    hits = trigram_index(db).search(term)
+    # Ranks repeat a lot (every prefix match is 0.9), so break ties on lead score like the MySQL path
+    best = {lead_id: rank for lead_id, rank in hits[:limit * 5]}
+    leads = db.query(BusinessLead).filter(BusinessLead.id.in_(list(best) or [None])).all()
+    leads.sort(key=lambda lead: (-best[lead.id], -(lead.lead_score or 0), -lead.id))
+    return [(lead, best[lead.id]) for lead in leads[:limit]]
+
+
+def search_leads(db: Session, term: str, limit: int = 20) -> List[Tuple[BusinessLead, float]]:
+    """
+    Best matches for a name or phone term as (lead, rank), highest rank first, then by lead
+    score. A short number that could also be part of a name returns the phone matches first,
+    then the name matches (the two ranks are not on one scale, so they are not interleaved).
+    """
+    term = (term or '').strip()
+    if not term:
+        return []
+
+    digits = _phone_digits(term)
+    if not digits:
+        return _name_results(db, term, limit)
+    results = _phone_results(db, digits, limit)
+    if _could_be_name(term, digits) and len(results) < limit:
+        seen = {lead.id for lead, _ in results}
+        results += [hit for hit in _name_results(db, term, limit) if hit[0].id not in seen][:limit - len(results)]
+    return results
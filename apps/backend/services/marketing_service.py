@@ -1,14 +1,21 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, text, case
 from db_models.marketing import (
     BusinessLead, LeadActivity, LeadQualificationRule, 
-    CategoryWeight, LeadSourceConfig, LeadStatusType
+    LeadStatusType, LeadDailyRollup
 )
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
+from core.cache import TTLCache
+from services import lead_search_service, lead_rollup_service, lead_scoring_service
+from core.pagination import encode_cursor, decode_cursor
+from fastapi import HTTPException
 import hashlib
 import json
 
+# Lead counts per normalized filter set; cleared whenever this process changes leads
+lead_count_cache = TTLCache(ttl_seconds=30)
+
 
 def generate_duplicate_hash(business_name: str, phone: str) -> str:
     """Generate hash for duplicate detection based on business name and phone"""
@@ -30,34 +37,9 @@ def calculate_lead_score(
     """
     Calculate lead score based on multiple factors
     Formula: (Rating × 20) + (Review Count × 0.2) + Category Weight + Source Weight
+    Weights come from the in-memory scoring model; use score_many() on it for batches.
     """
-    score = 0
-    
-    # Rating contribution (max 100 points for 5-star rating)
-    score += int(rating * 20)
-    
-    # Review count contribution (capped at 100 points)
-    score += min(int(review_count * 0.2), 100)
-    
-    # Category weight
-    if category:
-        category_weight = db.query(CategoryWeight).filter(
-            CategoryWeight.category == category,
-            CategoryWeight.is_active == True
-        ).first()
-        if category_weight:
-            score += category_weight.weight
-    
-    # Source weight
-    if source:
-        source_config = db.query(LeadSourceConfig).filter(
-            LeadSourceConfig.source_name == source,
-            LeadSourceConfig.is_active == True
-        ).first()
-        if source_config:
-            score += source_config.source_weight
-    
-    return score
+    return lead_scoring_service.get_scoring_model(db).score(rating, review_count, category, source)
 
 
 def qualify_lead(db: Session, lead_data: Dict[str, Any]) -> bool:
@@ -150,8 +132,11 @@ def create_lead(db: Session, lead_data: Dict[str, Any], user_id: str = None) ->
     )
     
     # Create lead
+    phone_digits, phone_digits_rev = lead_search_service.phone_keys(lead_data.get('phone'))
     lead = BusinessLead(
         **lead_data,
+        phone_digits=phone_digits,
+        phone_digits_rev=phone_digits_rev,
         duplicate_hash=duplicate_hash,
         lead_score=lead_score,
         created_at=datetime.utcnow(),
@@ -159,8 +144,11 @@ def create_lead(db: Session, lead_data: Dict[str, Any], user_id: str = None) ->
     )
     
     db.add(lead)
+    db.flush()
+    lead_rollup_service.record_lead_change(db, None, lead_rollup_service.lead_state(lead))
     db.commit()
     db.refresh(lead)
+    lead_count_cache.clear()
     
     # Log creation activity
     activity = LeadActivity(
@@ -177,6 +165,63 @@ def create_lead(db: Session, lead_data: Dict[str, Any], user_id: str = None) ->
     return lead
 
 
+# Listing order; matches idx_lead_score_created_id
+LEAD_ORDER = (BusinessLead.lead_score.desc(), BusinessLead.created_at.desc(), BusinessLead.id.desc())
+
+
+def normalize_lead_filters(filters: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Drop empty filters and trim strings, so equivalent filter sets share one count cache entry"""
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        normalized[key] = value
+    return normalized
+
+
+def apply_lead_filters(query, filters: Dict[str, Any] = None):
+    """Apply the /marketing/leads filter set to a query over BusinessLead"""
+    if not filters:
+        return query
+
+    # Status filter
+    if filters.get('status'):
+        query = query.filter(BusinessLead.lead_status == filters['status'])
+    
+    # Source filter
+    if filters.get('source'):
+        query = query.filter(BusinessLead.source == filters['source'])
+    
+    # City filter
+    if filters.get('city'):
+        query = query.filter(BusinessLead.city == filters['city'])
+    
+    # Category filter
+    if filters.get('category'):
+        query = query.filter(BusinessLead.category == filters['category'])
+    
+    # Score range filter
+    if filters.get('min_score'):
+        query = query.filter(BusinessLead.lead_score >= filters['min_score'])
+    if filters.get('max_score'):
+        query = query.filter(BusinessLead.lead_score <= filters['max_score'])
+    
+    # Assigned to filter
+    if filters.get('assigned_to'):
+        query = query.filter(BusinessLead.assigned_to == filters['assigned_to'])
+    
+    # Website filter
+    if filters.get('has_website') is not None:
+        query = query.filter(BusinessLead.has_website == filters['has_website'])
+    
+    # Search filter (business name or phone), served by the search indexes
+    if filters.get('search'):
+        query = query.filter(lead_search_service.search_criterion(query.session, filters['search']))
+    return query
+
+
 def get_leads(
     db: Session,
     skip: int = 0,
@@ -184,55 +229,88 @@ def get_leads(
     filters: Dict[str, Any] = None
 ) -> List[BusinessLead]:
     """Get leads with filtering and pagination"""
-    query = db.query(BusinessLead)
+    query = apply_lead_filters(db.query(BusinessLead), filters)
     
-    if filters:
-        # Status filter
-        if filters.get('status'):
-            query = query.filter(BusinessLead.lead_status == filters['status'])
-        
-        # Source filter
-        if filters.get('source'):
-            query = query.filter(BusinessLead.source == filters['source'])
-        
-        # City filter
-        if filters.get('city'):
-            query = query.filter(BusinessLead.city == filters['city'])
-        
-        # Category filter
-        if filters.get('category'):
-            query = query.filter(BusinessLead.category == filters['category'])
-        
-        # Score range filter
-        if filters.get('min_score'):
-            query = query.filter(BusinessLead.lead_score >= filters['min_score'])
-        if filters.get('max_score'):
-            query = query.filter(BusinessLead.lead_score <= filters['max_score'])
-        
-        # Assigned to filter
-        if filters.get('assigned_to'):
-            query = query.filter(BusinessLead.assigned_to == filters['assigned_to'])
-        
-        # Website filter
-        if filters.get('has_website') is not None:
-            query = query.filter(BusinessLead.has_website == filters['has_website'])
-        
-        # Search filter (business name or phone)
-        if filters.get('search'):
-            search_term = f"%{filters['search']}%"
-            query = query.filter(
-                or_(
-                    BusinessLead.business_name.ilike(search_term),
-                    BusinessLead.phone.ilike(search_term)
-                )
-            )
-    
-    # Order by score descending, then created_at descending
-    query = query.order_by(BusinessLead.lead_score.desc(), BusinessLead.created_at.desc())
+    # Order by score descending, then created_at descending (id breaks ties, as in get_leads_page)
+    query = query.order_by(*LEAD_ORDER)
     
     return query.offset(skip).limit(limit).all()
 
 
+def get_leads_page(
+    db: Session,
+    limit: int = 100,
+    filters: Dict[str, Any] = None,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Tuple[List[BusinessLead], Optional[str]]:
+    """
+    One page of leads in get_leads order plus the cursor of the next page (None on the last).
+    With a cursor the page seeks past (lead_score, created_at, id) of the previous page's last
+    row on idx_lead_score_created_id, so every page costs the same and leads inserted meanwhile
+    do not shift rows between pages. Without one it falls back to skip/OFFSET.
+    """
+    query = apply_lead_filters(db.query(BusinessLead), filters)
+    if cursor:
+        after_score, after_created, after_id = decode_cursor(cursor, 3)
+        try:
+            after_score, after_created, after_id = int(after_score), datetime.fromisoformat(after_created), int(after_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+        query = query.filter(or_(
+            BusinessLead.lead_score < after_score,
+            and_(BusinessLead.lead_score == after_score, BusinessLead.created_at < after_created),
+            and_(BusinessLead.lead_score == after_score, BusinessLead.created_at == after_created, BusinessLead.id < after_id)
+        ))
+
+    query = query.order_by(*LEAD_ORDER)
+    if not cursor:
+        query = query.offset(skip)
+    leads = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(leads) > limit:
+        leads = leads[:limit]
+        last = leads[-1]
+        next_cursor = encode_cursor([last.lead_score, last.created_at, last.id])
+    return leads, next_cursor
+
+
+def _estimated_lead_rows(db: Session) -> Optional[int]:
+    """Row estimate from table statistics (MySQL only); None where the database keeps none"""
+    if db.get_bind().dialect.name != 'mysql':
+        return None
+    return db.execute(text("""
+        SELECT TABLE_ROWS FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table
+    """), {'table': BusinessLead.__tablename__}).scalar()
+
+
+def count_leads(db: Session, filters: Dict[str, Any] = None, estimated: bool = False) -> Tuple[int, bool]:
+    """
+    Count leads matching the same filters as get_leads, as (total, is_estimate).
+    Exact counts are cached per normalized filter set for a short TTL. With estimated=True
+    an unfiltered count comes from table statistics instead of scanning the table;
+    filtered counts are always exact.
+    """
+    filters = normalize_lead_filters(filters)
+    key = json.dumps(filters, sort_keys=True, default=str)
+
+    if estimated and not filters:
+        estimate = lead_count_cache.get(('estimate', key))
+        if estimate is None:
+            estimate = _estimated_lead_rows(db)
+            if estimate is not None:
+                lead_count_cache.set(('estimate', key), estimate)
+        if estimate is not None:
+            return estimate, True
+
+    total = lead_count_cache.get(key)
+    if total is None:
+        total = apply_lead_filters(db.query(func.count(BusinessLead.id)), filters).scalar()
+        lead_count_cache.set(key, total)
+    return total, False
+
+
 def get_lead_by_id(db: Session, lead_id: int) -> Optional[BusinessLead]:
     """Get single lead by ID"""
     return db.query(BusinessLead).filter(BusinessLead.id == lead_id).first()
@@ -245,11 +323,14 @@ def update_lead(db: Session, lead_id: int, lead_data: Dict[str, Any], user_id: s
         return None
     
     old_status = lead.lead_status
+    old_state = lead_rollup_service.lead_state(lead)
     
     # Update fields
     for key, value in lead_data.items():
         if hasattr(lead, key):
             setattr(lead, key, value)
+    if 'phone' in lead_data:
+        lead.phone_digits, lead.phone_digits_rev = lead_search_service.phone_keys(lead.phone)
     
     # Recalculate score if relevant fields changed
     if any(k in lead_data for k in ['rating', 'review_count', 'category', 'source']):
@@ -262,9 +343,11 @@ def update_lead(db: Session, lead_id: int, lead_data: Dict[str, Any], user_id: s
         )
     
     lead.updated_at = datetime.utcnow()
+    lead_rollup_service.record_lead_change(db, old_state, lead_rollup_service.lead_state(lead))
     
     db.commit()
     db.refresh(lead)
+    lead_count_cache.clear()
     
     # Log status change if status was updated
     if 'lead_status' in lead_data and old_status != lead.lead_status:
@@ -290,8 +373,10 @@ def delete_lead(db: Session, lead_id: int) -> bool:
     if not lead:
         return False
     
+    lead_rollup_service.record_lead_change(db, lead_rollup_service.lead_state(lead), None)
     db.delete(lead)
     db.commit()
+    lead_count_cache.clear()
     return True
 
 
@@ -308,6 +393,7 @@ def assign_lead(db: Session, lead_id: int, user_id: str, assigned_by: str = None
     
     db.commit()
     db.refresh(lead)
+    lead_count_cache.clear()
     
     # Log assignment activity
     activity = LeadActivity(
@@ -388,86 +474,85 @@ def reassign_stale_leads(db: Session, days_threshold: int = 7) -> int:
     return len(stale_leads)
 
 
+FUNNEL_STAGES = ['New', 'Contacted', 'Interested', 'Proposal Sent', 'Won']
+
+
+def _rollup_query(db: Session, columns, filters: Dict[str, Any] = None):
+    """Query over the daily lead rollups, limited to leads created in the filter's date range"""
+    query = db.query(*columns)
+    filters = filters or {}
+    if filters.get('start_date'):
+        query = query.filter(LeadDailyRollup.day >= _as_date(filters['start_date']))
+    if filters.get('end_date'):
+        query = query.filter(LeadDailyRollup.day <= _as_date(filters['end_date']))
+    return query
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
 def get_lead_analytics(db: Session, filters: Dict[str, Any] = None) -> Dict[str, Any]:
-    """Get analytics data for dashboard"""
-    query = db.query(BusinessLead)
-    
-    # Apply filters if provided
-    if filters:
-        if filters.get('start_date'):
-            query = query.filter(BusinessLead.created_at >= filters['start_date'])
-        if filters.get('end_date'):
-            query = query.filter(BusinessLead.created_at <= filters['end_date'])
-    
-    total_leads = query.count()
-    
-    # Leads by status
-    status_counts = db.query(
-        BusinessLead.lead_status,
-        func.count(BusinessLead.id)
-    ).group_by(BusinessLead.lead_status).all()
-    
-    # Leads by source
-    source_counts = db.query(
-        BusinessLead.source,
-        func.count(BusinessLead.id)
-    ).group_by(BusinessLead.source).all()
-    
-    # Conversion rate
-    won_count = db.query(BusinessLead).filter(
-        BusinessLead.lead_status == LeadStatusType.WON
-    ).count()
+    """Get analytics data for dashboard, every figure over leads created in the date range"""
+    rows = _rollup_query(db, (
+        LeadDailyRollup.status,
+        LeadDailyRollup.source,
+        func.sum(LeadDailyRollup.lead_count),
+        func.sum(LeadDailyRollup.score_sum)
+    ), filters).group_by(LeadDailyRollup.status, LeadDailyRollup.source).all()
+
+    total_leads = score_sum = 0
+    status_counts: Dict[Any, int] = {}
+    source_counts: Dict[Any, int] = {}
+    for status, source, count, scores in rows:
+        count, scores = int(count or 0), int(scores or 0)
+        if not count:
+            continue
+        total_leads += count
+        score_sum += scores
+        status_counts[status or None] = status_counts.get(status or None, 0) + count
+        source_counts[source or None] = source_counts.get(source or None, 0) + count
+
+    won_count = status_counts.get(LeadStatusType.WON.value, 0)
     conversion_rate = (won_count / total_leads * 100) if total_leads > 0 else 0
-    
-    # Average lead score
-    avg_score = db.query(func.avg(BusinessLead.lead_score)).scalar() or 0
+    avg_score = (score_sum / total_leads) if total_leads > 0 else 0
     
     return {
         'total_leads': total_leads,
-        'by_status': dict(status_counts),
-        'by_source': dict(source_counts),
+        'by_status': status_counts,
+        'by_source': source_counts,
         'conversion_rate': round(conversion_rate, 2),
         'average_score': round(avg_score, 2),
         'won_leads': won_count
     }
 
 
-def get_conversion_funnel(db: Session) -> List[Dict[str, Any]]:
+def get_conversion_funnel(db: Session, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
     """Get conversion funnel data"""
-    statuses = ['New', 'Contacted', 'Interested', 'Proposal Sent', 'Won']
-    funnel_data = []
-    
-    for status in statuses:
-        count = db.query(BusinessLead).filter(
-            BusinessLead.lead_status == status
-        ).count()
-        funnel_data.append({
-            'stage': status,
-            'count': count
-        })
+    counts = dict(_rollup_query(db, (
+        LeadDailyRollup.status,
+        func.sum(LeadDailyRollup.lead_count)
+    ), filters).filter(LeadDailyRollup.status.in_(FUNNEL_STAGES)).group_by(LeadDailyRollup.status).all())
     
-    return funnel_data
+    return [{'stage': stage, 'count': int(counts.get(stage) or 0)} for stage in FUNNEL_STAGES]
 
 
-def get_source_performance(db: Session) -> List[Dict[str, Any]]:
+def get_source_performance(db: Session, filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
     """Get performance metrics by source"""
-    sources = db.query(BusinessLead.source).distinct().all()
+    total = func.sum(LeadDailyRollup.lead_count)
+    won = func.sum(case((LeadDailyRollup.status == LeadStatusType.WON.value, LeadDailyRollup.lead_count), else_=0))
+    rows = _rollup_query(db, (LeadDailyRollup.source, total, won), filters).group_by(
+        LeadDailyRollup.source
+    ).having(total > 0).order_by(total.desc(), LeadDailyRollup.source).all()
+
     performance = []
-    
-    for (source,) in sources:
-        total = db.query(BusinessLead).filter(BusinessLead.source == source).count()
-        won = db.query(BusinessLead).filter(
-            BusinessLead.source == source,
-            BusinessLead.lead_status == LeadStatusType.WON
-        ).count()
-        
-        conversion_rate = (won / total * 100) if total > 0 else 0
-        
+    for source, total_leads, won_leads in rows:
+        total_leads, won_leads = int(total_leads), int(won_leads or 0)
         performance.append({
             'source': source,
-            'total_leads': total,
-            'won_leads': won,
-            'conversion_rate': round(conversion_rate, 2)
+            'total_leads': total_leads,
+            'won_leads': won_leads,
+            'conversion_rate': round(won_leads / total_leads * 100, 2)
         })
     
     return performance
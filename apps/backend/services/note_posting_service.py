@@ -0,0 +1,218 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, update
+from fastapi import HTTPException, status
+from db_models.accounting import (
+    JournalHeader, JournalDetail, JournalStatus, NoteAccountMapping,
+    DebitNoteHeader, DebitNoteDetail, CreditNoteHeader, CreditNoteDetail,
+    DebitReason, CreditReason
+)
+from services import accounting_service
+from decimal import Decimal
+from typing import Dict, List, Sequence, Tuple
+import time
+import uuid
+
+LOOKUP_CHUNK = 1000
+
+# note_type -> (header model, detail model, detail foreign key, journal reference prefix, reasons)
+NOTE_TYPES = {
+    "debit": (DebitNoteHeader, DebitNoteDetail, DebitNoteDetail.debit_note_id, "DN", DebitReason),
+    "credit": (CreditNoteHeader, CreditNoteDetail, CreditNoteDetail.credit_note_id, "CN", CreditReason),
+}
+
+
+def _note_type(note_type: str):
+    if note_type not in NOTE_TYPES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Note type must be 'debit' or 'credit'")
+    return NOTE_TYPES[note_type]
+
+
+def get_note_account_mappings(db: Session, company_id: str) -> List[NoteAccountMapping]:
+    return db.query(NoteAccountMapping).filter(NoteAccountMapping.company_id == company_id).order_by(
+        NoteAccountMapping.note_type, NoteAccountMapping.reason
+    ).all()
+
+
+def save_note_account_mapping(db: Session, mapping_in, company_id: str) -> NoteAccountMapping:
+    """Create or replace the mapping rule for (note_type, reason); reason None is the default rule."""
+    reasons = _note_type(mapping_in.note_type)[4]
+    if mapping_in.reason is not None and mapping_in.reason not in {r.value for r in reasons}:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Reason must be one of {', '.join(r.value for r in reasons)}"
+        )
+    accounting_service.require_postable_accounts(db, company_id, [
+        a for a in (mapping_in.party_account_id, mapping_in.amount_account_id, mapping_in.tax_account_id) if a
+    ])
+
+    query = db.query(NoteAccountMapping).filter(
+        NoteAccountMapping.company_id == company_id,
+        NoteAccountMapping.note_type == mapping_in.note_type
+    )
+    if mapping_in.reason is None:
+        query = query.filter(NoteAccountMapping.reason == None)
+    else:
+        query = query.filter(NoteAccountMapping.reason == mapping_in.reason)
+    mapping = query.first()
+    if not mapping:
+        mapping = NoteAccountMapping(note_type=mapping_in.note_type, reason=mapping_in.reason, company_id=company_id)
+        db.add(mapping)
+    mapping.party_account_id = mapping_in.party_account_id
+    mapping.amount_account_id = mapping_in.amount_account_id
+    mapping.tax_account_id = mapping_in.tax_account_id
+    db.commit()
+    db.refresh(mapping)
+    return mapping
+
+
+def _resolve_rules(db: Session, company_id: str, note_types) -> Tuple[Dict[tuple, NoteAccountMapping], Dict[tuple, str]]:
+    """
+    Mapping rules of the given note types keyed by (note_type, reason), with their accounts
+    checked in one cached lookup. Rules whose accounts are missing, inactive or closed to
+    entry come back in the second dict as (note_type, reason) -> error, so only the notes
+    that would use them are skipped.
+    """
+    rules = {
+        (m.note_type, m.reason): m for m in get_note_account_mappings(db, company_id) if m.note_type in note_types
+    }
+    accounts = accounting_service.get_accounts(db, company_id, {
+        account_id for m in rules.values()
+        for account_id in (m.party_account_id, m.amount_account_id, m.tax_account_id) if account_id
+    })
+    invalid = {}
+    for key, m in rules.items():
+        for account_id in (m.party_account_id, m.amount_account_id, m.tax_account_id):
+            if not account_id:
+                continue
+            account = accounts.get(account_id)
+            if account is None:
+                invalid[key] = f"Mapped account {account_id} not found"
+            elif account.is_inactive or not account.allow_account_entry:
+                state = 'inactive' if account.is_inactive else 'closed to direct entry'
+                invalid[key] = f"Mapped account {account.code} is {state}"
+            if key in invalid:
+                break
+    return rules, invalid
+
+
+def _load_notes(db: Session, company_id: str, note_type: str, note_ids: List[str]):
+    """Lock the notes and return them with their tax totals: [(header, tax)], one pair of reads per chunk."""
+    header_model, detail_model, detail_key, _, _ = NOTE_TYPES[note_type]
+    loaded = []
+    for start in range(0, len(note_ids), LOOKUP_CHUNK):
+        chunk = note_ids[start:start + LOOKUP_CHUNK]
+        headers = db.query(header_model).filter(
+            header_model.company_id == company_id,
+            header_model.id.in_(chunk)
+        ).order_by(header_model.id).with_for_update().all()
+        taxes = dict(db.query(detail_key, func.sum(detail_model.tax_amount)).filter(
+            detail_key.in_(chunk)
+        ).group_by(detail_key).all())
+        loaded.extend((header, Decimal(taxes.get(header.id) or 0)) for header in headers)
+    return loaded
+
+
+def post_notes(db: Session, company_id: str, debit_note_ids: Sequence[str] = (), credit_note_ids: Sequence[str] = ()):
+    """
+    Post debit and credit notes to the general ledger as one batch: mapping rules and
+    their accounts are resolved once, the notes are read in chunked locked lookups, and
+    every note's journal goes out in two bulk INSERTs with a single balance update, a
+    bulk journal_id update per note type and one commit.
+
+    A credit note debits its amount (net of tax) to the mapped amount account and its
+    tax to the tax account, and credits the full total to the party account; a debit
+    note posts the mirror image. Notes that are missing, not Posted, already in the
+    ledger or without a mapping rule are skipped and reported; re-running a batch only
+    posts what is left.
+    """
+    started = time.perf_counter()
+    requested = {"debit": list(dict.fromkeys(debit_note_ids)), "credit": list(dict.fromkeys(credit_note_ids))}
+    if not requested["debit"] and not requested["credit"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No notes to post")
+    rules, invalid_rules = _resolve_rules(db, company_id, [t for t, ids in requested.items() if ids])
+
+    headers, lines, skipped, linked = [], [], [], {"debit": [], "credit": []}
+    posted_amount = Decimal(0)
+    for note_type, note_ids in requested.items():
+        if not note_ids:
+            continue
+        prefix = NOTE_TYPES[note_type][3]
+        found = set()
+        for note, tax in _load_notes(db, company_id, note_type, note_ids):
+            found.add(note.id)
+            reason = note.reason.value
+            rule_key = (note_type, reason) if (note_type, reason) in rules else (note_type, None)
+            rule = rules.get(rule_key)
+            total = accounting_service._money(note.total_amount)
+            tax = accounting_service._money(tax)
+            error = None
+            if note.journal_id:
+                error = "Already posted"
+            elif note.status != "Posted":
+                error = f"Note is {note.status}"
+            elif rule is None:
+                error = f"No account mapping for {note_type} notes with reason {reason}"
+            elif rule_key in invalid_rules:
+                error = invalid_rules[rule_key]
+            elif total <= 0:
+                error = "Note total must be positive"
+            elif tax > total:
+                error = f"Tax {tax} exceeds the note total {total}"
+            elif tax and not rule.tax_account_id:
+                error = f"No tax account mapped for {note_type} notes with reason {reason}"
+            if error:
+                skipped.append({"note_id": note.id, "note_type": note_type, "error": error})
+                continue
+
+            journal_id = str(uuid.uuid4())
+            headers.append({
+                "id": journal_id,
+                "date": note.date,
+                "reference": f"{prefix}-{note.id}",
+                "notes": f"{note_type.capitalize()} note ({reason})",
+                "total_debit": total,
+                "total_credit": total,
+                "status": JournalStatus.POSTED,
+                "company_id": company_id
+            })
+            # (account, amount) pairs on the note's debit and credit sides
+            party = [(rule.party_account_id, total)]
+            counter = [(rule.amount_account_id, total - tax), (rule.tax_account_id, tax)]
+            debits, credits = (counter, party) if note_type == "credit" else (party, counter)
+            for side, entries in (("debit", debits), ("credit", credits)):
+                for account_id, amount in entries:
+                    if amount:
+                        lines.append({
+                            "id": str(uuid.uuid4()),
+                            "journal_id": journal_id,
+                            "account_id": account_id,
+                            "debit": amount if side == "debit" else Decimal(0),
+                            "credit": amount if side == "credit" else Decimal(0),
+                            "description": f"{prefix} {note.id}"
+                        })
+            linked[note_type].append({"id": note.id, "journal_id": journal_id})
+            posted_amount += total
+        skipped.extend(
+            {"note_id": note_id, "note_type": note_type, "error": "Note not found"}
+            for note_id in note_ids if note_id not in found
+        )
+
+    if headers:
+        db.execute(insert(JournalHeader), headers)
+        db.execute(insert(JournalDetail), lines)
+        accounting_service.record_posted_lines(db, company_id, accounting_service.line_deltas(
+            (line["account_id"], line["debit"], line["credit"]) for line in lines
+        ), min(h["date"] for h in headers))
+        for note_type, rows in linked.items():
+            if rows:
+                db.execute(update(NOTE_TYPES[note_type][0]), rows)
+    db.commit()
+
+    return {
+        "requested": len(requested["debit"]) + len(requested["credit"]),
+        "posted": len(headers),
+        "skipped": len(skipped),
+        "posted_amount": posted_amount,
+        "skipped_notes": skipped,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
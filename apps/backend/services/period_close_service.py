@@ -0,0 +1,165 @@
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session, sessionmaker
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.config import settings
+from db_models.core import Company
+from db_models.accounting import PeriodCloseJob, PeriodCloseTask
+from services import accounting_service, statements_service
+from datetime import date, datetime
+from typing import Callable, List, Optional
+import time
+
+# Session factory of a worker process, bound to its own single-connection engine
+_worker_session = None
+
+
+def close_company_period(db: Session, company_id: str, period_end: date) -> dict:
+    """
+    Month-end close for one company: extend balance snapshots through the period,
+    then prove the trial balance and statements for the month balance. Returns
+    per-step timings; raises ValueError when the books do not balance.
+    """
+    period_end = accounting_service.month_end(period_end)
+    timings = {}
+
+    started = time.perf_counter()
+    timings["snapshots_written"] = accounting_service.build_balance_snapshots(db, company_id, through=period_end)
+    timings["snapshots_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    trial = accounting_service.get_trial_balance(db, company_id, period_end)
+    timings["trial_balance_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    if trial["total_debit"] != trial["total_credit"]:
+        raise ValueError(f"Trial balance out of balance: Dr {trial['total_debit']} / Cr {trial['total_credit']}")
+
+    started = time.perf_counter()
+    statements_service.get_profit_and_loss(db, company_id, period_end.replace(day=1), period_end)
+    balance_sheet = statements_service.get_balance_sheet(db, company_id, period_end)
+    timings["statements_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    difference = balance_sheet["totals"]["difference"][0]
+    if difference:
+        raise ValueError(f"Balance sheet out of balance by {difference}")
+
+    return timings
+
+
+def get_or_create_close_job(db: Session, period_end: date, company_ids: Optional[List[str]] = None) -> PeriodCloseJob:
+    """
+    The unfinished job for the period if there is one (so an interrupted close
+    resumes), otherwise a new job. Tasks are added for any requested company
+    not yet in the job.
+    """
+    period_end = accounting_service.month_end(period_end)
+    job = db.query(PeriodCloseJob).filter(
+        PeriodCloseJob.period_end == period_end,
+        PeriodCloseJob.status != "Completed"
+    ).order_by(PeriodCloseJob.created_at.desc()).first()
+    if not job:
+        job = PeriodCloseJob(period_end=period_end, status="Pending")
+        db.add(job)
+        db.flush()
+
+    if company_ids is None:
+        company_ids = [row.id for row in db.query(Company.id).all()]
+    existing = {row.company_id for row in db.query(PeriodCloseTask.company_id).filter(PeriodCloseTask.job_id == job.id)}
+    db.add_all([
+        PeriodCloseTask(job_id=job.id, company_id=company_id, status="Pending")
+        for company_id in dict.fromkeys(company_ids) if company_id not in existing
+    ])
+    db.flush()
+    job.total_companies = db.query(func.count(PeriodCloseTask.id)).filter(PeriodCloseTask.job_id == job.id).scalar()
+    db.commit()
+    return job
+
+
+def _init_worker():
+    """Give each worker process its own engine capped at one connection."""
+    global _worker_session
+    from core.database import engine
+    engine.dispose(close=False)  # Never reuse connections inherited from the parent
+    worker_engine = create_engine(settings.DATABASE_URL, pool_size=1, max_overflow=0, pool_pre_ping=True)
+    _worker_session = sessionmaker(autocommit=False, autoflush=False, bind=worker_engine)
+
+
+def _run_task(task_id: str):
+    db = _worker_session()
+    try:
+        task = db.get(PeriodCloseTask, task_id)
+        company_id, period_end = task.company_id, task.job.period_end
+        task.status = "Running"
+        task.attempts += 1
+        task.started_at = datetime.utcnow()
+        task.error = None
+        db.commit()
+
+        started = time.perf_counter()
+        try:
+            timings, error = close_company_period(db, company_id, period_end), None
+        except Exception as e:
+            db.rollback()
+            timings, error = None, getattr(e, "detail", None) or repr(e)
+
+        task = db.get(PeriodCloseTask, task_id)
+        task.status = "Failed" if error else "Done"
+        task.timings = timings
+        task.error = error
+        task.elapsed_ms = int((time.perf_counter() - started) * 1000)
+        task.finished_at = datetime.utcnow()
+        db.commit()
+        return task_id, company_id, task.status, task.elapsed_ms, error
+    finally:
+        db.close()
+
+
+def run_close_job(
+    db: Session,
+    job_id: str,
+    workers: Optional[int] = None,
+    max_attempts: int = 3,
+    on_progress: Optional[Callable] = None
+) -> PeriodCloseJob:
+    """
+    Fan the pending tasks of a job out over a process pool. Open connections are
+    bounded by `workers` + 1 (this session). Tasks left Running by an interrupted
+    run are picked up again, and failed tasks are retried up to `max_attempts`.
+    `on_progress(done, total, result)` is called as each company finishes.
+    """
+    workers = workers or settings.PERIOD_CLOSE_WORKERS
+    job = db.get(PeriodCloseJob, job_id)
+
+    db.query(PeriodCloseTask).filter(
+        PeriodCloseTask.job_id == job_id,
+        PeriodCloseTask.status == "Running"
+    ).update({"status": "Pending"}, synchronize_session=False)
+    task_ids = [row.id for row in db.query(PeriodCloseTask.id).filter(
+        PeriodCloseTask.job_id == job_id,
+        PeriodCloseTask.status.in_(["Pending", "Failed"]),
+        PeriodCloseTask.attempts < max_attempts
+    ).order_by(PeriodCloseTask.company_id).all()]
+
+    job.status = "Running"
+    job.workers = workers
+    job.started_at = job.started_at or datetime.utcnow()
+    job.finished_at = None
+    db.commit()
+
+    if task_ids:
+        with ProcessPoolExecutor(max_workers=min(workers, len(task_ids)), initializer=_init_worker) as pool:
+            futures = [pool.submit(_run_task, task_id) for task_id in task_ids]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if result[2] == "Done":
+                    job.completed += 1
+                db.commit()
+                if on_progress:
+                    on_progress(done, len(task_ids), result)
+
+    counts = dict(db.query(PeriodCloseTask.status, func.count(PeriodCloseTask.id)).filter(
+        PeriodCloseTask.job_id == job_id
+    ).group_by(PeriodCloseTask.status).all())
+    job.completed = counts.get("Done", 0)
+    job.failed = counts.get("Failed", 0)
+    job.status = "Completed" if job.completed == job.total_companies else "Failed"
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    return job
@@ -0,0 +1,296 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, update, and_, or_, exists
+from sqlalchemy.exc import IntegrityError
+from fastapi import HTTPException, status
+from db_models.accounting import PaymentHeader, PaymentDetail
+from db_models.sales import InvoiceHeader
+from db_models.pos_banking import BankTransactionHeader, BankTransactionDetail, BankStatementLine, ChequeStatus
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime
+from typing import Dict, List, Optional
+import csv
+import hashlib
+import io
+import re
+import time
+import uuid
+
+CENT = Decimal("0.01")
+LOOKUP_CHUNK = 1000
+
+
+def _amount(value) -> Decimal:
+    return Decimal(str(value).replace(",", "").strip() or "0").quantize(CENT)
+
+
+def parse_csv_statement(stream) -> List[Dict]:
+    """
+    CSV statement with a header row: date, description, and either a signed `amount`
+    or separate `credit` (money in) / `debit` (money out) columns; `cheque_no` optional.
+    """
+    lines = []
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline="")):
+        row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        if row.get("amount"):
+            amount = _amount(row["amount"])
+        else:
+            amount = _amount(row.get("credit") or 0) - _amount(row.get("debit") or 0)
+        lines.append({
+            "date": date.fromisoformat(row["date"]),
+            "description": row.get("description") or None,
+            "amount": amount,
+            "cheque_no": row.get("cheque_no") or row.get("cheque_number") or None
+        })
+    return lines
+
+
+MT940_TRANSACTION = re.compile(r"^:61:(\d{6})(\d{4})?(R?[CD])[A-Z]?([\d,]+)(?:N\w{3})?(.*)$")
+MT940_CHEQUE = re.compile(r"(?:CHQ|CHEQUE|CHK)[\s.:#-]*(\d+)", re.IGNORECASE)
+
+
+def parse_mt940_statement(stream) -> List[Dict]:
+    """
+    MT940-style statement: each :61: line is a transaction (YYMMDD value date,
+    C/D mark, comma-decimal amount); an optional following :86: line is its narrative.
+    Cheque numbers are taken from the reference or a "CHQ 123456" narrative.
+    """
+    lines = []
+    for raw in io.TextIOWrapper(stream, encoding="utf-8", newline=""):
+        raw = raw.strip()
+        match = MT940_TRANSACTION.match(raw)
+        if match:
+            value_date, _, mark, amount, reference = match.groups()
+            signed = _amount(amount.replace(",", "."))
+            if mark in ("D", "RC"):
+                signed = -signed
+            cheque = MT940_CHEQUE.search(reference)
+            lines.append({
+                "date": datetime.strptime(value_date, "%y%m%d").date(),
+                "description": reference.strip("/ ") or None,
+                "amount": signed,
+                "cheque_no": cheque.group(1) if cheque else None
+            })
+        elif raw.startswith(":86:") and lines:
+            narrative = raw[4:].strip()
+            lines[-1]["description"] = narrative
+            cheque = MT940_CHEQUE.search(narrative)
+            if cheque and not lines[-1]["cheque_no"]:
+                lines[-1]["cheque_no"] = cheque.group(1)
+    return lines
+
+
+def cheque_key(cheque_no: Optional[str]) -> Optional[str]:
+    """Cheque number as compared across bank files and books: trimmed, leading zeros dropped."""
+    if not cheque_no or not cheque_no.strip():
+        return None
+    return cheque_no.strip().lstrip("0") or "0"
+
+
+def line_fingerprints(bank_account_id: str, statement_lines: List[Dict]) -> List[str]:
+    """
+    Fingerprint per statement line: a hash of the account, date, amount and reference
+    (cheque number, else the whitespace-normalised description) plus the line's
+    occurrence among identical lines of the same statement, so two genuine same-day
+    charges both import while a re-uploaded or overlapping statement matches the
+    fingerprints already stored.
+    """
+    seen: Dict[tuple, int] = {}
+    fingerprints = []
+    for line in statement_lines:
+        reference = cheque_key(line.get("cheque_no")) or " ".join((line.get("description") or "").upper().split())
+        key = (line["date"].isoformat(), str(Decimal(line["amount"]).quantize(CENT)), reference)
+        seen[key] = seen.get(key, 0) + 1
+        fingerprints.append(hashlib.sha256("|".join((bank_account_id,) + key + (str(seen[key]),)).encode()).hexdigest())
+    return fingerprints
+
+
+def _imported_fingerprints(db: Session, company_id: str, bank_account_id: str, fingerprints: List[str]) -> set:
+    imported = set()
+    for start in range(0, len(fingerprints), LOOKUP_CHUNK):
+        imported.update(f for (f,) in db.query(BankStatementLine.fingerprint).filter(
+            BankStatementLine.company_id == company_id,
+            BankStatementLine.bank_account_id == bank_account_id,
+            BankStatementLine.fingerprint.in_(fingerprints[start:start + LOOKUP_CHUNK])
+        ).all())
+    return imported
+
+
+def _take_closest(candidates: List[Dict], on: date, window_days: int) -> Optional[Dict]:
+    best = None
+    for item in candidates:
+        if item["used"]:
+            continue
+        gap = abs((item["date"] - on).days)
+        if gap <= window_days and (best is None or gap < abs((best["date"] - on).days)):
+            best = item
+    if best:
+        best["used"] = True
+    return best
+
+
+def reconcile_statement(db: Session, bank_account_id: str, statement_date: date, statement_lines: List[Dict],
+                        company_id: str, date_window_days: int = 3):
+    """
+    Match statement lines against the account's unreconciled book entries and persist the result.
+    Book deposits (bank_transaction_details) and payments (payment_headers) are loaded once and
+    indexed by cheque number and by amount; each statement line is matched by cheque number
+    first, then by amount with the closest date inside the window. Payments allocated to
+    sales invoices are customer receipts and match money-in lines that no deposit took;
+    other payments match money-out lines. Matches are written with
+    bulk statements and fully-matched deposit headers are flagged reconciled.
+    Lines already imported for the account (same fingerprint) are skipped and counted, so
+    uploading a statement again, or one that overlaps an earlier one, does not double-count.
+    """
+    started = time.perf_counter()
+    if not statement_lines:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Statement has no transactions")
+    total_lines = len(statement_lines)
+    fingerprints = line_fingerprints(bank_account_id, statement_lines)
+    imported = _imported_fingerprints(db, company_id, bank_account_id, fingerprints)
+    statement_lines = [
+        dict(line, fingerprint=fingerprint)
+        for line, fingerprint in zip(statement_lines, fingerprints) if fingerprint not in imported
+    ]
+
+    deposits = db.query(
+        BankTransactionDetail.id, BankTransactionDetail.tx_id, BankTransactionDetail.amount,
+        BankTransactionDetail.cheque_no, BankTransactionHeader.date
+    ).join(BankTransactionHeader, BankTransactionDetail.tx_id == BankTransactionHeader.id).filter(
+        BankTransactionHeader.company_id == company_id,
+        BankTransactionHeader.bank_account_id == bank_account_id,
+        BankTransactionDetail.match_id == None,
+        # A bounced cheque never reaches the account, so it cannot be on a statement
+        or_(BankTransactionDetail.cheque_status == None, BankTransactionDetail.cheque_status != ChequeStatus.BOUNCED.value)
+    ).all()
+
+    # A payment allocated to sales invoices is a customer receipt (money in); any other is money out
+    receipt = exists().where(and_(
+        PaymentDetail.payment_id == PaymentHeader.id,
+        PaymentDetail.invoice_id == InvoiceHeader.id,
+        InvoiceHeader.company_id == company_id
+    ))
+    payments = db.query(PaymentHeader.id, PaymentHeader.amount, PaymentHeader.date, receipt.label("receipt")).filter(
+        PaymentHeader.company_id == company_id,
+        PaymentHeader.account_id == bank_account_id,
+        ~exists().where(and_(
+            BankStatementLine.company_id == company_id,
+            BankStatementLine.match_type == "payment",
+            BankStatementLine.match_id == PaymentHeader.id
+        ))
+    ).all()
+
+    # Hash indexes over the book side
+    deposits_by_cheque: Dict[str, List[Dict]] = {}
+    deposits_by_amount: Dict[Decimal, List[Dict]] = {}
+    for row in deposits:
+        item = {"id": row.id, "tx_id": row.tx_id, "date": row.date, "amount": row.amount.quantize(CENT), "used": False}
+        deposits_by_amount.setdefault(item["amount"], []).append(item)
+        if cheque_key(row.cheque_no):
+            deposits_by_cheque.setdefault(cheque_key(row.cheque_no), []).append(item)
+
+    # Keyed by the signed amount the payment shows on a statement
+    payments_by_amount: Dict[Decimal, List[Dict]] = {}
+    for row in payments:
+        item = {"id": row.id, "date": row.date, "amount": row.amount.quantize(CENT), "used": False}
+        payments_by_amount.setdefault(item["amount"] if row.receipt else -item["amount"], []).append(item)
+
+    rows, deposit_matches, unmatched = [], [], []
+    matched_by_rule = {"cheque": 0, "amount_date": 0}
+    for line in statement_lines:
+        amount = line["amount"]
+        match, match_type, rule = None, None, None
+
+        if amount > 0:
+            if cheque_key(line.get("cheque_no")):
+                same_cheque = [i for i in deposits_by_cheque.get(cheque_key(line["cheque_no"]), []) if i["amount"] == amount]
+                match = _take_closest(same_cheque, line["date"], window_days=36500)
+                rule = "cheque"
+            if not match:
+                match = _take_closest(deposits_by_amount.get(amount, []), line["date"], date_window_days)
+                rule = "amount_date"
+            match_type = "deposit"
+            if not match:
+                match = _take_closest(payments_by_amount.get(amount, []), line["date"], date_window_days)
+                match_type = "payment"
+        elif amount < 0:
+            match = _take_closest(payments_by_amount.get(amount, []), line["date"], date_window_days)
+            match_type, rule = "payment", "amount_date"
+
+        line_id = str(uuid.uuid4())
+        rows.append({
+            "id": line_id,
+            "bank_account_id": bank_account_id,
+            "statement_date": statement_date,
+            "date": line["date"],
+            "description": line.get("description"),
+            "amount": amount,
+            "cheque_no": line.get("cheque_no"),
+            "match_type": match_type if match else None,
+            "match_id": match["id"] if match else None,
+            "fingerprint": line["fingerprint"],
+            "company_id": company_id
+        })
+        if match:
+            matched_by_rule[rule] += 1
+            if match_type == "deposit":
+                deposit_matches.append({"id": match["id"], "match_id": line_id, "tx_id": match["tx_id"]})
+        else:
+            unmatched.append({
+                "date": line["date"],
+                "description": line.get("description"),
+                "amount": amount,
+                "cheque_no": line.get("cheque_no")
+            })
+
+    if rows:
+        try:
+            db.execute(insert(BankStatementLine), rows)
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Lines of this statement were imported concurrently, please retry"
+            )
+    if deposit_matches:
+        db.execute(
+            update(BankTransactionDetail),
+            [{"id": m["id"], "match_id": m["match_id"]} for m in deposit_matches]
+        )
+        # Every still-open line of the account was loaded above, so a deposit is fully
+        # reconciled exactly when none of its loaded lines is left unused
+        still_open = {i["tx_id"] for items in deposits_by_amount.values() for i in items if not i["used"]}
+        reconciled = list({m["tx_id"] for m in deposit_matches} - still_open)
+        for start in range(0, len(reconciled), 1000):
+            db.query(BankTransactionHeader).filter(
+                BankTransactionHeader.id.in_(reconciled[start:start + 1000])
+            ).update({BankTransactionHeader.reconciled: True}, synchronize_session=False)
+    db.commit()
+
+    matched = sum(matched_by_rule.values())
+    return {
+        "bank_account_id": bank_account_id,
+        "statement_date": statement_date,
+        "statement_lines": total_lines,
+        "duplicates_skipped": total_lines - len(statement_lines),
+        "matched": matched,
+        "unmatched": len(unmatched),
+        "matched_by_rule": matched_by_rule,
+        "unmatched_lines": unmatched,
+        "open_book_deposits": sum(1 for items in deposits_by_amount.values() for i in items if not i["used"]),
+        "open_book_payments": sum(1 for items in payments_by_amount.values() for i in items if not i["used"]),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def reconcile_statement_file(db: Session, stream, fmt: str, bank_account_id: str, statement_date: date,
+                             company_id: str, date_window_days: int = 3):
+    try:
+        if fmt == "csv":
+            lines = parse_csv_statement(stream)
+        elif fmt == "mt940":
+            lines = parse_mt940_statement(stream)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported statement format: {fmt}")
+    except (KeyError, ValueError, InvalidOperation) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse statement: {e}")
+    return reconcile_statement(db, bank_account_id, statement_date, lines, company_id, date_window_days)
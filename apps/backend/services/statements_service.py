@@ -0,0 +1,232 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case
+from fastapi import HTTPException, status
+from db_models.accounting import (
+    ChartOfAccount, JournalHeader, JournalDetail, JournalStatus, AccountBalance, AccountType
+)
+from services.accounting_service import month_end
+from decimal import Decimal
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+PNL_TYPES = [AccountType.REVENUE, AccountType.EXPENSE]
+BALANCE_SHEET_TYPES = [AccountType.ASSET, AccountType.LIABILITY, AccountType.EQUITY]
+# Amounts are shown on each section's natural side: debit-positive for assets and expenses
+DEBIT_NATURE = {AccountType.ASSET, AccountType.EXPENSE}
+
+
+def shift_years(d: date, years: int) -> date:
+    """Same calendar position `years` back; month-ends stay month-ends (29 Feb -> 28 Feb)."""
+    target = date(d.year - years, d.month, 1)
+    if d == month_end(d):
+        return month_end(target)
+    return target.replace(day=min(d.day, month_end(target).day))
+
+
+def load_account_tree(db: Session, company_id: str, types: List[AccountType]):
+    """
+    The company's accounts of the given types in one query, as (accounts by id,
+    post-order list of ids, pre-order list of (id, level)). A parent only counts
+    when it has the same type, so roll-ups never cross statement sections.
+    """
+    accounts = {
+        acc.id: acc for acc in db.query(
+            ChartOfAccount.id, ChartOfAccount.parent_account_id, ChartOfAccount.code,
+            ChartOfAccount.name, ChartOfAccount.type, ChartOfAccount.typical_balance,
+            ChartOfAccount.opening_balance
+        ).filter(ChartOfAccount.company_id == company_id, ChartOfAccount.type.in_(types)).all()
+    }
+
+    children: Dict[Optional[str], List[str]] = {}
+    for acc in sorted(accounts.values(), key=lambda a: a.code):
+        parent = accounts.get(acc.parent_account_id)
+        parent_id = parent.id if parent is not None and parent.type == acc.type else None
+        children.setdefault(parent_id, []).append(acc.id)
+
+    post_order, pre_order = [], []
+    visited = set()
+    stack = [(account_id, 0, False) for account_id in reversed(children.get(None, []))]
+    while stack:
+        account_id, level, expanded = stack.pop()
+        if expanded:
+            post_order.append(account_id)
+            continue
+        if account_id in visited:
+            continue  # Guard against parent_account_id cycles
+        visited.add(account_id)
+        pre_order.append((account_id, level))
+        stack.append((account_id, level, True))
+        stack.extend((child, level + 1, False) for child in reversed(children.get(account_id, [])))
+    return accounts, post_order, pre_order
+
+
+def _net_columns(conditions) -> list:
+    net = JournalDetail.debit - JournalDetail.credit
+    return [func.sum(case((condition, net), else_=0)).label(f"p{i}") for i, condition in enumerate(conditions)]
+
+
+def period_activity(db: Session, company_id: str, periods: List[Tuple[date, date]]) -> Dict[str, List[Decimal]]:
+    """Net debit movement per account for every (start, end) period, in one conditional aggregate."""
+    rows = db.query(
+        JournalDetail.account_id,
+        *_net_columns([JournalHeader.date.between(start, end) for start, end in periods])
+    ).join(JournalHeader).filter(
+        JournalHeader.company_id == company_id,
+        JournalHeader.status == JournalStatus.POSTED,
+        JournalHeader.date >= min(start for start, _ in periods),
+        JournalHeader.date <= max(end for _, end in periods)
+    ).group_by(JournalDetail.account_id).all()
+    return {row[0]: [Decimal(value or 0) for value in row[1:]] for row in rows}
+
+
+def balances_as_of(db: Session, company_id: str, as_of_dates: List[date]) -> Dict[str, List[Decimal]]:
+    """
+    Net posted debit balance per account at each date, excluding opening balances.
+    Starts from the materialized account_balances totals and backs out lines posted
+    after each date in one conditional aggregate, so only recent history is read.
+    """
+    current = {
+        row.account_id: Decimal(row.total_debit or 0) - Decimal(row.total_credit or 0)
+        for row in db.query(AccountBalance).filter(AccountBalance.company_id == company_id).all()
+    }
+    later = {
+        row[0]: [Decimal(value or 0) for value in row[1:]]
+        for row in db.query(
+            JournalDetail.account_id,
+            *_net_columns([JournalHeader.date > as_of for as_of in as_of_dates])
+        ).join(JournalHeader).filter(
+            JournalHeader.company_id == company_id,
+            JournalHeader.status == JournalStatus.POSTED,
+            JournalHeader.date > min(as_of_dates)
+        ).group_by(JournalDetail.account_id).all()
+    }
+
+    zeros = [Decimal(0)] * len(as_of_dates)
+    return {
+        account_id: [current.get(account_id, Decimal(0)) - after for after in later.get(account_id, zeros)]
+        for account_id in set(current) | set(later)
+    }
+
+
+def _roll_up(accounts, post_order, leaf_amounts: Dict[str, List[Decimal]], width: int) -> Dict[str, List[Decimal]]:
+    """Single post-order pass: every account's own amount plus its children's, by period."""
+    rolled = {account_id: list(leaf_amounts.get(account_id, [Decimal(0)] * width)) for account_id in post_order}
+    for account_id in post_order:
+        parent_id = accounts[account_id].parent_account_id
+        if parent_id in rolled and accounts[parent_id].type == accounts[account_id].type:
+            rolled[parent_id] = [p + c for p, c in zip(rolled[parent_id], rolled[account_id])]
+    return rolled
+
+
+def _sections(accounts, pre_order, rolled, types, width: int, include_zero: bool):
+    sections = {t: {"type": t, "lines": [], "totals": [Decimal(0)] * width} for t in types}
+    for account_id, level in pre_order:
+        acc = accounts[account_id]
+        sign = 1 if acc.type in DEBIT_NATURE else -1
+        # + 0 turns the -0 of a zero credit-nature balance back into 0
+        amounts = [sign * amount + 0 for amount in rolled[account_id]]
+        section = sections[acc.type]
+        if level == 0:
+            section["totals"] = [t + a for t, a in zip(section["totals"], amounts)]
+        if include_zero or any(amounts):
+            section["lines"].append({
+                "account_id": acc.id,
+                "parent_account_id": acc.parent_account_id,
+                "code": acc.code,
+                "name": acc.name,
+                "level": level,
+                "amounts": amounts
+            })
+    return sections
+
+
+def get_profit_and_loss(
+    db: Session,
+    company_id: str,
+    start_date: date,
+    end_date: date,
+    compare_periods: int = 0,
+    include_zero: bool = False
+):
+    """Profit and loss for the period plus `compare_periods` prior-year comparatives."""
+    if start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date must not be after end_date")
+
+    periods = [(shift_years(start_date, n), shift_years(end_date, n)) for n in range(compare_periods + 1)]
+    width = len(periods)
+    accounts, post_order, pre_order = load_account_tree(db, company_id, PNL_TYPES)
+    activity = period_activity(db, company_id, periods)
+    rolled = _roll_up(accounts, post_order, activity, width)
+    sections = _sections(accounts, pre_order, rolled, PNL_TYPES, width, include_zero)
+
+    revenue = sections[AccountType.REVENUE]["totals"]
+    expense = sections[AccountType.EXPENSE]["totals"]
+    return {
+        "statement": "profit_and_loss",
+        "periods": [{"start": start, "end": end} for start, end in periods],
+        "sections": list(sections.values()),
+        "totals": {"net_income": [r - e for r, e in zip(revenue, expense)]}
+    }
+
+
+def get_balance_sheet(
+    db: Session,
+    company_id: str,
+    as_of: date,
+    compare_periods: int = 0,
+    include_zero: bool = False
+):
+    """
+    Balance sheet at `as_of` plus `compare_periods` prior-year comparatives. Unclosed
+    profit and loss to date is shown as a current earnings line under equity.
+    """
+    dates = [shift_years(as_of, n) for n in range(compare_periods + 1)]
+    width = len(dates)
+    accounts, post_order, pre_order = load_account_tree(db, company_id, BALANCE_SHEET_TYPES + PNL_TYPES)
+    net = balances_as_of(db, company_id, dates)
+
+    # Opening balances are stored on the account's typical side
+    for account_id, acc in accounts.items():
+        opening = Decimal(acc.opening_balance or 0)
+        if opening:
+            signed = opening if acc.typical_balance == "Debit" else -opening
+            net[account_id] = [amount + signed for amount in net.get(account_id, [Decimal(0)] * width)]
+
+    rolled = _roll_up(accounts, post_order, net, width)
+    sections = _sections(
+        accounts,
+        [(account_id, level) for account_id, level in pre_order if accounts[account_id].type in BALANCE_SHEET_TYPES],
+        rolled, BALANCE_SHEET_TYPES, width, include_zero
+    )
+
+    # Credit-positive earnings: minus the net debit of every P&L root
+    earnings = [Decimal(0)] * width
+    for account_id, level in pre_order:
+        if level == 0 and accounts[account_id].type in PNL_TYPES:
+            earnings = [e - amount for e, amount in zip(earnings, rolled[account_id])]
+    equity = sections[AccountType.EQUITY]
+    if include_zero or any(earnings):
+        equity["lines"].append({
+            "account_id": None,
+            "parent_account_id": None,
+            "code": None,
+            "name": "Current earnings",
+            "level": 0,
+            "amounts": earnings
+        })
+    equity["totals"] = [t + e for t, e in zip(equity["totals"], earnings)]
+
+    assets = sections[AccountType.ASSET]["totals"]
+    liabilities_and_equity = [
+        l + e for l, e in zip(sections[AccountType.LIABILITY]["totals"], equity["totals"])
+    ]
+    return {
+        "statement": "balance_sheet",
+        "periods": [{"start": None, "end": d} for d in dates],
+        "sections": list(sections.values()),
+        "totals": {
+            "assets": assets,
+            "liabilities_and_equity": liabilities_and_equity,
+            "difference": [a - le for a, le in zip(assets, liabilities_and_equity)]
+        }
+    }